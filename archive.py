@@ -0,0 +1,219 @@
+# archive.py
+"""
+Retention: visits older than a configurable age move out of the live
+database into one archive database per month (archive/visits-YYYY-MM.db
+next to my_db.db), so the users table only ever holds recent history.
+
+Archives have the same schema as the live database, full-text index
+included. Queries reach them through database.attach_each: only the
+months a query's date range overlaps are attached, and only while they
+are read.
+
+    python archive.py --older-than 365 --photos strip
+"""
+import argparse, datetime, json, os, re, time
+import database, exporter
+
+# visits dated before this (ISO) have been archived; replication won't bring them back
+ARCHIVED_BEFORE_KEY = "archived_before"
+PHOTO_MODES = ("keep", "strip", "recompress")
+ARCHIVE_PATTERN = re.compile(r"^visits-(\d{4}-\d{2})\.db$")
+
+
+def archive_dir_for(db_path: str) -> str:
+    return os.path.join(os.path.dirname(os.path.abspath(db_path)), "archive")
+
+
+def archive_path(archive_dir: str, month: str) -> str:
+    return os.path.join(archive_dir, f"visits-{month}.db")
+
+
+def archive_months(archive_dir: str):
+    """[(month, path)] of every archive, oldest first."""
+    if not archive_dir or not os.path.isdir(archive_dir):
+        return []
+    found = []
+    for name in sorted(os.listdir(archive_dir)):
+        match = ARCHIVE_PATTERN.match(name)
+        if match:
+            found.append((match.group(1), os.path.join(archive_dir, name)))
+    return found
+
+
+def needed_archives(archive_dir: str, start_date: str = None, end_date: str = None):
+    """Paths of the archives holding visits between start_date and end_date (inclusive), oldest first."""
+    start = (database.to_iso_date(start_date) or "")[:7]
+    end = (database.to_iso_date(end_date) or "")[:7]
+    return [path for month, path in archive_months(archive_dir)
+            if (not start or month >= start) and (not end or month <= end)]
+
+
+def _next_month(month: str) -> str:
+    year, number = int(month[:4]), int(month[5:7])
+    return f"{year + number // 12}-{number % 12 + 1:02d}"
+
+
+def _recompress(data: bytes, max_side: int = 160, quality: int = 60) -> bytes:
+    """A smaller JPEG of a photo, or the photo unchanged if it can't be decoded."""
+    import cv2, numpy as np
+    image = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+    if image is None:
+        return data
+    h, w = image.shape[:2]
+    scale = min(1.0, max_side / max(h, w))
+    if scale < 1:
+        image = cv2.resize(image, (int(w * scale), int(h * scale)), interpolation=cv2.INTER_AREA)
+    ok, encoded = cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    return encoded.tobytes() if ok and len(encoded) < len(data) else data
+
+
+# ------------------------------
+# Retention
+# ------------------------------
+COLUMNS = ["id"] + database.VISIT_COLUMNS
+
+
+def _move_batch(cursor, month: str, photos: str, batch_size: int) -> (int, int):
+    """Copy up to batch_size of month's visits into the attached archive, then delete them here."""
+    rows = cursor.execute(f"""
+        SELECT {', '.join(COLUMNS)} FROM main.users
+        WHERE date >= ? AND date < ? ORDER BY id LIMIT ?
+    """, (month, _next_month(month), batch_size)).fetchall()
+    if not rows:
+        return 0, 0
+    hashes = {row[-1] for row in rows if row[-1]}
+    moved_photos = 0
+    if photos == "strip":
+        rows = [row[:-1] + (None,) for row in rows]
+    elif photos == "keep":
+        for digest in hashes:
+            cursor.execute("INSERT OR IGNORE INTO archive.photos (hash, data) SELECT hash, data FROM main.photos WHERE hash=?",
+                           (digest,))
+            cursor.execute("""
+                INSERT OR IGNORE INTO archive.photo_thumbnails (hash, data)
+                SELECT hash, data FROM main.photo_thumbnails WHERE hash=?
+            """, (digest,))
+            moved_photos += 1
+    else:
+        renamed = {}
+        for digest in hashes:
+            data = database.load_photo(cursor, digest)
+            if data:
+                smaller = _recompress(data)
+                new_digest = database.photo_hash(smaller)
+                cursor.execute("INSERT OR IGNORE INTO archive.photos (hash, data) VALUES (?, ?)", (new_digest, smaller))
+                renamed[digest] = new_digest
+                moved_photos += 1
+        rows = [row[:-1] + (renamed.get(row[-1]),) for row in rows]
+
+    # OR IGNORE: a run interrupted between the two commits is simply repeated
+    cursor.executemany(
+        f"INSERT OR IGNORE INTO archive.users ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))})", rows
+    )
+    cursor.executemany("DELETE FROM main.users WHERE id=?", [(row[0],) for row in rows])
+    return len(rows), moved_photos
+
+
+def _optimize_fts(cursor, schema: str):
+    if database.has_fts(cursor.connection, schema):
+        cursor.execute(f"INSERT INTO {schema}.users_fts (users_fts) VALUES ('optimize')")
+
+
+def archive_old_visits(db: database.Database, archive_dir: str, older_than_days: int = 365, photos: str = "keep",
+                       batch_size: int = 5000, today: datetime.date = None):
+    """
+    Move visits dated before the month that was older_than_days ago into
+    per-month archives. photos is "keep" (copy them), "strip" (drop them)
+    or "recompress" (store a small JPEG). Whole months move at a time, in
+    batches of batch_size visits per transaction. Returns a report dict.
+    """
+    if photos not in PHOTO_MODES:
+        raise ValueError(f"photos must be one of {PHOTO_MODES}")
+    started = time.perf_counter()
+    today = today or datetime.date.today()
+    cutoff = (today - datetime.timedelta(days=older_than_days)).replace(day=1).isoformat()
+    with db.read() as conn:
+        months = [row[0] for row in conn.execute("""
+            SELECT DISTINCT substr(date, 1, 7) FROM users
+            WHERE date < ? AND date GLOB '[0-9][0-9][0-9][0-9]-[0-9][0-9]-*' ORDER BY 1
+        """, (cutoff,))]
+
+    os.makedirs(archive_dir, exist_ok=True)
+    moved = moved_photos = 0
+    for month in months:
+        path = archive_path(archive_dir, month)
+        database.create_database(path)
+        while True:
+            with db.write_attached(path, "archive", durable=True) as cursor:
+                visits, photo_count = _move_batch(cursor, month, photos, batch_size)
+            moved += visits
+            moved_photos += photo_count
+            if visits < batch_size:
+                break
+
+        # written once, read for years: merge its full-text index into one segment
+        with db.write_attached(path, "archive") as cursor:
+            _optimize_fts(cursor, "archive")
+
+    with db.write() as cursor:
+        pruned = database.prune_photos(cursor)
+        if months:
+            # otherwise searches wade through the deleted rows' tombstones
+            _optimize_fts(cursor, "main")
+        if cutoff > (database.get_meta(cursor, ARCHIVED_BEFORE_KEY) or ""):
+            database.set_meta(cursor, ARCHIVED_BEFORE_KEY, cutoff)
+    with db.read() as conn:
+        live = conn.execute("SELECT count(*) FROM users").fetchone()[0]
+    return {
+        "archived_before": cutoff, "months": months, "visits": moved, "photos": moved_photos,
+        "photos_pruned": pruned, "live_visits": live, "seconds": time.perf_counter() - started,
+    }
+
+
+# ------------------------------
+# Unified queries
+# ------------------------------
+def search_visits(db: database.Database, archive_dir: str, text: str = None, start_date: str = None,
+                  end_date: str = None, limit: int = 200, live: bool = True):
+    """
+    Up to limit visits (exporter.EXPORT_COLUMNS) matching text between the
+    dates, newest first, from the live database and then from whichever
+    archives the range reaches, newest month first. Archives are only
+    opened when the live database runs out of matches. live=False
+    searches the archives alone.
+    """
+    rows = []
+    order = "u.date DESC, u.id DESC"
+    with db.read() as conn:
+        if live:
+            for batch in exporter.iter_visits(conn, start_date, end_date, text, batch_size=limit, order=order):
+                rows += batch
+                break
+        if len(rows) < limit:
+            for schema in database.attach_each(conn, reversed(needed_archives(archive_dir, start_date, end_date))):
+                for batch in exporter.iter_visits(conn, start_date, end_date, text, batch_size=limit - len(rows),
+                                                  order=order, schema=schema):
+                    rows += batch
+                    break
+                if len(rows) >= limit:
+                    break
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "my_db.db"))
+    parser.add_argument("--older-than", type=int, default=365, help="days")
+    parser.add_argument("--photos", choices=PHOTO_MODES, default="keep")
+    args = parser.parse_args()
+
+    db = database.Database(args.db)
+    try:
+        report = archive_old_visits(db, archive_dir_for(args.db), args.older_than, args.photos)
+    finally:
+        db.close()
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,334 @@
+# backup.py
+"""
+Incremental, compressed backups of the visit database.
+
+A backup takes a consistent snapshot through SQLite's online backup API
+(exporter.export_snapshot) and cuts it into fixed-size chunks, each
+identified by its sha256. New chunks are zlib-compressed and uploaded
+in pack files of a few MB. A manifest lists the chunk hashes in file
+order and where each one is stored, and is enough on its own to restore
+that backup.
+
+Incremental backups upload only the chunks (i.e. the database pages)
+that changed since the previous backup and point at earlier packs for
+the rest. Every full_every-th backup is a full one that uploads every
+chunk again, so old packs can be pruned and a damaged one stops
+mattering. Memory use stays around one pack whatever the database size.
+
+    python backup.py backup --target D:\\backups
+    python backup.py restore --target D:\\backups --to restored.db
+"""
+import argparse, datetime, hashlib, json, os, sqlite3, tempfile, time, tracemalloc, zlib
+import database, exporter
+
+# small chunks keep incrementals small (an insert dirties index pages all
+# over the file); packing them keeps the number of uploads down
+CHUNK_SIZE = 64 * 1024
+PACK_SIZE = 8 * 1024 * 1024
+MANIFESTS = "manifests/"
+PACKS = "packs/"
+
+
+# ------------------------------
+# Targets
+# ------------------------------
+# A target stores named blobs: put/get/exists/delete/list(prefix).
+
+class LocalTarget:
+    """A directory, e.g. a second disk or a mounted network share."""
+
+    def __init__(self, root: str):
+        self.root = os.path.abspath(root)
+        self.name = self.root
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.root, *name.split("/"))
+
+    def put(self, name: str, data: bytes):
+        path = self._path(name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path + ".part", "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(path + ".part", path)
+
+    def get(self, name: str) -> bytes:
+        with open(self._path(name), "rb") as f:
+            return f.read()
+
+    def exists(self, name: str) -> bool:
+        return os.path.exists(self._path(name))
+
+    def delete(self, name: str):
+        if self.exists(name):
+            os.remove(self._path(name))
+
+    def list(self, prefix: str):
+        folder = self._path(prefix)
+        if not os.path.isdir(folder):
+            return []
+        return sorted(prefix + entry for entry in os.listdir(folder) if not entry.endswith(".part"))
+
+
+class DropboxTarget:
+    """
+    A folder in Dropbox. Needs the dropbox package and an access token;
+    pass the token at runtime or through an environment variable, never in code.
+    """
+
+    def __init__(self, access_token: str, folder: str = "/access-control-backups"):
+        import dropbox
+        self._dropbox = dropbox
+        self.client = dropbox.Dropbox(access_token)
+        self.folder = folder.rstrip("/")
+        self.name = f"dropbox:{self.folder}"
+
+    def put(self, name: str, data: bytes):
+        self.client.files_upload(bytes(data), f"{self.folder}/{name}", mode=self._dropbox.files.WriteMode.overwrite)
+
+    def get(self, name: str) -> bytes:
+        _, response = self.client.files_download(f"{self.folder}/{name}")
+        return response.content
+
+    def exists(self, name: str) -> bool:
+        try:
+            self.client.files_get_metadata(f"{self.folder}/{name}")
+            return True
+        except self._dropbox.exceptions.ApiError:
+            return False
+
+    def delete(self, name: str):
+        try:
+            self.client.files_delete_v2(f"{self.folder}/{name}")
+        except self._dropbox.exceptions.ApiError:
+            pass
+
+    def list(self, prefix: str):
+        try:
+            result = self.client.files_list_folder(f"{self.folder}/{prefix.rstrip('/')}")
+        except self._dropbox.exceptions.ApiError:
+            return []
+        names = [entry.name for entry in result.entries]
+        while result.has_more:
+            result = self.client.files_list_folder_continue(result.cursor)
+            names += [entry.name for entry in result.entries]
+        return sorted(prefix + name for name in names)
+
+
+# ------------------------------
+# Backup and restore
+# ------------------------------
+def manifests(target):
+    """Manifest names at target, oldest first."""
+    return [name for name in target.list(MANIFESTS) if name.endswith(".json")]
+
+
+def load_manifest(target, name: str = None):
+    """The named manifest, or the latest one; None if there are no backups."""
+    if name is None:
+        names = manifests(target)
+        if not names:
+            return None
+        name = names[-1]
+    return json.loads(target.get(name))
+
+
+def _chunks(path: str, chunk_size: int):
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                return
+            yield chunk
+
+
+class _PackWriter:
+    """Collects compressed chunks into pack files of about pack_size bytes each."""
+
+    def __init__(self, target, stamp: str, pack_size: int):
+        self.target = target
+        self.stamp = stamp
+        self.pack_size = pack_size
+        self.buffer = bytearray()
+        self.packs = 0
+        self.written = 0
+
+    def add(self, chunk: bytes):
+        """Queue a chunk; returns its index entry [pack, offset, length, compressed]."""
+        data = zlib.compress(chunk, 1)
+        # photos are already compressed, store those pages as they are
+        compressed = len(data) < len(chunk)
+        if not compressed:
+            data = chunk
+        entry = [f"{PACKS}{self.stamp}-{self.packs:05d}", len(self.buffer), len(data), compressed]
+        self.buffer += data
+        if len(self.buffer) >= self.pack_size:
+            self.flush()
+        return entry
+
+    def flush(self):
+        if self.buffer:
+            self.target.put(f"{PACKS}{self.stamp}-{self.packs:05d}", self.buffer)
+            self.written += len(self.buffer)
+            self.packs += 1
+            self.buffer = bytearray()
+
+
+def backup(db: database.Database, target, full: bool = None, full_every: int = 7, keep: int = 14,
+           chunk_size: int = CHUNK_SIZE, pack_size: int = PACK_SIZE, progress=None, trace_memory: bool = False):
+    """
+    Back db up to target; full=None lets full_every decide. Keeps the
+    newest `keep` backups. Returns a report dict (sizes, chunks sent,
+    duration and, with trace_memory, peak Python memory in bytes).
+    """
+    started = time.perf_counter()
+    if trace_memory:
+        tracemalloc.start()
+    previous = load_manifest(target)
+    if full is None:
+        full = previous is None or previous["since_full"] + 1 >= full_every
+    known = {} if full or previous["chunk_size"] != chunk_size else previous["index"]
+    stamp = datetime.datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+    packs = _PackWriter(target, stamp, pack_size)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        snapshot = os.path.join(tmp, "snapshot.db")
+        exporter.export_snapshot(db, snapshot)
+        size = os.path.getsize(snapshot)
+        chunks, index, sent = [], {}, 0
+        whole = hashlib.sha256()
+        for number, chunk in enumerate(_chunks(snapshot, chunk_size)):
+            whole.update(chunk)
+            digest = hashlib.sha256(chunk).hexdigest()
+            chunks.append(digest)
+            if digest not in index:
+                if digest in known:
+                    index[digest] = known[digest]
+                else:
+                    index[digest] = packs.add(chunk)
+                    sent += 1
+            if progress:
+                progress(min((number + 1) * chunk_size, size), size)
+        packs.flush()
+
+    manifest = {
+        "created": stamp, "full": full, "since_full": 0 if full else previous["since_full"] + 1,
+        "size": size, "sha256": whole.hexdigest(), "chunk_size": chunk_size,
+        "schema_version": database.SCHEMA_VERSION, "chunks": chunks, "index": index,
+    }
+    # written last: a backup only exists once all its packs do
+    target.put(f"{MANIFESTS}{stamp}.json", json.dumps(manifest).encode("utf-8"))
+    removed = prune(target, keep)
+
+    peak = None
+    if trace_memory:
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return {
+        "manifest": f"{MANIFESTS}{stamp}.json", "full": full, "size": size, "chunks": len(chunks),
+        "chunks_sent": sent, "packs_sent": packs.packs, "bytes_sent": packs.written, "packs_pruned": removed,
+        "seconds": time.perf_counter() - started, "peak_memory": peak,
+    }
+
+
+def prune(target, keep: int) -> int:
+    """Delete all but the newest keep manifests and every pack none of the rest refer to."""
+    names = manifests(target)
+    if len(names) <= keep:
+        return 0
+    for name in names[:-keep]:
+        target.delete(name)
+    referenced = set()
+    for name in names[-keep:]:
+        referenced.update(entry[0] for entry in load_manifest(target, name)["index"].values())
+    removed = 0
+    for name in target.list(PACKS):
+        if name not in referenced:
+            target.delete(name)
+            removed += 1
+    return removed
+
+
+def restore(target, dest_path: str, manifest: str = None, verify: bool = True):
+    """
+    Rebuild a backup (default the latest) at dest_path, one pack at a
+    time. With verify, checks the file's sha256 against the manifest and
+    runs SQLite's integrity_check. Returns a report dict; raises
+    ValueError if verification fails.
+    """
+    started = time.perf_counter()
+    plan = load_manifest(target, manifest)
+    if plan is None:
+        raise ValueError(f"No backups at {target.name}")
+    # where each pack's chunks go in the file
+    by_pack = {}
+    for number, digest in enumerate(plan["chunks"]):
+        pack, offset, length, compressed = plan["index"][digest]
+        by_pack.setdefault(pack, []).append((number * plan["chunk_size"], offset, length, compressed, digest))
+
+    tmp_path = dest_path + ".part"
+    try:
+        with open(tmp_path, "wb") as f:
+            f.truncate(plan["size"])
+            for pack, pieces in by_pack.items():
+                data = target.get(pack)
+                for position, offset, length, compressed, digest in pieces:
+                    chunk = data[offset:offset + length]
+                    if compressed:
+                        chunk = zlib.decompress(chunk)
+                    if hashlib.sha256(chunk).hexdigest() != digest:
+                        raise ValueError(f"Chunk {digest} in {pack} is corrupt")
+                    f.seek(position)
+                    f.write(chunk)
+        report = {"created": plan["created"], "size": plan["size"], "seconds": None, "verified": False}
+        if verify:
+            whole = hashlib.sha256()
+            for chunk in _chunks(tmp_path, plan["chunk_size"]):
+                whole.update(chunk)
+            if whole.hexdigest() != plan["sha256"]:
+                raise ValueError("Restored file does not match the backup's checksum")
+            conn = sqlite3.connect(tmp_path)
+            try:
+                result = conn.execute("PRAGMA integrity_check").fetchone()[0]
+                report["visits"] = conn.execute("SELECT count(*) FROM users").fetchone()[0]
+            finally:
+                conn.close()
+            if result != "ok":
+                raise ValueError(f"Restored database failed integrity_check: {result}")
+            report["verified"] = True
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    os.replace(tmp_path, dest_path)
+    report["seconds"] = time.perf_counter() - started
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=["backup", "restore", "list"])
+    parser.add_argument("--db", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "my_db.db"))
+    parser.add_argument("--target", help="backup directory (default: Dropbox, token from DROPBOX_ACCESS_TOKEN)")
+    parser.add_argument("--full", action="store_true")
+    parser.add_argument("--to", help="restore destination")
+    parser.add_argument("--manifest", help="restore this backup instead of the latest")
+    args = parser.parse_args()
+
+    target = LocalTarget(args.target) if args.target else DropboxTarget(os.environ["DROPBOX_ACCESS_TOKEN"])
+    if args.command == "backup":
+        db = database.Database(args.db)
+        try:
+            report = backup(db, target, full=args.full or None, trace_memory=True)
+        finally:
+            db.close()
+    elif args.command == "restore":
+        report = restore(target, args.to or "restored.db", args.manifest)
+    else:
+        report = manifests(target)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+# benchmarks/archive.py
+"""
+Live database size and query times before and after archiving.
+
+Fills a database with --rows visits spread over --days days ending
+today, times the everyday queries (today's lookup by tag, a full-text
+search, a 30-day export count), archives everything older than
+--older-than days and times them again, plus a search and an export
+that have to reach into the archives.
+
+    python benchmarks/archive.py --rows 1000000 --older-than 365
+"""
+import argparse, datetime, os, random, statistics, sys, tempfile, time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import archive, database, exporter
+
+
+def populate(db, rows, days):
+    end = datetime.date.today()
+    per_day = max(rows // days, 1)
+
+    def generate():
+        for i in range(rows):
+            day = end - datetime.timedelta(days=days - 1 - i // per_day)
+            yield (str(i % per_day).rjust(3, "0"), f"Visitor {i}", f"{i} Main Street", random.choice(["meeting", "delivery"]),
+                   "09:00:00", "17:00:00", day.isoformat())
+
+    with db.write() as cursor:
+        cursor.executemany(
+            "INSERT INTO users (tag, name, address, purpose, time_in, time_out, date) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            generate()
+        )
+    return per_day
+
+
+def timed(fn, repeat=20):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples) * 1000
+
+
+def live_size(db):
+    with db.read() as conn:
+        pages, size = (conn.execute(f"PRAGMA {pragma}").fetchone()[0] for pragma in ("page_count", "page_size"))
+        free = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        rows = conn.execute("SELECT count(*) FROM users").fetchone()[0]
+    return rows, (pages - free) * size
+
+
+def everyday(db, per_day):
+    today = datetime.date.today().isoformat()
+    month_ago = (datetime.date.today() - datetime.timedelta(days=30)).isoformat()
+    rng = random.Random(0)
+
+    def lookup():
+        with db.read() as conn:
+            conn.execute("SELECT * FROM users WHERE tag=? AND date=?", (str(rng.randrange(per_day)).rjust(3, "0"), today)).fetchone()
+
+    def search():
+        with db.read() as conn:
+            database.search_visits(conn, ["name"], "delivery", 200)
+
+    def count():
+        with db.read() as conn:
+            exporter.count_visits(conn, month_ago, today)
+
+    return {"today's lookup": timed(lookup), "search (200 hits)": timed(search), "30-day count": timed(count)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--days", type=int, default=365 * 3)
+    parser.add_argument("--older-than", type=int, default=365)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        database.create_database(path)
+        db = database.Database(path)
+        per_day = populate(db, args.rows, args.days)
+
+        rows, size = live_size(db)
+        print(f"before: {rows} live visits, {size / 2 ** 20:.1f} MB in use")
+        for label, ms in everyday(db, per_day).items():
+            print(f"  {label:<20} {ms:8.3f} ms")
+
+        report = archive.archive_old_visits(db, os.path.join(tmp, "archive"), args.older_than)
+        print(f"archived {report['visits']} visits into {len(report['months'])} monthly files in {report['seconds']:.1f} s")
+
+        rows, size = live_size(db)
+        print(f"after: {rows} live visits, {size / 2 ** 20:.1f} MB in use")
+        for label, ms in everyday(db, per_day).items():
+            print(f"  {label:<20} {ms:8.3f} ms")
+
+        archive_dir = os.path.join(tmp, "archive")
+        first = (datetime.date.today() - datetime.timedelta(days=args.days)).isoformat()
+        ms = timed(lambda: archive.search_visits(db, archive_dir, "Visitor 1", first, None, 500), repeat=5)
+        print(f"  {'search incl. archive':<20} {ms:8.3f} ms")
+        start = time.perf_counter()
+        exported = exporter.export_visits(db, os.path.join(tmp, "all.csv"), "csv", first,
+                                          archives=archive.needed_archives(archive_dir, first))
+        print(f"  export of all {exported} visits incl. archives: {time.perf_counter() - start:.1f} s")
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
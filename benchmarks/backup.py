@@ -0,0 +1,98 @@
+# benchmarks/backup.py
+"""
+Backup cost: the old whole-file read versus backup.py's chunked,
+incremental backups, all to a local directory.
+
+Builds a database of --visits visits (half with a 12 KB photo), then
+reports duration, peak Python memory and bytes written for:
+
+  old          f.read() of the live file, written out whole
+  full         first chunked backup
+  incremental  after 1% more check-ins, half of them checked out again
+               (a day's traffic on top of the existing log)
+  restore      rebuilding the latest backup, with checksum and integrity_check
+
+    python benchmarks/backup.py --visits 20000
+"""
+import argparse, datetime, os, sys, tempfile, time, tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import database, backup
+
+
+def add_visits(db, start, count):
+    today = datetime.date.today().isoformat()
+    with db.write() as cursor:
+        for i in range(start, start + count):
+            database.insert_visit(cursor, {
+                "tag": str(i % 1000).rjust(3, "0"), "name": f"Visitor {i}", "address": f"{i} Main Street",
+                "purpose": "meeting", "time_in": "08:00:00", "time_out": "", "date": today,
+                "picture": os.urandom(12000) if i % 2 else None,
+            })
+
+
+def check_out(db, names):
+    today = datetime.date.today().isoformat()
+    with db.write() as cursor:
+        for i in names:
+            database.update_visit(cursor, {"name": f"Visitor {i}", "date": today, "time_out": "17:00:00",
+                                           "picture": None})
+
+
+def old_backup(db_path, folder):
+    tracemalloc.start()
+    start = time.perf_counter()
+    with open(db_path, "rb") as f:
+        data = f.read()
+    with open(os.path.join(folder, "backup.db"), "wb") as f:
+        f.write(data)
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak, len(data)
+
+
+def line(label, seconds, peak, written, extra=""):
+    peak = f"{peak / 2 ** 20:8.1f} MB" if peak is not None else " " * 11
+    print(f"{label:>12}: {seconds:7.2f} s   peak memory {peak}   written {written / 2 ** 20:8.1f} MB   {extra}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--visits", type=int, default=20000)
+    parser.add_argument("--chunk-size", type=int, default=backup.CHUNK_SIZE)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "visits.db")
+        db = database.Database(db_path)
+        add_visits(db, 0, args.visits)
+        # checkpoint so the old approach sees every row in the main file
+        db._writer.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        print(f"database: {os.path.getsize(db_path) / 2 ** 20:.1f} MB, {args.visits} visits")
+
+        os.makedirs(os.path.join(tmp, "old"))
+        line("old", *old_backup(db_path, os.path.join(tmp, "old")))
+
+        target = backup.LocalTarget(os.path.join(tmp, "backups"))
+        report = backup.backup(db, target, chunk_size=args.chunk_size, trace_memory=True)
+        line("full", report["seconds"], report["peak_memory"], report["bytes_sent"],
+             f"{report['chunks_sent']}/{report['chunks']} chunks in {report['packs_sent']} packs")
+
+        add_visits(db, args.visits, args.visits // 100)
+        check_out(db, range(args.visits, args.visits + args.visits // 100, 2))
+        report = backup.backup(db, target, chunk_size=args.chunk_size, trace_memory=True)
+        line("incremental", report["seconds"], report["peak_memory"], report["bytes_sent"],
+             f"{report['chunks_sent']}/{report['chunks']} chunks in {report['packs_sent']} packs")
+
+        tracemalloc.start()
+        report = backup.restore(target, os.path.join(tmp, "restored.db"))
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        line("restore", report["seconds"], peak, report["size"],
+             f"verified={report['verified']} visits={report['visits']}")
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+# benchmarks/checkins.py
+"""
+Sustained check-in throughput.
+
+"before" is the old save_record path: a new connection per record, a
+SELECT by name and date, an INSERT and a commit in the default rollback
+journal mode. "after" submits the same records to the WriteQueue over a
+pooled WAL database and waits until every one is reported durable.
+
+    python benchmarks/checkins.py --records 5000
+"""
+import argparse, datetime, os, sqlite3, sys, tempfile, time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import database
+from write_queue import WriteQueue
+
+PICTURE = b"\xff\xd8" + os.urandom(12000)
+
+
+def visits(n):
+    today = datetime.date.today().isoformat()
+    for i in range(n):
+        yield {"tag": str(i % 1000).rjust(3, "0"), "name": f"Visitor {i}", "address": f"{i} Main Street",
+               "purpose": "meeting", "time_in": "08:00:00", "time_out": "", "date": today,
+               "picture": PICTURE if i % 2 else None}
+
+
+def before(db_path, n):
+    database.create_database(db_path)
+    # the original app ran in rollback-journal mode
+    sqlite3.connect(db_path).execute("PRAGMA journal_mode = DELETE").fetchone()
+    latencies = []
+    start = time.perf_counter()
+    for visit in visits(n):
+        t = time.perf_counter()
+        with sqlite3.connect(db_path) as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT id FROM users WHERE name=? AND date=?", (visit["name"], visit["date"]))
+            cursor.fetchone()
+            database.insert_visit(cursor, visit)
+            conn.commit()
+        conn.close()
+        latencies.append(time.perf_counter() - t)
+    return time.perf_counter() - start, latencies, latencies
+
+
+def after(db_path, n):
+    db = database.Database(db_path)
+    write_queue = WriteQueue(db, db_path + "-writes.jsonl")
+    accept, durable, futures = [], [], []
+    start = time.perf_counter()
+    for visit in visits(n):
+        t = time.perf_counter()
+        future = write_queue.submit("insert", visit)
+        accept.append(time.perf_counter() - t)
+        future.add_done_callback(lambda f, t=t: durable.append(time.perf_counter() - t))
+        futures.append(future)
+    for future in futures:
+        future.result()
+    elapsed = time.perf_counter() - start
+    stats = write_queue.stats()
+    write_queue.close()
+    db.close()
+    print(f"        {stats['batches']} transactions for {stats['committed']} records")
+    return elapsed, accept, durable
+
+
+def report(label, n, elapsed, accept, durable):
+    def p(samples, q):
+        return sorted(samples)[int(len(samples) * q) - 1] * 1000
+    print(f"{label:>6}: {n / elapsed:9.0f} check-ins/s   accept p50 {p(accept, .5):7.3f} ms  p99 {p(accept, .99):7.3f} ms"
+          f"   durable p50 {p(durable, .5):7.2f} ms  p99 {p(durable, .99):7.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--records", type=int, default=5000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for label, run in (("before", before), ("after", after)):
+            elapsed, accept, durable = run(os.path.join(tmp, f"{label}.db"), args.records)
+            report(label, args.records, elapsed, accept, durable)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+# benchmarks/face_detection.py
+"""
+Per-frame face detection latency on the CPU.
+
+Frames come from a recorded video (--video), a folder of images
+(--images) or, by default, synthetic 640x480 frames (latency only, no
+faces to find). Reports the detector backend, model load time, per-frame
+detect() latency and the cost of picking the sharpest face from a
+5-frame buffer as take_snapshot does.
+
+    python benchmarks/face_detection.py --video recording.mp4
+"""
+import argparse, os, statistics, sys, time
+import cv2, numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import faces
+
+
+def load_frames(args):
+    if args.video:
+        cap = cv2.VideoCapture(args.video)
+        frames = []
+        while len(frames) < args.frames:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            frames.append(frame)
+        cap.release()
+        return frames
+    if args.images:
+        names = sorted(os.listdir(args.images))[:args.frames]
+        frames = [cv2.imread(os.path.join(args.images, name)) for name in names]
+        return [frame for frame in frames if frame is not None]
+    rng = np.random.default_rng(0)
+    return [rng.integers(0, 255, (480, 640, 3), dtype=np.uint8) for _ in range(args.frames)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--video")
+    parser.add_argument("--images")
+    parser.add_argument("--frames", type=int, default=200)
+    args = parser.parse_args()
+
+    frames = load_frames(args)
+    if not frames:
+        sys.exit("no frames to run on")
+
+    start = time.perf_counter()
+    detector = faces.face_detector()
+    load_ms = (time.perf_counter() - start) * 1000
+    if not detector.available():
+        sys.exit("no face detection backend available in this OpenCV build")
+
+    samples, found = [], 0
+    for frame in frames:
+        t = time.perf_counter()
+        found += detector.detect(frame) is not None
+        samples.append(time.perf_counter() - t)
+    samples.sort()
+
+    buffers = [frames[i:i + 5] for i in range(0, len(frames) - 4, 5)]
+    best = []
+    for buffer in buffers:
+        t = time.perf_counter()
+        faces.best_face(buffer, detector)
+        best.append(time.perf_counter() - t)
+
+    h, w = frames[0].shape[:2]
+    print(f"backend {detector.backend}, model load {load_ms:.1f} ms, {len(frames)} frames {w}x{h}, "
+          f"faces found in {found}")
+    print(f"detect():      median {statistics.median(samples) * 1000:7.2f} ms   "
+          f"p95 {samples[int(len(samples) * 0.95) - 1] * 1000:7.2f} ms")
+    if best:
+        print(f"best_face(5):  median {statistics.median(best) * 1000:7.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
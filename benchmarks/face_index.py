@@ -0,0 +1,57 @@
+# benchmarks/face_index.py
+"""
+Returning-visitor lookup latency: FaceIndex.search over N enrolled faces
+(random unit vectors) at the SFace (128) and fallback (256) dimensions,
+plus the cost of embedding one 200x200 face crop.
+
+    python benchmarks/face_index.py --faces 100000
+"""
+import argparse, os, statistics, sys, time
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import faces
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--faces", type=int, default=100_000)
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+    rng = np.random.default_rng(0)
+
+    for dim in (128, 256):
+        vectors = rng.standard_normal((args.faces, dim)).astype(np.float32)
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+        index = faces.FaceIndex(dim)
+        start = time.perf_counter()
+        for i, vector in enumerate(vectors):
+            index.add(i, vector)
+        add_s = time.perf_counter() - start
+
+        samples, hits = [], 0
+        for _ in range(args.queries):
+            target = int(rng.integers(args.faces))
+            query = vectors[target] + rng.standard_normal(dim).astype(np.float32) * 0.02
+            query /= np.linalg.norm(query)
+            t = time.perf_counter()
+            key, _ = index.search(query)[0]
+            samples.append(time.perf_counter() - t)
+            hits += key == target
+        samples.sort()
+        print(f"dim {dim}: {args.faces} faces enrolled in {add_s:.2f} s   search median "
+              f"{statistics.median(samples) * 1000:.2f} ms   p99 {samples[int(len(samples) * 0.99) - 1] * 1000:.2f} ms"
+              f"   recall {hits / args.queries:.0%}")
+
+    embedder = faces.FaceEmbedder()
+    crop = rng.integers(0, 255, (200, 200, 3), dtype=np.uint8)
+    samples = []
+    for _ in range(50):
+        t = time.perf_counter()
+        embedder.embed(crop)
+        samples.append(time.perf_counter() - t)
+    print(f"embed() with {embedder.model}: median {statistics.median(samples) * 1000:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+# benchmarks/generate.py
+"""
+Synthetic visitor logs for benchmarking: a database at the current
+schema with --rows visits spread over --days days up to today.
+
+A pool of visitors comes back on several days (about five visits each),
+check-ins cluster around the morning and early afternoon, most visits
+are checked out and today's are partly still open. With --photos every
+visitor has a JPEG photo (taken from a pool of --photo-pool distinct
+pictures) stored the way save_record stores them. Same arguments, same
+database.
+
+    python benchmarks/generate.py --rows 1000000 --photos --out bench.db
+"""
+import argparse, datetime, os, random, sys, time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import database
+
+FIRST = ["Ada", "Bola", "Chidi", "Dayo", "Emeka", "Funke", "Grace", "Hassan", "Ife", "Jide", "Kemi", "Lola",
+         "Musa", "Ngozi", "Olu", "Pelumi", "Segun", "Tobi", "Uche", "Yemi", "Zainab"]
+LAST = ["Okafor", "Adeyemi", "Bello", "Eze", "Ogunleye", "Nwosu", "Balogun", "Ibrahim", "Okonkwo", "Afolabi",
+        "Danjuma", "Lawal", "Obi", "Sanni"]
+STREETS = ["Allen Avenue", "Broad Street", "Marina Road", "Awolowo Way", "Herbert Macaulay", "Adeola Odeku"]
+PURPOSES = ["meeting", "delivery", "interview", "maintenance", "visit", "audit", "training"]
+# share of check-ins per hour from 07:00 to 18:00
+HOURS = [4, 14, 16, 12, 8, 6, 10, 9, 8, 6, 4, 3]
+BATCH = 20000
+
+
+def photo_pool(count: int, seed: int, size: int = 200):
+    """count distinct JPEG portraits-sized images of about the size snapshots come out at."""
+    import cv2, numpy as np
+    rng = np.random.default_rng(seed)
+    photos = []
+    for _ in range(count):
+        # smooth colour field plus a few shapes: compresses like a photo, not like noise
+        small = rng.integers(0, 255, (8, 8, 3), dtype=np.uint8)
+        image = cv2.resize(small, (size, size), interpolation=cv2.INTER_CUBIC)
+        for _ in range(6):
+            centre = tuple(int(v) for v in rng.integers(0, size, 2))
+            color = tuple(int(v) for v in rng.integers(0, 255, 3))
+            cv2.circle(image, centre, int(rng.integers(10, 60)), color, -1)
+        image = cv2.GaussianBlur(image, (5, 5), 0)
+        ok, encoded = cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, 90])
+        photos.append(encoded.tobytes())
+    return photos
+
+
+def visitors(count: int, rng: random.Random):
+    return [(f"{rng.choice(FIRST)} {rng.choice(LAST)} {i}", f"{rng.randrange(1, 300)} {rng.choice(STREETS)}")
+            for i in range(count)]
+
+
+def visit_rows(rows: int, days: int, people, photo_hashes, rng: random.Random):
+    """Rows in users column order (see INSERT below), oldest day first."""
+    today = datetime.date.today()
+    first = today - datetime.timedelta(days=days - 1)
+    hours = [hour for hour, weight in zip(range(7, 19), HOURS) for _ in range(weight)]
+    for day in range(days):
+        date = (first + datetime.timedelta(days=day)).isoformat()
+        count = rows * (day + 1) // days - rows * day // days
+        # nobody visits twice on one day (save_record keys visits on name and date)
+        today_people = rng.sample(range(len(people)), count) if count <= len(people) else \
+            [rng.randrange(len(people)) for _ in range(count)]
+        for number, person in enumerate(today_people):
+            name, address = people[person]
+            hour, minute = rng.choice(hours), rng.randrange(60)
+            stay = rng.randrange(15, 8 * 60)
+            still_inside = date == today.isoformat() and rng.random() < 0.3
+            out = hour * 60 + minute + stay
+            time_out = "" if still_inside else f"{min(out // 60, 23):02d}:{out % 60:02d}:00"
+            photo = photo_hashes[person % len(photo_hashes)] if photo_hashes else None
+            yield (str(number + 1).rjust(3, "0"), name, address, rng.choice(PURPOSES),
+                   f"{hour:02d}:{minute:02d}:{rng.randrange(60):02d}", time_out, date, photo)
+
+
+def generate(path: str, rows: int, days: int = 365, photos: bool = False, photo_pool_size: int = 1000,
+             seed: int = 0, progress=None):
+    """Create the database at path (which must not exist) and fill it. Returns seconds taken."""
+    if os.path.exists(path):
+        raise FileExistsError(path)
+    started = time.perf_counter()
+    rng = random.Random(seed)
+    days = max(1, min(days, rows))
+    database.create_database(path)
+    db = database.Database(path)
+    try:
+        people = visitors(max(1, rows // 5), rng)
+        hashes = []
+        with db.write() as cursor:
+            if photos:
+                hashes = [database.store_photo(cursor, data) for data in photo_pool(min(photo_pool_size, len(people)), seed)]
+            triggers = database.drop_users_triggers(cursor)
+        batch, done = [], 0
+        for row in visit_rows(rows, days, people, hashes, rng):
+            batch.append(row)
+            if len(batch) == BATCH:
+                done += _insert(db, batch)
+                batch = []
+                if progress:
+                    progress(done, rows)
+        done += _insert(db, batch)
+        with db.write() as cursor:
+            database.restore_users_triggers(cursor, triggers)
+        with db.read() as conn:
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    finally:
+        db.close()
+    return time.perf_counter() - started
+
+
+def _insert(db, batch) -> int:
+    with db.write() as cursor:
+        cursor.executemany(
+            "INSERT INTO users (tag, name, address, purpose, time_in, time_out, date, photo_hash) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            batch
+        )
+    return len(batch)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--photos", action="store_true")
+    parser.add_argument("--photo-pool", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", required=True)
+    args = parser.parse_args()
+
+    seconds = generate(args.out, args.rows, args.days, args.photos, args.photo_pool, args.seed,
+                       progress=lambda done, total: print(f"\r{done}/{total}", end="", flush=True))
+    print(f"\n{args.rows} visits in {seconds:.1f} s, {os.path.getsize(args.out) / 2 ** 20:.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+# benchmarks/importer.py
+"""
+Bulk import throughput: rows per second importing a CSV of --rows visits
+into a database already holding --existing, three ways:
+
+  one by one   insert_visit in a transaction per visit, as the form saves them
+               (timed on the first --form-rows rows)
+  triggers     the importer's batches with the triggers on users left in place
+  importer     import_visits: triggers dropped per batch, derived tables caught up
+
+With --photos every visitor has a photo in a folder, imported as it is
+and cropped/re-encoded on the process pool.
+
+    python benchmarks/importer.py --rows 200000 --existing 1000000 --photos
+"""
+import argparse, csv, os, shutil, sys, tempfile, time, zlib
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import database, exporter, importer
+from generate import generate, photo_pool
+
+
+def write_input(workdir, rows, photos):
+    """The CSV of visits to import (and the photos folder it refers to)."""
+    source = os.path.join(workdir, "source.db")
+    generate(source, rows, seed=1)
+    db = database.Database(source)
+    try:
+        exporter.export_visits(db, os.path.join(workdir, "plain.csv"), "csv")
+    finally:
+        db.close()
+    if not photos:
+        return os.path.join(workdir, "plain.csv"), None
+    folder = os.path.join(workdir, "photos")
+    os.makedirs(folder)
+    pool = photo_pool(200, 1, size=480)
+    names = set()
+    with open(os.path.join(workdir, "plain.csv"), encoding="utf-8", newline="") as f_in, \
+            open(os.path.join(workdir, "photos.csv"), "w", encoding="utf-8", newline="") as f_out:
+        reader, writer = csv.reader(f_in), csv.writer(f_out)
+        writer.writerow(next(reader) + ["photo"])
+        for row in reader:
+            # one photo per visitor, shared by their visits
+            photo = f"{zlib.crc32(row[1].encode()):08x}.jpg"
+            if photo not in names:
+                names.add(photo)
+                with open(os.path.join(folder, photo), "wb") as f:
+                    f.write(pool[len(names) % len(pool)])
+            writer.writerow(row + [photo])
+    return os.path.join(workdir, "photos.csv"), folder
+
+
+def target(workdir, base, name):
+    path = os.path.join(workdir, f"{name}.db")
+    shutil.copyfile(base, path)
+    return database.Database(path)
+
+
+def one_by_one(db, csv_path, limit):
+    rows = []
+    for _, row in importer.read_rows(csv_path):
+        rows.append(importer.normalize(row))
+        if len(rows) == limit:
+            break
+    started = time.perf_counter()
+    for visit in rows:
+        with db.write() as cursor:
+            database.insert_visit(cursor, visit)
+    return len(rows) / (time.perf_counter() - started)
+
+
+def with_triggers(db, csv_path):
+    started, count, batch = time.perf_counter(), 0, []
+
+    def flush():
+        with db.write() as cursor:
+            cursor.executemany(importer.INSERT, [
+                (v["tag"], v["name"], v["address"], v["purpose"], v["time_in"], v["time_out"], v["date"], None,
+                 v["name"], v["date"]) for v in batch
+            ])
+
+    for _, row in importer.read_rows(csv_path):
+        batch.append(importer.normalize(row))
+        count += 1
+        if len(batch) == importer.BATCH:
+            flush()
+            batch = []
+    if batch:
+        flush()
+    return count / (time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--existing", type=int, default=100_000)
+    parser.add_argument("--form-rows", type=int, default=2000)
+    parser.add_argument("--photos", action="store_true")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        base = os.path.join(workdir, "base.db")
+        if args.existing:
+            generate(base, args.existing)
+        else:
+            database.create_database(base)
+        csv_path, _ = write_input(workdir, args.rows, False)
+        print(f"{args.rows} visits into a log of {args.existing}")
+
+        db = target(workdir, base, "form")
+        try:
+            print(f"  one by one   {one_by_one(db, csv_path, args.form_rows):9.0f} rows/s")
+        finally:
+            db.close()
+        db = target(workdir, base, "triggers")
+        try:
+            print(f"  triggers     {with_triggers(db, csv_path):9.0f} rows/s")
+        finally:
+            db.close()
+        db = target(workdir, base, "importer")
+        try:
+            report = importer.import_visits(db, csv_path)
+            print(f"  importer     {report['rows_per_s']:9.0f} rows/s")
+        finally:
+            db.close()
+
+        if args.photos:
+            photo_dir = os.path.join(workdir, "with-photos")
+            os.makedirs(photo_dir)
+            csv_path, folder = write_input(photo_dir, args.rows, True)
+            for process in (False, True):
+                db = target(workdir, base, f"photos-{process}")
+                try:
+                    report = importer.import_visits(db, csv_path, folder, process_photos=process)
+                finally:
+                    db.close()
+                label = "cropped on the pool" if process else "stored as they are"
+                print(f"  with photos, {label:<20} {report['rows_per_s']:9.0f} rows/s "
+                      f"({report['photos']} photos)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+# benchmarks/lookup.py
+"""
+Lookup latency for the save_record / load_record queries, before and after
+the schema migration.
+
+Builds a users table in the original layout (no indexes, dd/mm/YYYY dates),
+times the two lookups, upgrades the same file in place with
+database.migrate() and times them again.
+
+    python benchmarks/lookup.py --rows 1000000
+"""
+import argparse, datetime, os, random, sqlite3, statistics, sys, tempfile, time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import database
+
+START = datetime.date(2020, 1, 1)
+
+
+def populate(conn, rows, days):
+    conn.execute("""
+        CREATE TABLE users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, tag TEXT, name TEXT, address TEXT, purpose TEXT,
+            time_in TEXT, time_out TEXT, date TEXT, picture BLOB
+        )
+    """)
+    per_day = max(rows // days, 1)
+
+    def generate():
+        for i in range(rows):
+            day = START + datetime.timedelta(days=i // per_day)
+            yield (str(i % per_day).rjust(3, "0"), f"Visitor {i}", f"{i} Main Street", "meeting",
+                   "09:00:00", "17:00:00", day.strftime("%d/%m/%Y"))
+
+    conn.execute("BEGIN")
+    conn.executemany(
+        "INSERT INTO users (tag, name, address, purpose, time_in, time_out, date) VALUES (?, ?, ?, ?, ?, ?, ?)",
+        generate()
+    )
+    conn.execute("COMMIT")
+    return per_day
+
+
+def measure(conn, queries):
+    samples = []
+    for sql, params in queries:
+        start = time.perf_counter()
+        conn.execute(sql, params).fetchone()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def report(label, samples):
+    samples = sorted(samples)
+    p95 = samples[int(len(samples) * 0.95) - 1]
+    print(f"{label:<28} median {statistics.median(samples) * 1000:9.3f} ms   p95 {p95 * 1000:9.3f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--days", type=int, default=365 * 3)
+    parser.add_argument("--lookups", type=int, default=200)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        conn = sqlite3.connect(os.path.join(tmp, "bench.db"), isolation_level=None)
+        per_day = populate(conn, args.rows, args.days)
+        total_days = max(args.rows // per_day, 1)
+        rng = random.Random(0)
+        picks = [rng.randrange(args.rows) for _ in range(args.lookups)]
+
+        def queries(date_format):
+            by_tag, by_name = [], []
+            for i in picks:
+                date = (START + datetime.timedelta(days=min(i // per_day, total_days - 1))).strftime(date_format)
+                by_tag.append(("SELECT * FROM users WHERE tag=? AND date=?", (str(i % per_day).rjust(3, "0"), date)))
+                by_name.append(("SELECT * FROM users WHERE name=? AND date=?", (f"Visitor {i}", date)))
+            return by_tag, by_name
+
+        print(f"{args.rows} rows over {total_days} days, {args.lookups} lookups each")
+        by_tag, by_name = queries("%d/%m/%Y")
+        report("before: tag + date", measure(conn, by_tag))
+        report("before: name + date", measure(conn, by_name))
+
+        start = time.perf_counter()
+        database.migrate(conn)
+        print(f"migration to v{database.SCHEMA_VERSION}: {time.perf_counter() - start:.1f} s")
+
+        by_tag, by_name = queries("%Y-%m-%d")
+        report("after: tag + date", measure(conn, by_tag))
+        report("after: name + date", measure(conn, by_name))
+        first, last = START.isoformat(), (START + datetime.timedelta(days=30)).isoformat()
+        report("after: 30-day range count", measure(conn, [
+            ("SELECT COUNT(*) FROM users WHERE date BETWEEN ? AND ?", (first, last))
+        ] * 20))
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
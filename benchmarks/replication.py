@@ -0,0 +1,113 @@
+# benchmarks/replication.py
+"""
+Convergence time and bandwidth of multi-station sync.
+
+Three stations (A, B, C) each get a share of --changes check-ins; then
+half the visitors check out at a different gate than they came in
+through, with some checked out at two gates at once (a conflict) to
+show the later time winning everywhere. After each phase the stations
+sync in rounds until their visit tables are identical.
+
+Two topologies: "socket" is a line A <-> B <-> C over TCP (C only hears
+about A's visits through B), "file" is all three sharing one folder.
+
+    python benchmarks/replication.py --changes 1000 --photos
+"""
+import argparse, datetime, os, random, sys, tempfile, time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import database, sync
+
+SECRET = b"benchmark"
+
+
+def visits_state(db):
+    with db.read() as conn:
+        return sorted(conn.execute(f"SELECT {', '.join(database.VISIT_COLUMNS)} FROM users").fetchall(),
+                      key=lambda row: [str(v) for v in row])
+
+
+def setup(tmp, topology):
+    dbs = [database.Database(os.path.join(tmp, f"{topology}-{name}.db")) for name in "ABC"]
+    stations = [sync.Station(db) for db in dbs]
+    if topology == "socket":
+        servers = [sync.serve(station, "127.0.0.1", 0, secret=SECRET) for station in stations[1:]]
+        b_port, c_port = (server.server_address[1] for server in servers)
+        replicators = [
+            sync.Replicator(stations[0], [sync.SocketPeer("127.0.0.1", b_port, SECRET)]),
+            sync.Replicator(stations[1], [sync.SocketPeer("127.0.0.1", c_port, SECRET)]),
+        ]
+    else:
+        servers = []
+        folder = os.path.join(tmp, "share")
+        replicators = [sync.Replicator(station, [sync.FilePeer(folder)]) for station in stations]
+    return dbs, replicators, servers
+
+
+def converge(dbs, replicators, changes, tcp):
+    start = time.perf_counter()
+    rounds, sent = 0, 0
+    while True:
+        rounds += 1
+        for replicator in replicators:
+            stats = replicator.sync_once()
+            # over TCP both directions cross the wire; a shared folder is written once and read by many
+            sent += stats["sent"] + (stats["received"] if tcp else 0)
+        states = [visits_state(db) for db in dbs]
+        if all(state == states[0] for state in states) and not any(sync.Station(db).missing_photos() for db in dbs):
+            break
+        if rounds > 20:
+            raise RuntimeError("stations did not converge")
+    elapsed = time.perf_counter() - start
+    return (f"{rounds} rounds, {elapsed * 1000:8.1f} ms, {sent / 1024:9.1f} KiB transferred "
+            f"({sent * 1000 / changes / 1024:8.1f} KiB per 1k changes)")
+
+
+def run(tmp, topology, changes, photos):
+    rng = random.Random(0)
+    dbs, replicators, servers = setup(tmp, topology)
+    today = datetime.date.today().isoformat()
+    gate_of = {}
+    for i in range(changes):
+        gate = rng.randrange(3)
+        picture = os.urandom(8000) if photos else None
+        with dbs[gate].write() as cursor:
+            database.insert_visit(cursor, {"tag": str(i % 1000).rjust(3, "0"), "name": f"Visitor {i}",
+                                           "address": f"{i} Main Street", "purpose": "meeting",
+                                           "time_in": "08:00:00", "time_out": "", "date": today, "picture": picture})
+        gate_of[i] = gate
+    print(f"{topology:>6} check-ins:  {converge(dbs, replicators, changes, topology == 'socket')}")
+
+    checkouts = 0
+    for i in range(0, changes, 2):
+        gates = [(gate_of[i] + 1) % 3]
+        if i % 20 == 0:
+            gates.append((gate_of[i] + 2) % 3)
+        for n, gate in enumerate(gates):
+            with dbs[gate].write() as cursor:
+                database.update_visit(cursor, {"name": f"Visitor {i}", "date": today, "picture": None,
+                                               "time_out": f"17:{n:02d}:00"})
+            checkouts += 1
+    print(f"{topology:>6} check-outs: {converge(dbs, replicators, checkouts, topology == 'socket')}")
+    with dbs[0].read() as conn:
+        assert conn.execute("SELECT time_out FROM users WHERE name='Visitor 0'").fetchone()[0] == "17:01:00"
+
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+    for db in dbs:
+        db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--changes", type=int, default=1000)
+    parser.add_argument("--photos", action="store_true", help="attach an 8 KB picture to every check-in")
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as tmp:
+        for topology in ("socket", "file"):
+            run(tmp, topology, args.changes, args.photos)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+# benchmarks/scan.py
+"""
+Badge scan latency, scan to confirmation, over a log of --rows visits
+with --scans visitors pre-registered for today.
+
+"before" checks each visitor out the way /check-out did: look the tag
+up, then save the time_out through the write queue and wait for the
+commit. The queue runs with max_delay=0 here, so each check-out is
+committed on its own as soon as it is submitted rather than waiting
+for a batch to fill. "after" scans each tag twice with
+presence.Presence: the first scan checks the visitor in, the second
+checks them out. Both paths commit durably (synchronous=FULL), one
+transaction per scan. The target is under 10 ms per scan.
+
+    python benchmarks/scan.py --rows 1000000 --scans 2000
+"""
+import argparse, datetime, os, sys, tempfile, time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import database
+from generate import generate
+from presence import Presence, CHECK_IN, CHECK_OUT
+from records import Records
+from write_queue import WriteQueue
+
+
+def pre_register(db, count, time_in=""):
+    """count visits for today under tags no generated visit uses; returns the tags."""
+    today = datetime.date.today().isoformat()
+    tags = [str(10000 + i) for i in range(count)]
+    with db.write() as cursor:
+        for i, tag in enumerate(tags):
+            database.insert_visit(cursor, {"tag": tag, "name": f"Scan Visitor {i}", "address": f"{i} Gate Road",
+                                           "purpose": "meeting", "time_in": time_in, "time_out": "", "date": today})
+    return tags
+
+
+def before(db, write_queue, tags):
+    records = Records(db, write_queue)
+    latencies = []
+    for tag in tags:
+        t = time.perf_counter()
+        records.check_out(tag).result()
+        latencies.append(time.perf_counter() - t)
+    return latencies
+
+
+def after(db, write_queue, tags):
+    presence = Presence(db, write_queue)
+    latencies = {CHECK_IN: [], CHECK_OUT: []}
+    for expected in (CHECK_IN, CHECK_OUT):
+        for tag in tags:
+            t = time.perf_counter()
+            action = presence.scan(tag)["action"]
+            latencies[expected].append(time.perf_counter() - t)
+            assert action == expected, (tag, action)
+    return latencies
+
+
+def report(label, samples):
+    samples = sorted(samples)
+
+    def p(q):
+        return samples[int(len(samples) * q) - 1] * 1000
+    print(f"{label:>10}: p50 {p(.5):7.3f} ms  p95 {p(.95):7.3f} ms  p99 {p(.99):7.3f} ms  max {samples[-1] * 1000:7.3f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--scans", type=int, default=1000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        path = os.path.join(workdir, "scan.db")
+        generate(path, args.rows)
+        db = database.Database(path)
+        # no batching delay: one durable transaction per record, like a scan
+        write_queue = WriteQueue(db, path + "-writes.jsonl", max_delay=0)
+        try:
+            print(f"{args.scans} visitors in a log of {args.rows} visits")
+            report("before", before(db, write_queue, pre_register(db, args.scans, "08:00:00")))
+            with db.write() as cursor:
+                cursor.execute("DELETE FROM users WHERE name LIKE 'Scan Visitor %'")
+            latencies = after(db, write_queue, pre_register(db, args.scans))
+            report("check-in", latencies[CHECK_IN])
+            report("check-out", latencies[CHECK_OUT])
+        finally:
+            write_queue.close()
+            db.close()
+
+
+if __name__ == "__main__":
+    main()
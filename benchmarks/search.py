@@ -0,0 +1,84 @@
+# benchmarks/search.py
+"""
+View Logs search latency: first page (256 rows) of database.search_visits,
+the FTS5 query the viewer runs, compared with a LIKE scan over the same
+columns.
+
+    python benchmarks/search.py --rows 1000000
+"""
+import argparse, datetime, os, random, sqlite3, statistics, sys, tempfile, time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import database
+
+FIRST = ["Ada", "Bola", "Chidi", "Dayo", "Emeka", "Funke", "Grace", "Hassan", "Ife", "Jide", "Kemi", "Lola"]
+LAST = ["Okafor", "Adeyemi", "Bello", "Eze", "Ogunleye", "Nwosu", "Balogun", "Ibrahim", "Okonkwo", "Afolabi"]
+STREETS = ["Allen Avenue", "Broad Street", "Marina Road", "Awolowo Way", "Herbert Macaulay"]
+PURPOSES = ["meeting", "delivery", "interview", "maintenance", "visit", "audit"]
+SEARCHES = ["okafor", "grace bello", "marina", "delivery", "05/03/2024", "12", "zzz-no-match"]
+PAGE_SIZE = 256
+
+
+def populate(conn, rows):
+    rng = random.Random(0)
+    start = datetime.date(2020, 1, 1)
+
+    def generate():
+        for i in range(rows):
+            yield (str(rng.randrange(1000)).rjust(3, "0"), f"{rng.choice(FIRST)} {rng.choice(LAST)}",
+                   f"{rng.randrange(1, 200)} {rng.choice(STREETS)}", rng.choice(PURPOSES), "09:00:00", "17:00:00",
+                   (start + datetime.timedelta(days=i * 1500 // rows)).isoformat())
+
+    # bulk load with the sync triggers out of the way, then build the index once
+    conn.execute("BEGIN")
+    for trigger in ("users_fts_insert", "users_fts_update", "users_fts_delete"):
+        conn.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+    conn.executemany(
+        "INSERT INTO users (tag, name, address, purpose, time_in, time_out, date) VALUES (?, ?, ?, ?, ?, ?, ?)",
+        generate()
+    )
+    conn.execute("INSERT INTO users_fts (users_fts) VALUES ('rebuild')")
+    conn.execute("COMMIT")
+
+
+def timed(run, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        conn = sqlite3.connect(os.path.join(tmp, "bench.db"), isolation_level=None)
+        database.migrate(conn)
+        if not database.has_fts(conn):
+            sys.exit("this SQLite build has no FTS5")
+        start = time.perf_counter()
+        populate(conn, args.rows)
+        print(f"{args.rows} rows loaded and indexed in {time.perf_counter() - start:.1f} s")
+
+        cols = ["tag", "name", "address", "time_in", "purpose", "time_out", "date"]
+        like_sql = (f"SELECT id, {', '.join(cols)} FROM users WHERE "
+                    + " OR ".join(f"{c} LIKE ?" for c in cols) + " ORDER BY id LIMIT ?")
+
+        print(f"{'search':<16}{'matches':>10}{'fts5 ms':>12}{'like ms':>12}")
+        for text in SEARCHES:
+            query = database.fts_query(text)
+            matches = conn.execute("SELECT count(*) FROM users_fts WHERE users_fts MATCH ?", (query,)).fetchone()[0]
+            fts_ms = timed(lambda: database.search_visits(conn, cols, text, PAGE_SIZE), args.repeat)
+            like_params = [f"%{text}%"] * len(cols) + [PAGE_SIZE]
+            like_ms = timed(lambda: conn.execute(like_sql, like_params).fetchall(), args.repeat)
+            print(f"{text:<16}{matches:>10}{fts_ms:>12.2f}{like_ms:>12.2f}")
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+# benchmarks/service_load.py
+"""
+Load test for the headless HTTP service on localhost.
+
+Starts service.py in-process on a temporary database (or targets a
+running one with --port), then opens --clients keep-alive connections
+that each check a visitor in, look them up and check them out again.
+Reports requests per second and latency percentiles per endpoint.
+
+    python benchmarks/service_load.py --clients 200 --visits 20
+"""
+import argparse, asyncio, base64, json, os, statistics, sys, tempfile, threading, time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import service
+
+PICTURE = base64.b64encode(b"\xff\xd8" + os.urandom(12000)).decode("ascii")
+
+
+async def request(reader, writer, method, path, body=None):
+    data = json.dumps(body).encode() if body is not None else b""
+    writer.write(f"{method} {path} HTTP/1.1\r\nHost: localhost\r\nContent-Type: application/json\r\n"
+                 f"Content-Length: {len(data)}\r\n\r\n".encode() + data)
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b""):
+            break
+        if line.lower().startswith(b"content-length:"):
+            length = int(line.split(b":")[1])
+    return status, json.loads(await reader.readexactly(length))
+
+
+async def client(port, number, visits, with_photos, samples, errors):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    try:
+        for i in range(visits):
+            tag = str(number * visits + i)
+            steps = [
+                ("check-in", "POST", "/check-in", {"tag": tag, "name": f"Visitor {tag}", "address": "1 Main Street",
+                                                  "purpose": "meeting", "picture": PICTURE if with_photos else None}),
+                ("lookup", "GET", f"/visits/{tag}", None),
+                ("check-out", "POST", "/check-out", {"tag": tag}),
+            ]
+            for label, method, path, body in steps:
+                t = time.perf_counter()
+                status, _ = await request(reader, writer, method, path, body)
+                samples[label].append(time.perf_counter() - t)
+                if status >= 300:
+                    errors[label] += 1
+    finally:
+        writer.close()
+
+
+async def run(port, args):
+    samples = {label: [] for label in ("check-in", "lookup", "check-out")}
+    errors = dict.fromkeys(samples, 0)
+    start = time.perf_counter()
+    await asyncio.gather(*(client(port, n, args.visits, args.photos, samples, errors) for n in range(args.clients)))
+    elapsed = time.perf_counter() - start
+
+    total = sum(len(s) for s in samples.values())
+    print(f"{args.clients} clients, {total} requests in {elapsed:.2f} s: {total / elapsed:.0f} req/s")
+    for label, values in samples.items():
+        values.sort()
+        print(f"  {label:>9}: p50 {statistics.median(values) * 1000:7.2f} ms   "
+              f"p99 {values[int(len(values) * 0.99) - 1] * 1000:7.2f} ms   errors {errors[label]}")
+
+
+def start_service(db_path):
+    """Serve on an ephemeral port from a background thread; returns (service, port, stop)."""
+    svc = service.VisitService(db_path, os.path.dirname(db_path))
+    loop = asyncio.new_event_loop()
+    listening = threading.Event()
+    port = []
+    task = loop.create_task(service.serve(svc, "127.0.0.1", 0, ready=lambda p: (port.append(p), listening.set())))
+    thread = threading.Thread(target=lambda: loop.run_until_complete(asyncio.gather(task, return_exceptions=True)),
+                              daemon=True)
+    thread.start()
+    listening.wait()
+
+    def stop():
+        loop.call_soon_threadsafe(task.cancel)
+        thread.join()
+        svc.close()
+    return svc, port[0], stop
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=200)
+    parser.add_argument("--visits", type=int, default=10, help="visits per client")
+    parser.add_argument("--photos", action="store_true", help="send a 12 KB picture with each check-in")
+    parser.add_argument("--port", type=int, help="load an already running service instead")
+    args = parser.parse_args()
+
+    if args.port:
+        asyncio.run(run(args.port, args))
+        return
+    with tempfile.TemporaryDirectory() as tmp:
+        svc, port, stop = start_service(os.path.join(tmp, "service.db"))
+        try:
+            asyncio.run(run(port, args))
+            print(f"  write queue: {svc.write_queue.stats()}")
+        finally:
+            stop()
+
+
+if __name__ == "__main__":
+    main()
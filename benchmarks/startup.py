@@ -0,0 +1,126 @@
+# benchmarks/startup.py
+"""
+Time-to-first-window benchmark.
+
+Runs the app in a fresh interpreter (offscreen Qt) several times and
+reports how long it takes from interpreter start until the main window
+has been shown and the event loop has processed its first events, and
+until the face models (loaded in the background) are ready.
+
+    python benchmarks/startup.py --runs 5 --imports
+
+"before" reproduces the old startup path: OpenCV, the face models and
+the backup module imported and the cameras probed (indices 0-9) before
+the window is built. "after" is the current one.
+
+Warm runs reuse the bytecode cache. Cold runs get an empty one each
+(PYTHONPYCACHEPREFIX), so every module is compiled again, as on the first
+start after an install or upgrade; the OS file cache stays warm either way.
+--imports prints the modules that take longest to import on the
+current path (python -X importtime).
+"""
+import argparse, importlib, json, os, statistics, subprocess, sys, tempfile, threading, time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def child(mode):
+    start = time.perf_counter()
+    sys.path.insert(0, ROOT)
+    from PyQt5.QtWidgets import QApplication
+    from PyQt5.QtCore import QTimer
+    app = QApplication(sys.argv[:1])
+    if mode == "before":
+        # imported only for their cost: the old startup path loaded them up front
+        for name in ("cv2", "faces", "backup"):
+            importlib.import_module(name)
+        from camera import list_available_cameras
+        list_available_cameras()
+    import index
+    window = index.MainWindow()
+    window.show()
+    result = {"mode": mode}
+
+    def shown():
+        result["window"] = time.perf_counter() - start
+        poll()
+
+    def vision_ready():
+        # the recognizer is only built when the SFace model is installed; otherwise the detector is all there is
+        if window.face_recognizer is not None:
+            return True
+        loading = any(thread.name == "vision-loader" for thread in threading.enumerate())
+        return getattr(sys.modules.get("faces"), "_detector", None) is not None and not loading
+
+    def poll():
+        if not vision_ready() and time.perf_counter() - start < 30:
+            QTimer.singleShot(5, poll)
+            return
+        result["vision"] = time.perf_counter() - start
+        print(json.dumps(result))
+        window.close()
+        app.quit()
+
+    QTimer.singleShot(0, shown)
+    app.exec_()
+
+
+def run(mode, runs, cold=False, importtime=False):
+    # no replication or retention, and a scratch database instead of the real my_db.db
+    env = {key: value for key, value in os.environ.items() if not key.startswith("ACCESS_CONTROL_")}
+    env["QT_QPA_PLATFORM"] = os.environ.get("QT_QPA_PLATFORM", "offscreen")
+    args = [sys.executable] + (["-X", "importtime"] if importtime else []) + [__file__, "--child", mode]
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        env["ACCESS_CONTROL_DB"] = os.path.join(workdir, "startup.db")
+        for _ in range(runs):
+            with tempfile.TemporaryDirectory() as cache:
+                if cold:
+                    env["PYTHONPYCACHEPREFIX"] = cache
+                done = subprocess.run(args, env=env, capture_output=True, text=True, check=True)
+            results.append((json.loads(done.stdout.strip().splitlines()[-1]), done.stderr))
+    return results
+
+
+def import_breakdown(stderr, top=15):
+    """[(module, cumulative ms)] of the slowest imports, counting only modules imported at the top level."""
+    found = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if cumulative.strip().isdigit() and len(name) - len(name.lstrip()) <= 3:
+            found.append((name.strip(), int(cumulative) / 1000))
+    return sorted(found, key=lambda item: -item[1])[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--imports", action="store_true", help="print the import-time breakdown")
+    parser.add_argument("--child", choices=["before", "after"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.child)
+        return
+
+    for cold in (True, False):
+        for mode in ("before", "after"):
+            results = [result for result, _ in run(mode, args.runs, cold)]
+            window = [result["window"] * 1000 for result in results]
+            vision = [result["vision"] * 1000 for result in results]
+            print(f"{'cold' if cold else 'warm'} {mode:>6}: window median {statistics.median(window):7.1f} ms "
+                  f"(min {min(window):7.1f}, max {max(window):7.1f})   "
+                  f"face models ready {statistics.median(vision):7.1f} ms   ({args.runs} runs)")
+
+    if args.imports:
+        _, stderr = run("after", 1, importtime=True)[0]
+        print("\nslowest top-level imports on the current path (cumulative; cv2 and faces")
+        print("are imported on the vision-loader thread once the window is up):")
+        for name, ms in import_breakdown(stderr):
+            print(f"  {name:<28} {ms:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
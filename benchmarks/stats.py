@@ -0,0 +1,95 @@
+# benchmarks/stats.py
+"""
+Dashboard queries answered from the aggregate tables versus scanning the
+users table, and what keeping the aggregates costs a save.
+
+    python benchmarks/stats.py --rows 1000000
+"""
+import argparse, datetime, os, random, statistics, sys, tempfile, time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import database, stats
+
+PURPOSES = ["meeting", "delivery", "interview", "maintenance", "tour"]
+
+
+def visits(rng, count, days, start=0):
+    end = datetime.date.today()
+    for i in range(start, start + count):
+        yield (str(i % 500).rjust(3, "0"), f"Visitor {i}", f"{i} Main Street", rng.choice(PURPOSES),
+               f"{rng.randrange(7, 19):02d}:{rng.randrange(60):02d}:00", rng.choice(["", "17:30:00"]),
+               (end - datetime.timedelta(days=rng.randrange(days))).isoformat())
+
+
+def insert(db, rows):
+    with db.write() as cursor:
+        cursor.executemany(
+            "INSERT INTO users (tag, name, address, purpose, time_in, time_out, date) VALUES (?, ?, ?, ?, ?, ?, ?)", rows
+        )
+
+
+def timed(fn, repeat=20):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--saves", type=int, default=2000)
+    args = parser.parse_args()
+    rng = random.Random(0)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        database.create_database(path)
+        db = database.Database(path)
+        insert(db, visits(rng, args.rows, args.days))
+        today = datetime.date.today().isoformat()
+        first = (datetime.date.today() - datetime.timedelta(days=13)).isoformat()
+        print(f"{args.rows} visits over {args.days} days")
+
+        scans = {
+            "inside now": ("SELECT count(*) FROM users WHERE time_in<>'' AND time_out=''", ()),
+            "hourly, today": ("SELECT substr(time_in, 1, 2), count(*) FROM users WHERE date=? GROUP BY 1", (today,)),
+            "daily, 14 days": ("SELECT date, count(*) FROM users WHERE date BETWEEN ? AND ? GROUP BY 1", (first, today)),
+            "purposes, 14 days": ("SELECT purpose, count(*) FROM users WHERE date BETWEEN ? AND ? GROUP BY 1",
+                                  (first, today)),
+        }
+        aggregates = {
+            "inside now": lambda conn: stats.occupancy(conn),
+            "hourly, today": lambda conn: stats.hourly_counts(conn, today),
+            "daily, 14 days": lambda conn: stats.daily_counts(conn, first, today),
+            "purposes, 14 days": lambda conn: stats.purpose_counts(conn, first, today),
+        }
+        print(f"{'':<20} {'scan users':>12} {'aggregates':>12}")
+        with db.read() as conn:
+            for label, (sql, params) in scans.items():
+                scan = timed(lambda: conn.execute(sql, params).fetchall())
+                aggregate = timed(lambda: aggregates[label](conn))
+                print(f"{label:<20} {scan:9.3f} ms {aggregate:9.3f} ms")
+        print(f"{'whole dashboard':<20} {'':>12} {timed(lambda: stats.summary(db)):9.3f} ms")
+
+        # one visit per transaction, the way the write queue commits a quiet gate's saves
+        def save_each(drop_triggers):
+            with db.write() as cursor:
+                for trigger in drop_triggers:
+                    cursor.execute(f"DROP TRIGGER {trigger}")
+            start = time.perf_counter()
+            for row in visits(rng, args.saves, 1, start=args.rows):
+                insert(db, [row])
+            return (time.perf_counter() - start) / args.saves * 1e6
+
+        with_stats = save_each([])
+        without = save_each(["users_stats_insert", "users_stats_update", "users_stats_delete"])
+        print(f"save: {with_stats:.0f} us with aggregates, {without:.0f} us without")
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
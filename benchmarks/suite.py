@@ -0,0 +1,311 @@
+# benchmarks/suite.py
+"""
+Reproducible benchmark suite over synthetic visitor logs.
+
+For each --sizes a database is generated (benchmarks/generate.py, fixed
+seed, cached in --cache-dir) and copied to a scratch directory, then the
+operations the app spends its time on are timed headless (offscreen Qt):
+
+  save.submit / save.commit   Records.check_in until it returns / until its batch commits
+                              (the write queue's batching window, max_delay, is most of the latter)
+  load.hit / load.miss        Records.lookup of a tag checked in today / of an unused tag
+  view                        the log viewer's model and table until the first page is painted
+  filter                      set_filter and the first page of results (names, streets, a date)
+  export.csv / export.html    exporter.export_visits over the last --export-days days
+  camera.convert              CaptureWorker.convert of a frame (mirror, fit, RGB QImage)
+  camera.snapshot_jpeg/webp   encode_snapshot of a frame
+
+Camera frames come from --frames (any video cv2 can read) or, without
+it, synthetic 1280x720 frames (marked as such in the results). Results
+go to --out as JSON with the environment and git commit, so two versions
+can be compared:
+
+    python benchmarks/suite.py --sizes 1000 100000 1000000 --photos
+    python benchmarks/suite.py --compare results/old.json results/new.json
+"""
+import argparse, datetime, json, os, platform, shutil, sqlite3, statistics, subprocess, sys, tempfile, time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+import database
+from generate import generate
+
+FILTER_TERMS = ["Okafor", "Grace Bello", "Awolowo", "meeting"]
+# a slower median than this (old/new) is flagged by --compare
+REGRESSION = 1.10
+
+
+# ------------------------------
+# Timing
+# ------------------------------
+def measure(fn, repeat: int, warmup: int = 1):
+    """Milliseconds per call of fn(i) for i in range(repeat), after warmup untimed calls."""
+    for i in range(warmup):
+        fn(-1 - i)
+    samples = []
+    for i in range(repeat):
+        started = time.perf_counter()
+        fn(i)
+        samples.append((time.perf_counter() - started) * 1000)
+    return samples
+
+
+def summarize(samples):
+    ordered, mean = sorted(samples), statistics.fmean(samples)
+    return {
+        "n": len(ordered), "median_ms": statistics.median(ordered), "mean_ms": mean,
+        "p95_ms": ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))], "min_ms": ordered[0],
+        "max_ms": ordered[-1], "ops_per_s": 1000 / mean if mean else 0.0,
+    }
+
+
+# ------------------------------
+# Scenarios
+# ------------------------------
+def bench_records(db, workdir, repeat):
+    from records import Records, today
+    from write_queue import WriteQueue
+    queue = WriteQueue(db, os.path.join(workdir, "bench.db-writes.jsonl"))
+    records = Records(db, queue)
+    with db.read() as conn:
+        tags = [row[0] for row in conn.execute("SELECT tag FROM users WHERE date=? LIMIT ?", (today(), repeat))]
+    results = {}
+    try:
+        futures = []
+        results["save.submit"] = measure(
+            lambda i: futures.append(records.check_in("900", f"Bench Visitor {i}", "1 Bench Road", "benchmark")), repeat
+        )
+        queue.flush()
+        results["save.commit"] = measure(
+            lambda i: records.check_in("901", f"Bench Commit {i}", "1 Bench Road", "benchmark").result(), repeat
+        )
+        if tags:
+            results["load.hit"] = measure(lambda i: records.lookup(tags[i % len(tags)]), repeat)
+        results["load.miss"] = measure(lambda i: records.lookup("99999"), repeat)
+    finally:
+        queue.close()
+    return results
+
+
+def bench_viewer(db, repeat):
+    from PyQt5.QtWidgets import QApplication, QTableView
+    from thumbnails import ThumbnailStore
+    from viewer import VisitTableModel
+    app = QApplication.instance() or QApplication(sys.argv[:1])
+    store = ThumbnailStore(db)
+
+    def view(_):
+        model = VisitTableModel(db, store)
+        table = QTableView()
+        table.setModel(model)
+        table.resize(1000, 700)
+        table.show()
+        app.processEvents()
+        table.grab()
+        table.close()
+        model.drop_queued_thumbnails()
+
+    model = VisitTableModel(db, store)
+    # a dd/mm/YYYY date, the way the search box takes one
+    day = datetime.date.today().strftime("%d/%m/%Y")
+    filters = {"filter": filter_samples(model, FILTER_TERMS, repeat), "filter.date": filter_samples(model, [day], repeat)}
+    app.processEvents()
+    return dict(filters, view=measure(view, max(3, repeat // 5)))
+
+
+def filter_samples(model, terms, repeat):
+    """ms from typing one of terms into a cleared search box until the first page of matches is in."""
+    def search(i):
+        model.set_filter(terms[i % len(terms)])
+        if model.canFetchMore():
+            model.fetchMore()
+
+    def clear_then_search(i):
+        model.set_filter("")
+        started = time.perf_counter()
+        search(i)
+        return (time.perf_counter() - started) * 1000
+
+    clear_then_search(0)
+    return [clear_then_search(i) for i in range(repeat)]
+
+
+def bench_export(db, workdir, days, repeat):
+    import exporter
+    start = (datetime.date.today() - datetime.timedelta(days=days - 1)).isoformat() if days else None
+    results = {}
+    for type_of in ("csv", "html"):
+        path = os.path.join(workdir, f"export.{type_of}")
+        results[f"export.{type_of}"] = measure(lambda i: exporter.export_visits(db, path, type_of, start), repeat, 0)
+    with db.read() as conn:
+        rows = exporter.count_visits(conn, start)
+    return results, rows
+
+
+def camera_frames(path, count=60):
+    """(frames, source): frames read from the video at path, or synthetic ones."""
+    import cv2, numpy as np
+    if path:
+        cap = cv2.VideoCapture(path)
+        frames = []
+        while len(frames) < count:
+            ok, frame = cap.read()
+            if not ok:
+                break
+            frames.append(frame)
+        cap.release()
+        if not frames:
+            raise SystemExit(f"Could not read any frames from {path}")
+        return frames, os.path.basename(path)
+    rng = np.random.default_rng(0)
+    frames = []
+    for _ in range(min(count, 10)):
+        small = rng.integers(0, 255, (9, 16, 3), dtype=np.uint8)
+        frames.append(cv2.GaussianBlur(cv2.resize(small, (1280, 720), interpolation=cv2.INTER_CUBIC), (7, 7), 0))
+    return frames, "synthetic 1280x720"
+
+
+def bench_camera(frames_path, repeat):
+    from PyQt5.QtWidgets import QApplication
+    from camera import CaptureWorker, encode_snapshot
+    QApplication.instance() or QApplication(sys.argv[:1])
+    frames, source = camera_frames(frames_path)
+    worker = CaptureWorker(0)
+    results = {"camera.convert": measure(lambda i: worker.convert(frames[i % len(frames)]), repeat * 4)}
+    for format in ("jpeg", "webp"):
+        results[f"camera.snapshot_{format}"] = measure(
+            lambda i: encode_snapshot(frames[i % len(frames)], format=format), repeat
+        )
+    return results, source
+
+
+# ------------------------------
+# Runs
+# ------------------------------
+def cached_database(cache_dir, rows, photos, seed):
+    os.makedirs(cache_dir, exist_ok=True)
+    # generated visits end today, so a database is only reused on the day it was made
+    name = f"visits-{rows}{'-photos' if photos else ''}-s{seed}-v{database.SCHEMA_VERSION}-{datetime.date.today()}.db"
+    path = os.path.join(cache_dir, name)
+    if not os.path.exists(path):
+        print(f"  generating {rows} visits{' with photos' if photos else ''}...", flush=True)
+        try:
+            generate(path + ".part", rows, photos=photos, seed=seed)
+        except BaseException:
+            for suffix in ("", "-wal", "-shm"):
+                if os.path.exists(path + ".part" + suffix):
+                    os.remove(path + ".part" + suffix)
+            raise
+        os.replace(path + ".part", path)
+    return path
+
+
+def run_size(args, rows):
+    source = cached_database(args.cache_dir, rows, args.photos, args.seed)
+    with tempfile.TemporaryDirectory() as workdir:
+        path = os.path.join(workdir, "bench.db")
+        shutil.copyfile(source, path)
+        db = database.Database(path)
+        try:
+            timings = bench_records(db, workdir, args.repeat)
+            timings.update(bench_viewer(db, args.repeat))
+            exports, export_rows = bench_export(db, workdir, args.export_days, args.export_repeat)
+            timings.update(exports)
+        finally:
+            db.close()
+    return {
+        "rows": rows, "db_mb": round(os.path.getsize(source) / 2 ** 20, 1), "export_rows": export_rows,
+        "scenarios": {name: summarize(samples) for name, samples in timings.items() if samples},
+    }
+
+
+def environment():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                                text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=ROOT,
+                                    capture_output=True, text=True).stdout.strip())
+    except (OSError, subprocess.CalledProcessError):
+        commit, dirty = None, None
+    from PyQt5.QtCore import QT_VERSION_STR
+    try:
+        import cv2
+        opencv = cv2.__version__
+    except ImportError:
+        opencv = None
+    return {
+        "commit": commit, "dirty": dirty, "python": platform.python_version(), "sqlite": sqlite3.sqlite_version,
+        "qt": QT_VERSION_STR, "opencv": opencv, "platform": platform.platform(), "cpus": os.cpu_count(),
+        "qpa": os.environ.get("QT_QPA_PLATFORM"),
+    }
+
+
+def compare(old_path, new_path):
+    """Print old/new medians per size and scenario; returns the number of regressions."""
+    with open(old_path, encoding="utf-8") as f:
+        old = json.load(f)
+    with open(new_path, encoding="utf-8") as f:
+        new = json.load(f)
+    print(f"old {old['environment']['commit']} ({old['created']})  ->  new {new['environment']['commit']} ({new['created']})")
+    regressions = 0
+    sections = [("camera", old.get("camera", {}).get("scenarios", {}), new.get("camera", {}).get("scenarios", {}))]
+    sections += [(f"{size} rows", old["sizes"][size]["scenarios"], new["sizes"][size]["scenarios"])
+                 for size in new["sizes"] if size in old["sizes"]]
+    for title, before, after in sections:
+        print(f"\n{title}")
+        for name in after:
+            if name not in before:
+                continue
+            a, b = before[name]["median_ms"], after[name]["median_ms"]
+            ratio = b / a if a else float("inf")
+            flag = "  SLOWER" if ratio > REGRESSION else ""
+            regressions += bool(flag)
+            print(f"  {name:<22} {a:10.3f} -> {b:10.3f} ms  x{ratio:5.2f}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 100_000])
+    parser.add_argument("--photos", action="store_true", help="generate visits with photos")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=50, help="timed calls per scenario")
+    parser.add_argument("--export-repeat", type=int, default=3)
+    parser.add_argument("--export-days", type=int, default=30, help="days of visits to export (0 for all)")
+    parser.add_argument("--frames", help="video file to take camera frames from")
+    parser.add_argument("--cache-dir", default=os.path.join(tempfile.gettempdir(), "access-control-bench"))
+    parser.add_argument("--out", default=os.path.join(ROOT, "benchmarks", "results"))
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"))
+    args = parser.parse_args()
+
+    if args.compare:
+        sys.exit(1 if compare(*args.compare) else 0)
+
+    results = {
+        "created": datetime.datetime.now().isoformat(timespec="seconds"), "environment": environment(),
+        "config": {key: getattr(args, key) for key in ("sizes", "photos", "seed", "repeat", "export_repeat",
+                                                       "export_days", "frames")},
+        "sizes": {},
+    }
+    camera, source = bench_camera(args.frames, args.repeat)
+    results["camera"] = {"frames": source, "scenarios": {name: summarize(s) for name, s in camera.items()}}
+    for rows in args.sizes:
+        print(f"{rows} rows", flush=True)
+        results["sizes"][str(rows)] = run_size(args, rows)
+        for name, summary in results["sizes"][str(rows)]["scenarios"].items():
+            print(f"  {name:<16} median {summary['median_ms']:9.3f} ms  p95 {summary['p95_ms']:9.3f} ms  "
+                  f"({summary['n']} runs)")
+    for name, summary in results["camera"]["scenarios"].items():
+        print(f"{name:<22} median {summary['median_ms']:9.3f} ms  ({source})")
+
+    os.makedirs(args.out, exist_ok=True)
+    path = os.path.join(args.out, f"{datetime.datetime.now():%Y%m%d-%H%M%S}-{results['environment']['commit'] or 'nogit'}.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(f"results written to {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,219 @@
+# camera.py
+from PyQt5.QtCore import QObject, QThread, pyqtSignal
+from PyQt5.QtGui import QImage
+import os, sys, time, threading, collections
+import metrics
+
+# OpenCV (and NumPy with it) takes longer to import than the rest of the
+# app together, so it is imported where it is first used, never at startup.
+
+
+def camera_api_preference():
+    import cv2
+    return cv2.CAP_DSHOW if sys.platform.startswith("win") else 0
+
+
+def list_available_cameras(max_index_to_check=10, skip=()):
+    import cv2
+    available_cameras = []
+    for i in range(max_index_to_check):
+        if i in skip:
+            # already opened by us, probing it again would steal the device
+            available_cameras.append(i)
+            continue
+        cap = cv2.VideoCapture(i, camera_api_preference())
+        if cap.isOpened():
+            available_cameras.append(i)
+        cap.release()
+    return available_cameras
+
+
+IMAGE_ENCODINGS = {
+    # format: (extension, name of the cv2 quality flag)
+    "jpeg": (".jpg", "IMWRITE_JPEG_QUALITY"),
+    "webp": (".webp", "IMWRITE_WEBP_QUALITY"),
+}
+
+
+def snapshot_settings(environ=os.environ) -> dict:
+    """
+    encode_snapshot's size, quality and format for this install:
+
+        ACCESS_CONTROL_SNAPSHOT_FORMAT=jpeg     jpeg or webp
+        ACCESS_CONTROL_SNAPSHOT_QUALITY=90      1 to 100
+        ACCESS_CONTROL_SNAPSHOT_SIZE=200x200    width x height in pixels
+
+    Raises ValueError for a value encode_snapshot can't use.
+    """
+    format = environ.get("ACCESS_CONTROL_SNAPSHOT_FORMAT", "jpeg").strip().lower()
+    if format not in IMAGE_ENCODINGS:
+        raise ValueError(f"ACCESS_CONTROL_SNAPSHOT_FORMAT must be one of {', '.join(IMAGE_ENCODINGS)}, not {format!r}")
+    try:
+        quality = int(environ.get("ACCESS_CONTROL_SNAPSHOT_QUALITY", 90))
+        width, height = (int(side) for side in environ.get("ACCESS_CONTROL_SNAPSHOT_SIZE", "200x200").lower().split("x"))
+    except ValueError:
+        raise ValueError("ACCESS_CONTROL_SNAPSHOT_QUALITY is a number and ACCESS_CONTROL_SNAPSHOT_SIZE is WIDTHxHEIGHT")
+    if not 1 <= quality <= 100:
+        raise ValueError(f"ACCESS_CONTROL_SNAPSHOT_QUALITY must be between 1 and 100, not {quality}")
+    if width <= 0 or height <= 0:
+        raise ValueError(f"ACCESS_CONTROL_SNAPSHOT_SIZE must be positive, not {width}x{height}")
+    return {"size": (width, height), "quality": quality, "format": format}
+
+
+def encode_snapshot(frame, size=(200, 200), quality: int = 90, format: str = "jpeg") -> bytes:
+    """Resize a BGR frame to size and encode it in memory as JPEG or WebP."""
+    import cv2
+    if format not in IMAGE_ENCODINGS:
+        raise ValueError(f"Unsupported snapshot format: {format}")
+    extension, quality_flag = IMAGE_ENCODINGS[format]
+    quality_flag = getattr(cv2, quality_flag)
+    with metrics.timer(f"snapshot.encode_{format}"):
+        if size and (frame.shape[1], frame.shape[0]) != tuple(size):
+            frame = cv2.resize(frame, tuple(size), interpolation=cv2.INTER_AREA)
+        ok, encoded = cv2.imencode(extension, frame, [quality_flag, int(quality)])
+    if not ok:
+        raise ValueError(f"Could not encode snapshot as {format}")
+    return encoded.tobytes()
+
+
+class CameraDiscovery(QObject):
+    """
+    Enumerates camera devices on a worker thread and caches the result.
+    camerasChanged is emitted (queued onto the GUI thread) whenever the
+    list of devices differs from the previous scan.
+    """
+    camerasChanged = pyqtSignal(list)
+
+    def __init__(self, parent=None, ttl: float = 30.0, max_index_to_check: int = 10):
+        super().__init__(parent)
+        self.ttl = ttl
+        self.max_index_to_check = max_index_to_check
+        self.in_use = set()
+        self._cameras = []
+        self._scanned_at = None
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def cameras(self):
+        """Return the cached list, scheduling a rescan if it has expired."""
+        with self._lock:
+            cameras = list(self._cameras)
+            expired = self._scanned_at is None or time.monotonic() - self._scanned_at > self.ttl
+        if expired:
+            self.refresh()
+        return cameras
+
+    def refresh(self, force: bool = False):
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            fresh = self._scanned_at is not None and time.monotonic() - self._scanned_at <= self.ttl
+            if fresh and not force:
+                return
+            self._thread = threading.Thread(target=self._scan, name="camera-discovery", daemon=True)
+            self._thread.start()
+
+    def _scan(self):
+        found = list_available_cameras(self.max_index_to_check, skip=set(self.in_use))
+        with self._lock:
+            changed = found != self._cameras
+            self._cameras = found
+            self._scanned_at = time.monotonic()
+        if changed:
+            self.camerasChanged.emit(found)
+
+
+class CaptureWorker(QThread):
+    """
+    Owns a cv2.VideoCapture and does all per-frame work (read, mirror,
+    downscale, BGR->RGB, QImage) off the GUI thread. Converted frames go
+    into a small drop-oldest queue; frameReady tells the GUI to pull the
+    newest one with latest_frame().
+    """
+    frameReady = pyqtSignal()
+    failed = pyqtSignal(str)
+
+    def __init__(self, index: int, size=(450, 300), queue_size: int = 2, history: int = 5, parent=None):
+        super().__init__(parent)
+        self.index = index
+        self.size = size
+        self.frames = 0
+        self.dropped = 0
+        self.fps = 0.0
+        self._queue = collections.deque(maxlen=queue_size)
+        # last few full-resolution frames, for picking the sharpest snapshot
+        self._recent = collections.deque(maxlen=history)
+        self._lock = threading.Lock()
+        self._stopped = False
+
+    def run(self):
+        import cv2
+        cap = cv2.VideoCapture(self.index, camera_api_preference())
+        if not cap.isOpened():
+            cap.release()
+            self.failed.emit(f"Unable to access the camera (index {self.index}).")
+            return
+
+        window_start, window_frames = time.monotonic(), 0
+        read_timer, convert_timer = metrics.timer("camera.read"), metrics.timer("camera.convert")
+        try:
+            while not self._stopped:
+                with read_timer:
+                    ret, frame = cap.read()
+                if not ret:
+                    metrics.count("camera.read_failures")
+                    self.msleep(10)
+                    continue
+                with convert_timer:
+                    qimg = self.convert(frame)
+                with self._lock:
+                    self._recent.append(frame)
+                    if len(self._queue) == self._queue.maxlen:
+                        self.dropped += 1
+                        metrics.count("camera.dropped_frames")
+                    self._queue.append(qimg)
+                    self.frames += 1
+                self.frameReady.emit()
+
+                window_frames += 1
+                elapsed = time.monotonic() - window_start
+                if elapsed >= 1.0:
+                    self.fps = window_frames / elapsed
+                    window_start, window_frames = time.monotonic(), 0
+        finally:
+            cap.release()
+
+    def convert(self, frame):
+        """Mirror, fit into self.size keeping aspect ratio, and wrap as an RGB QImage."""
+        import cv2
+        h, w = frame.shape[:2]
+        target_w, target_h = self.size
+        scale = min(target_w / w, target_h / h)
+        if scale != 1:
+            frame = cv2.resize(frame, (max(int(w * scale), 1), max(int(h * scale), 1)), interpolation=cv2.INTER_AREA)
+        frame_rgb = cv2.cvtColor(cv2.flip(frame, 1), cv2.COLOR_BGR2RGB)
+        h, w, ch = frame_rgb.shape
+        # copy() so the QImage owns its buffer once frame_rgb goes away
+        return QImage(frame_rgb.data, w, h, ch * w, QImage.Format_RGB888).copy()
+
+    def latest_frame(self):
+        """Return the newest converted frame (or None); older queued frames are dropped."""
+        with self._lock:
+            if not self._queue:
+                return None
+            qimg = self._queue.pop()
+            self.dropped += len(self._queue)
+            self._queue.clear()
+        return qimg
+
+    def recent_raw_frames(self):
+        """Copies of the last few full-resolution BGR frames, oldest first."""
+        with self._lock:
+            return [frame.copy() for frame in self._recent]
+
+    def stats(self):
+        return {"fps": round(self.fps, 1), "frames": self.frames, "dropped": self.dropped}
+
+    def stop(self):
+        self._stopped = True
+        self.wait()
@@ -0,0 +1,109 @@
+# dashboard.py
+from PyQt5.QtWidgets import (
+    QDialog, QWidget, QLabel, QVBoxLayout, QHBoxLayout, QTableWidget, QTableWidgetItem, QHeaderView, QSizePolicy
+)
+from PyQt5.QtCore import Qt, QTimer, QRectF
+from PyQt5.QtGui import QPainter, QColor
+import stats
+
+
+class HourlyChart(QWidget):
+    """Bar chart of check-ins per hour of the day."""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.hours = [0] * 24
+        self.setMinimumHeight(140)
+        self.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
+
+    def set_hours(self, hours):
+        self.hours = hours
+        self.update()
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        painter.setRenderHint(QPainter.Antialiasing)
+        label_height = painter.fontMetrics().height() + 2
+        width = self.width() / 24
+        height = self.height() - 2 * label_height
+        peak = max(self.hours) or 1
+        for hour, visits in enumerate(self.hours):
+            bar = height * visits / peak
+            x = hour * width
+            painter.fillRect(QRectF(x + 1, label_height + height - bar, width - 2, bar), QColor("#3a8ee6"))
+            painter.setPen(self.palette().windowText().color())
+            if visits:
+                painter.drawText(QRectF(x, label_height + height - bar - label_height, width, label_height),
+                                 Qt.AlignCenter, str(visits))
+            if hour % 3 == 0:
+                painter.drawText(QRectF(x, self.height() - label_height, width * 3, label_height),
+                                 Qt.AlignLeft, f"{hour:02d}h")
+        painter.end()
+
+
+class Dashboard(QDialog):
+    """Live occupancy and traffic figures, refreshed every few seconds from stats.summary."""
+
+    REFRESH_MS = 5000
+
+    def __init__(self, db, parent=None):
+        super().__init__(parent)
+        self.db = db
+        self.setWindowTitle("Dashboard")
+        self.resize(720, 560)
+
+        layout = QVBoxLayout(self)
+        figures = QHBoxLayout()
+        self.inside_label = QLabel()
+        self.visits_label = QLabel()
+        for label in (self.inside_label, self.visits_label):
+            label.setAlignment(Qt.AlignCenter)
+            label.setStyleSheet("font-size: 18px; font-weight: bold;")
+            figures.addWidget(label)
+        layout.addLayout(figures)
+
+        layout.addWidget(QLabel("Check-ins by hour today"))
+        self.chart = HourlyChart()
+        layout.addWidget(self.chart)
+
+        tables = QHBoxLayout()
+        self.daily_table = self._table(["Date", "Visits", "Still inside"])
+        self.purpose_table = self._table(["Purpose", "Visits"])
+        self.inside_table = self._table(["Tag", "Name", "Purpose", "Time in"])
+        for title, table in (("Last 14 days", self.daily_table), ("Purposes", self.purpose_table),
+                             ("Inside now", self.inside_table)):
+            column = QVBoxLayout()
+            column.addWidget(QLabel(title))
+            column.addWidget(table)
+            tables.addLayout(column)
+        layout.addLayout(tables)
+
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.refresh)
+        self.timer.start(self.REFRESH_MS)
+        self.refresh()
+
+    @staticmethod
+    def _table(headers):
+        table = QTableWidget(0, len(headers))
+        table.setHorizontalHeaderLabels(headers)
+        table.setEditTriggers(QTableWidget.NoEditTriggers)
+        table.verticalHeader().setVisible(False)
+        table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        return table
+
+    @staticmethod
+    def _fill(table, rows):
+        table.setRowCount(len(rows))
+        for r, row in enumerate(rows):
+            for c, value in enumerate(row):
+                table.setItem(r, c, QTableWidgetItem(str(value)))
+
+    def refresh(self):
+        summary = stats.summary(self.db)
+        self.inside_label.setText(f"Inside now: {summary['inside']}")
+        self.visits_label.setText(f"Visits today: {summary['visits']}")
+        self.chart.set_hours(summary["hourly"])
+        self._fill(self.daily_table, list(reversed(summary["daily"])))
+        self._fill(self.purpose_table, summary["purposes"])
+        self._fill(self.inside_table, summary["inside_visits"])
@@ -0,0 +1,652 @@
+# database.py
+import sqlite3, datetime, hashlib, re, threading, queue, contextlib
+
+DISPLAY_DATE_FORMAT = "%d/%m/%Y"
+ISO_DATE_FORMAT = "%Y-%m-%d"
+
+
+def to_iso_date(text: str) -> str:
+    """'31/12/2024' -> '2024-12-31'. ISO input is returned unchanged."""
+    text = (text or "").strip()
+    if not text:
+        return text
+    try:
+        return datetime.datetime.strptime(text, DISPLAY_DATE_FORMAT).strftime(ISO_DATE_FORMAT)
+    except ValueError:
+        return text
+
+
+def to_display_date(text: str) -> str:
+    """'2024-12-31' -> '31/12/2024'. Anything that isn't ISO is returned unchanged."""
+    text = (text or "").strip()
+    if not text:
+        return text
+    try:
+        return datetime.datetime.strptime(text, ISO_DATE_FORMAT).strftime(DISPLAY_DATE_FORMAT)
+    except ValueError:
+        return text
+
+
+# ------------------------------
+# Schema migrations
+# ------------------------------
+# Each migration upgrades the schema by exactly one version. The version a
+# database is at lives in PRAGMA user_version, so existing my_db.db files
+# (version 0) are brought up to date in place the next time they are opened.
+# Never edit a migration once released, append a new one instead.
+
+def _v1_create_users(cursor):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            tag TEXT,
+            name TEXT,
+            address TEXT,
+            purpose TEXT,
+            time_in TEXT,
+            time_out TEXT,
+            date TEXT,
+            picture BLOB
+        )
+    """)
+
+
+def _v2_iso_dates_and_indexes(cursor):
+    # dd/mm/YYYY -> YYYY-MM-DD so dates sort and range-query correctly
+    cursor.execute("""
+        UPDATE users
+        SET date = substr(date, 7, 4) || '-' || substr(date, 4, 2) || '-' || substr(date, 1, 2)
+        WHERE date GLOB '[0-9][0-9]/[0-9][0-9]/[0-9][0-9][0-9][0-9]'
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_users_tag_date ON users (tag, date)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_users_name_date ON users (name, date)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_users_date ON users (date)")
+
+
+def _v3_photo_store(cursor):
+    # Pictures move out of users into a content-addressed photos table;
+    # users keeps only the sha256 of the JPEG. users is rebuilt rather than
+    # ALTERed so the old BLOB pages are actually released.
+    cursor.connection.create_function("sha256_hex", 1, lambda data: photo_hash(data) if data else None)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS photos (
+            hash TEXT PRIMARY KEY,
+            data BLOB NOT NULL
+        )
+    """)
+    cursor.execute("""
+        INSERT OR IGNORE INTO photos (hash, data)
+        SELECT sha256_hex(picture), picture FROM users WHERE picture IS NOT NULL AND length(picture) > 0
+    """)
+    cursor.execute("""
+        CREATE TABLE users_new (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            tag TEXT,
+            name TEXT,
+            address TEXT,
+            purpose TEXT,
+            time_in TEXT,
+            time_out TEXT,
+            date TEXT,
+            photo_hash TEXT REFERENCES photos (hash)
+        )
+    """)
+    cursor.execute("""
+        INSERT INTO users_new (id, tag, name, address, purpose, time_in, time_out, date, photo_hash)
+        SELECT id, tag, name, address, purpose, time_in, time_out, date, sha256_hex(picture) FROM users
+    """)
+    cursor.execute("DROP TABLE users")
+    cursor.execute("ALTER TABLE users_new RENAME TO users")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_users_tag_date ON users (tag, date)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_users_name_date ON users (name, date)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_users_date ON users (date)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_users_photo_hash ON users (photo_hash)")
+
+
+FTS_COLUMNS = ["tag", "name", "address", "purpose", "date"]
+
+
+def fts5_available(conn) -> bool:
+    try:
+        conn.execute("CREATE VIRTUAL TABLE temp.fts5_probe USING fts5(x)")
+        conn.execute("DROP TABLE temp.fts5_probe")
+        return True
+    except sqlite3.OperationalError:
+        return False
+
+
+def _v4_full_text_search(cursor):
+    # External-content FTS5 index over the searchable columns, kept in sync
+    # by triggers. Builds without FTS5 skip it and the viewer falls back to LIKE.
+    if not fts5_available(cursor.connection):
+        return
+    cols = ", ".join(FTS_COLUMNS)
+    new_cols = ", ".join(f"new.{col}" for col in FTS_COLUMNS)
+    old_cols = ", ".join(f"old.{col}" for col in FTS_COLUMNS)
+    cursor.execute(f"""
+        CREATE VIRTUAL TABLE IF NOT EXISTS users_fts USING fts5(
+            {cols}, content='users', content_rowid='id', prefix='2 3'
+        )
+    """)
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS users_fts_insert AFTER INSERT ON users BEGIN
+            INSERT INTO users_fts (rowid, {cols}) VALUES (new.id, {new_cols});
+        END
+    """)
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS users_fts_delete AFTER DELETE ON users BEGIN
+            INSERT INTO users_fts (users_fts, rowid, {cols}) VALUES ('delete', old.id, {old_cols});
+        END
+    """)
+    # only edits to indexed columns touch the index, a checkout doesn't
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS users_fts_update AFTER UPDATE OF {cols} ON users BEGIN
+            INSERT INTO users_fts (users_fts, rowid, {cols}) VALUES ('delete', old.id, {old_cols});
+            INSERT INTO users_fts (rowid, {cols}) VALUES (new.id, {new_cols});
+        END
+    """)
+    cursor.execute("INSERT INTO users_fts (users_fts) VALUES ('rebuild')")
+
+
+def _v5_meta(cursor):
+    # small key/value store for bookkeeping (e.g. the write queue's journal position)
+    cursor.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value)")
+
+
+def _v6_face_embeddings(cursor):
+    # one vector per stored photo, from the embedding model that last processed it
+    # (see faces.FaceRecognizer)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS face_embeddings (
+            photo_hash TEXT PRIMARY KEY REFERENCES photos (hash),
+            model TEXT NOT NULL,
+            vector BLOB NOT NULL
+        )
+    """)
+
+
+def _v7_photo_thumbnails(cursor):
+    # small pre-rendered JPEGs so displaying a photo never decodes the full
+    # image twice; kept apart from photos so reading them skips the big BLOBs
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS photo_thumbnails (
+            hash TEXT PRIMARY KEY REFERENCES photos (hash),
+            data BLOB NOT NULL
+        )
+    """)
+
+
+def _v8_change_log(cursor):
+    # Every insert or edit of a visit bumps it to the end of the change log;
+    # replication ships the visits changed since a peer's last seq (see sync.py).
+    # One row per visit, so the log is never longer than users.
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS changes (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            visit_id INTEGER NOT NULL UNIQUE
+        )
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS users_change_insert AFTER INSERT ON users BEGIN
+            INSERT OR REPLACE INTO changes (visit_id) VALUES (new.id);
+        END
+    """)
+    columns = ["tag", "name", "address", "purpose", "time_in", "time_out", "date", "photo_hash"]
+    cols = ", ".join(columns)
+    changed = " OR ".join(f"old.{col} IS NOT new.{col}" for col in columns)
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS users_change_update AFTER UPDATE OF {cols} ON users
+        WHEN {changed} BEGIN
+            INSERT OR REPLACE INTO changes (visit_id) VALUES (new.id);
+        END
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS users_change_delete AFTER DELETE ON users BEGIN
+            DELETE FROM changes WHERE visit_id = old.id;
+        END
+    """)
+    # history recorded before the log existed goes out with the first sync
+    cursor.execute("INSERT OR IGNORE INTO changes (visit_id) SELECT id FROM users ORDER BY id")
+
+
+# tags padded the way lookups ask for them
+_PADDED_TAG = "CASE WHEN length(COALESCE({row}tag, '')) < 3 THEN substr('000' || COALESCE({row}tag, ''), -3) ELSE {row}tag END"
+
+
+def _stats_upsert(row: str, sign: int) -> str:
+    # adds (sign=1) or takes back (sign=-1) one visit's share of the aggregates;
+    # a visit not checked in yet (a pre-registration, no time_in) has none
+    is_open = f"(COALESCE({row}.time_out, '') = '')"
+    checked_in = f"COALESCE({row}.time_in, '') <> ''"
+    return f"""
+        INSERT INTO stats_daily (date, visits, open) SELECT {row}.date, {sign}, {sign} * {is_open} WHERE {checked_in}
+            ON CONFLICT (date) DO UPDATE SET visits = visits + excluded.visits, open = open + excluded.open;
+        INSERT INTO stats_hourly (date, hour, visits)
+            SELECT {row}.date, CAST(substr({row}.time_in, 1, 2) AS INTEGER), {sign} WHERE {checked_in}
+            ON CONFLICT (date, hour) DO UPDATE SET visits = visits + excluded.visits;
+        INSERT INTO stats_purpose (date, purpose, visits)
+            SELECT {row}.date, COALESCE({row}.purpose, ''), {sign} WHERE {checked_in}
+            ON CONFLICT (date, purpose) DO UPDATE SET visits = visits + excluded.visits;
+    """
+
+
+def rebuild_statistics(cursor):
+    """Recompute the stats_* tables and open_visits from users (they are normally kept up to date by triggers)."""
+    for table in ("stats_daily", "stats_hourly", "stats_purpose", "open_visits"):
+        cursor.execute(f"DELETE FROM {table}")
+    _count_statistics(cursor)
+
+
+def _count_statistics(cursor, after_id: int = 0):
+    # adds the visits with an id above after_id to the aggregates; pre-registrations don't count
+    cursor.execute("""
+        INSERT INTO stats_daily (date, visits, open)
+        SELECT date, count(*), sum(COALESCE(time_out, '') = '') FROM users
+        WHERE id > ? AND COALESCE(time_in, '') <> '' GROUP BY date
+        ON CONFLICT (date) DO UPDATE SET visits = visits + excluded.visits, open = open + excluded.open
+    """, (after_id,))
+    cursor.execute("""
+        INSERT INTO stats_hourly (date, hour, visits)
+        SELECT date, CAST(substr(time_in, 1, 2) AS INTEGER), count(*) FROM users
+        WHERE id > ? AND COALESCE(time_in, '') <> '' GROUP BY 1, 2
+        ON CONFLICT (date, hour) DO UPDATE SET visits = visits + excluded.visits
+    """, (after_id,))
+    cursor.execute("""
+        INSERT INTO stats_purpose (date, purpose, visits)
+        SELECT date, COALESCE(purpose, ''), count(*) FROM users
+        WHERE id > ? AND COALESCE(time_in, '') <> '' GROUP BY 1, 2
+        ON CONFLICT (date, purpose) DO UPDATE SET visits = visits + excluded.visits
+    """, (after_id,))
+    cursor.execute(f"""
+        INSERT OR REPLACE INTO open_visits (visit_id, tag, date)
+        SELECT id, {_PADDED_TAG.format(row="")}, date FROM users WHERE id > ? AND COALESCE(time_in, '') <> '' AND COALESCE(time_out, '') = ''
+    """, (after_id,))
+
+
+def _v9_statistics(cursor):
+    # Aggregates kept current by triggers on users, so the dashboard (see
+    # stats.py) reads a handful of rows instead of scanning the log.
+    # open_visits lists the visits checked in and not checked out yet, with
+    # the padded tag a badge scan looks them up by (see presence.py).
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS stats_daily (
+            date TEXT PRIMARY KEY, visits INTEGER NOT NULL, open INTEGER NOT NULL
+        ) WITHOUT ROWID
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS stats_hourly (
+            date TEXT, hour INTEGER, visits INTEGER NOT NULL, PRIMARY KEY (date, hour)
+        ) WITHOUT ROWID
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS stats_purpose (
+            date TEXT, purpose TEXT, visits INTEGER NOT NULL, PRIMARY KEY (date, purpose)
+        ) WITHOUT ROWID
+    """)
+    cursor.execute("CREATE TABLE IF NOT EXISTS open_visits (visit_id INTEGER PRIMARY KEY, tag TEXT NOT NULL, date TEXT NOT NULL)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_open_visits_date ON open_visits (date)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_open_visits_tag ON open_visits (tag)")
+    tag = _PADDED_TAG.format(row="new.")
+    is_open = "COALESCE(new.time_in, '') <> '' AND COALESCE(new.time_out, '') = ''"
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS users_stats_insert AFTER INSERT ON users BEGIN
+            {_stats_upsert("new", 1)}
+            INSERT OR REPLACE INTO open_visits (visit_id, tag, date) SELECT new.id, {tag}, new.date WHERE {is_open};
+        END
+    """)
+    # a checkout (the common update) moves one visit out of open_visits
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS users_stats_update AFTER UPDATE OF tag, date, time_in, purpose, time_out ON users
+        WHEN old.tag IS NOT new.tag OR old.date IS NOT new.date OR old.time_in IS NOT new.time_in OR old.purpose IS NOT new.purpose
+            OR old.time_out IS NOT new.time_out BEGIN
+            {_stats_upsert("old", -1)}
+            {_stats_upsert("new", 1)}
+            DELETE FROM open_visits WHERE visit_id = old.id;
+            INSERT OR REPLACE INTO open_visits (visit_id, tag, date) SELECT new.id, {tag}, new.date WHERE {is_open};
+        END
+    """)
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS users_stats_delete AFTER DELETE ON users BEGIN
+            {_stats_upsert("old", -1)}
+            DELETE FROM open_visits WHERE visit_id = old.id;
+        END
+    """)
+    rebuild_statistics(cursor)
+
+
+MIGRATIONS = [
+    _v1_create_users,
+    _v2_iso_dates_and_indexes,
+    _v3_photo_store,
+    _v4_full_text_search,
+    _v5_meta,
+    _v6_face_embeddings,
+    _v7_photo_thumbnails,
+    _v8_change_log,
+    _v9_statistics,
+]
+
+SCHEMA_VERSION = len(MIGRATIONS)
+
+
+# Bulk loads: per-row triggers keep the full-text index, change log and
+# statistics in step with users, which is most of the cost of a big
+# insert. Drop them, insert, then put them back and bring what they
+# maintain up to date for the new rows in a few set-based statements,
+# all in one transaction so no other writer ever sees users without them.
+
+def drop_users_triggers(cursor):
+    """Drop every trigger on users and return their definitions for restore_users_triggers."""
+    triggers = cursor.execute("SELECT name, sql FROM sqlite_master WHERE type='trigger' AND tbl_name='users'").fetchall()
+    for name, _ in triggers:
+        cursor.execute(f"DROP TRIGGER {name}")
+    return [sql for _, sql in triggers]
+
+
+def restore_users_triggers(cursor, triggers, after_id: int = 0):
+    """
+    Recreate the triggers drop_users_triggers returned and do their work
+    for the visits inserted meanwhile (every id above after_id). Only
+    inserts are caught up: don't update or delete visits without triggers.
+    """
+    for sql in triggers:
+        cursor.execute(sql)
+    if has_fts(cursor.connection):
+        cols = ", ".join(FTS_COLUMNS)
+        cursor.execute(f"INSERT INTO users_fts (rowid, {cols}) SELECT id, {cols} FROM users WHERE id > ?", (after_id,))
+    cursor.execute("INSERT OR REPLACE INTO changes (visit_id) SELECT id FROM users WHERE id > ? ORDER BY id", (after_id,))
+    _count_statistics(cursor, after_id)
+
+
+def schema_version(conn) -> int:
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(conn):
+    """Apply every pending migration, each in its own transaction."""
+    version = schema_version(conn)
+    if version > SCHEMA_VERSION:
+        raise RuntimeError(f"Database schema version {version} is newer than this app supports ({SCHEMA_VERSION}).")
+    for number, migration in enumerate(MIGRATIONS[version:], start=version + 1):
+        cursor = conn.cursor()
+        try:
+            cursor.execute("BEGIN")
+            migration(cursor)
+            # PRAGMA doesn't accept bound parameters
+            cursor.execute(f"PRAGMA user_version = {number}")
+            cursor.execute("COMMIT")
+        except Exception:
+            cursor.execute("ROLLBACK")
+            raise
+
+    # give back the space of rebuilt tables if a migration left lots of free pages
+    if version < SCHEMA_VERSION:
+        free_pages = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        total_pages = conn.execute("PRAGMA page_count").fetchone()[0]
+        if total_pages and free_pages / total_pages > 0.25:
+            conn.execute("VACUUM")
+    return schema_version(conn)
+
+
+def has_fts(conn, schema: str = "main") -> bool:
+    return conn.execute(f"SELECT 1 FROM {schema}.sqlite_master WHERE name='users_fts'").fetchone() is not None
+
+
+def fts_query(text: str) -> str:
+    """
+    Turn what was typed in the search box into an FTS5 MATCH expression:
+    every word must match as a prefix, so '05/03/20' finds 2024-03-05.
+    Returns '' if there is nothing to search for.
+    """
+    return " ".join(f'"{token}"*' for token in re.findall(r"\w+", text or ""))
+
+
+# bm25 has to score every match before it can return the best one, which
+# gets slow for words half the log contains. Above this many matches the
+# results come back newest first instead, which FTS5 can stream.
+RANKED_MATCH_LIMIT = 5000
+
+
+def search_visits(conn, columns, text: str, limit: int, offset: int = 0):
+    """Rows (id, *columns) of users matching text in the FTS index."""
+    query = fts_query(text)
+    if not query:
+        return []
+    matches = conn.execute(
+        "SELECT count(*) FROM (SELECT rowid FROM users_fts WHERE users_fts MATCH ? LIMIT ?)",
+        (query, RANKED_MATCH_LIMIT + 1)
+    ).fetchone()[0]
+    order = "rank" if matches <= RANKED_MATCH_LIMIT else "users_fts.rowid DESC"
+    cols = ", ".join(f"u.{col}" for col in columns)
+    return conn.execute(f"""
+        SELECT u.id, {cols} FROM users_fts JOIN users u ON u.id = users_fts.rowid
+        WHERE users_fts MATCH ? ORDER BY {order} LIMIT ? OFFSET ?
+    """, (query, limit, offset)).fetchall()
+
+
+def create_database(db_path: str):
+    conn = sqlite3.connect(db_path, isolation_level=None)
+    try:
+        migrate(conn)
+    finally:
+        conn.close()
+
+
+# ------------------------------
+# Connections
+# ------------------------------
+PRAGMAS = {
+    "journal_mode": "WAL",      # readers never block the writer and vice versa
+    "synchronous": "NORMAL",    # durable at checkpoints, safe against corruption in WAL mode
+    "cache_size": -16000,       # 16 MB page cache per connection
+    "mmap_size": 268435456,     # read pages through a 256 MB memory map
+    "temp_store": "MEMORY",
+    "busy_timeout": 5000,
+}
+
+# statements compiled and kept per connection (sqlite3's own cache, default 128)
+STATEMENT_CACHE_SIZE = 256
+
+
+# SQLite attaches at most 10 databases to a connection
+ATTACH_GROUP = 8
+
+
+def attach_each(conn, paths, group: int = ATTACH_GROUP):
+    """
+    Attach the database files in paths to conn a group at a time and yield
+    the schema name each is attached under. A group is detached when the
+    caller moves on to the next, so finish reading a schema before asking
+    for the next one. conn must not be inside a transaction.
+    """
+    paths = list(paths)
+    for start in range(0, len(paths), group):
+        schemas = []
+        try:
+            for path in paths[start:start + group]:
+                schema = f"attached{len(schemas)}"
+                conn.execute(f"ATTACH DATABASE ? AS {schema}", (path,))
+                schemas.append(schema)
+            yield from schemas
+        finally:
+            for schema in schemas:
+                conn.execute(f"DETACH DATABASE {schema}")
+
+
+def connect(db_path: str):
+    conn = sqlite3.connect(
+        db_path, isolation_level=None, check_same_thread=False, cached_statements=STATEMENT_CACHE_SIZE
+    )
+    for pragma, value in PRAGMAS.items():
+        conn.execute(f"PRAGMA {pragma} = {value}")
+    return conn
+
+
+class Database:
+    """
+    Long-lived connections to one database file: a single writer
+    connection, serialised by a lock, and a pool of up to `readers`
+    reader connections handed out one thread at a time. In WAL mode a
+    viewer or an export holding a reader never stalls a save.
+
+        with db.write() as cursor:   # BEGIN IMMEDIATE ... COMMIT
+            cursor.execute("INSERT ...")
+        with db.read() as conn:
+            conn.execute("SELECT ...").fetchall()
+    """
+
+    def __init__(self, db_path: str, readers: int = 4):
+        self.db_path = db_path
+        self._writer = connect(db_path)
+        migrate(self._writer)
+        self._write_lock = threading.RLock()
+        self._readers = queue.LifoQueue()
+        self._reader_slots = threading.BoundedSemaphore(readers)
+        self._closed = False
+
+    @contextlib.contextmanager
+    def write(self, durable: bool = False):
+        """
+        A cursor inside an immediate transaction, committed on success and
+        rolled back on error. durable=True fsyncs the WAL on commit
+        (synchronous=FULL) so the transaction survives a power cut.
+        """
+        with self._write_lock:
+            cursor = self._writer.cursor()
+            if self._writer.in_transaction:
+                # nested use joins the outer transaction
+                yield cursor
+                return
+            if durable:
+                cursor.execute("PRAGMA synchronous = FULL")
+            cursor.execute("BEGIN IMMEDIATE")
+            try:
+                yield cursor
+            except BaseException:
+                self._writer.rollback()
+                raise
+            else:
+                self._writer.commit()
+            finally:
+                if durable:
+                    cursor.execute(f"PRAGMA synchronous = {PRAGMAS['synchronous']}")
+                cursor.close()
+
+    @contextlib.contextmanager
+    def write_attached(self, path: str, schema: str, durable: bool = False):
+        """write(), with the database file at path attached to the writer connection as schema."""
+        with self._write_lock:
+            self._writer.execute(f"ATTACH DATABASE ? AS {schema}", (path,))
+            try:
+                with self.write(durable) as cursor:
+                    yield cursor
+            finally:
+                self._writer.execute(f"DETACH DATABASE {schema}")
+
+    @contextlib.contextmanager
+    def read(self):
+        """A reader connection for the duration of the block; blocks while all are in use."""
+        self._reader_slots.acquire()
+        try:
+            try:
+                conn = self._readers.get_nowait()
+            except queue.Empty:
+                conn = connect(self.db_path)
+            try:
+                yield conn
+            finally:
+                if conn.in_transaction:
+                    conn.rollback()
+                # a reader left with a database attached isn't handed out again
+                if self._closed or len(conn.execute("PRAGMA database_list").fetchall()) > 1:
+                    conn.close()
+                else:
+                    self._readers.put(conn)
+        finally:
+            self._reader_slots.release()
+
+    def close(self):
+        self._closed = True
+        while True:
+            try:
+                self._readers.get_nowait().close()
+            except queue.Empty:
+                break
+        with self._write_lock:
+            self._writer.close()
+
+
+# ------------------------------
+# Photo store
+# ------------------------------
+# Photos are stored once per distinct JPEG, keyed by the sha256 of the
+# bytes; users.photo_hash points at them. Saving the same picture again
+# (e.g. on checkout) costs nothing.
+
+def photo_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def store_photo(cursor, data: bytes):
+    """Insert data into photos if it isn't there yet and return its hash (None for no data)."""
+    if not data:
+        return None
+    digest = photo_hash(data)
+    cursor.execute("INSERT OR IGNORE INTO photos (hash, data) VALUES (?, ?)", (digest, data))
+    return digest
+
+
+def load_photo(cursor, digest: str):
+    if not digest:
+        return None
+    row = cursor.execute("SELECT data FROM photos WHERE hash=?", (digest,)).fetchone()
+    return row[0] if row else None
+
+
+def prune_photos(cursor) -> int:
+    """Delete photos no visit refers to any more. Returns the number removed."""
+    cursor.execute("DELETE FROM photos WHERE hash NOT IN (SELECT photo_hash FROM users WHERE photo_hash IS NOT NULL)")
+    removed = cursor.rowcount
+    for table, column in (("photo_thumbnails", "hash"), ("face_embeddings", "photo_hash")):
+        cursor.execute(f"DELETE FROM {table} WHERE {column} NOT IN (SELECT hash FROM photos)")
+    return removed
+
+
+# ------------------------------
+# Visits
+# ------------------------------
+VISIT_FIELDS = ["tag", "name", "address", "purpose", "time_in", "time_out", "date"]
+# as stored: the fields plus the photo's hash (what replication compares and ships)
+VISIT_COLUMNS = VISIT_FIELDS + ["photo_hash"]
+
+
+def insert_visit(cursor, visit: dict) -> int:
+    """Insert a visit (VISIT_FIELDS plus optional picture bytes) and return its id."""
+    photo = store_photo(cursor, visit.get("picture"))
+    cursor.execute(
+        "INSERT INTO users (tag, name, address, time_in, purpose, time_out, date, photo_hash) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+        (visit["tag"], visit["name"], visit["address"], visit["time_in"], visit["purpose"],
+         visit["time_out"], visit["date"], photo)
+    )
+    return cursor.lastrowid
+
+
+def update_visit(cursor, visit: dict) -> int:
+    """Set time_out (and the photo, if a new one was taken) on the visit with this name and date."""
+    # keep the stored photo when no new snapshot was taken
+    photo = store_photo(cursor, visit.get("picture"))
+    cursor.execute(
+        "UPDATE users SET time_out=?, photo_hash=COALESCE(?, photo_hash) WHERE name=? AND date=?",
+        (visit["time_out"], photo, visit["name"], visit["date"])
+    )
+    row = cursor.execute("SELECT id FROM users WHERE name=? AND date=?", (visit["name"], visit["date"])).fetchone()
+    return row[0] if row else None
+
+
+def get_meta(cursor, key, default=None):
+    row = cursor.execute("SELECT value FROM meta WHERE key=?", (key,)).fetchone()
+    return row[0] if row else default
+
+
+def set_meta(cursor, key, value):
+    cursor.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
@@ -0,0 +1,374 @@
+# exporter.py
+import sqlite3, csv, base64, html, os, shutil, datetime
+import database, metrics
+
+EXPORT_COLUMNS = ["tag", "name", "address", "purpose", "time_in", "time_out", "date"]
+
+
+class ExportCancelled(Exception):
+    pass
+
+
+def visit_filter(start_date: str = None, end_date: str = None, text: str = None, fts: bool = True,
+                 schema: str = "main"):
+    """
+    WHERE clause and parameters selecting visits between two dates
+    (inclusive, ISO or dd/mm/YYYY) that match the search box text.
+    schema names the (attached) database the query reads.
+    """
+    clauses, params = [], []
+    if start_date:
+        clauses.append("u.date >= ?")
+        params.append(database.to_iso_date(start_date))
+    if end_date:
+        clauses.append("u.date <= ?")
+        params.append(database.to_iso_date(end_date))
+    if text and text.strip():
+        if fts:
+            clauses.append(f"u.id IN (SELECT rowid FROM {schema}.users_fts WHERE users_fts MATCH ?)")
+            params.append(database.fts_query(text))
+        else:
+            clauses.append("(" + " OR ".join(f"u.{col} LIKE ?" for col in EXPORT_COLUMNS) + ")")
+            params += [f"%{text.strip()}%"] * len(EXPORT_COLUMNS)
+    return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+
+def iter_visits(conn, start_date=None, end_date=None, text=None, with_photos=False, batch_size=500, order="u.id",
+                schema="main"):
+    """Yield lists of up to batch_size visit rows, oldest first, straight off the cursor."""
+    where, params = visit_filter(start_date, end_date, text, database.has_fts(conn, schema), schema)
+    cols = ", ".join(f"u.{col}" for col in EXPORT_COLUMNS)
+    if with_photos:
+        sql = (f"SELECT {cols}, p.data FROM {schema}.users u "
+               f"LEFT JOIN {schema}.photos p ON p.hash = u.photo_hash{where} ORDER BY {order}")
+    else:
+        sql = f"SELECT {cols} FROM {schema}.users u{where} ORDER BY {order}"
+    cursor = conn.execute(sql, params)
+    try:
+        while True:
+            batch = cursor.fetchmany(batch_size)
+            if not batch:
+                return
+            yield batch
+    finally:
+        # an attached schema can't be detached while a statement still reads it
+        cursor.close()
+
+
+def count_visits(conn, start_date=None, end_date=None, text=None, schema="main"):
+    where, params = visit_filter(start_date, end_date, text, database.has_fts(conn, schema), schema)
+    return conn.execute(f"SELECT count(*) FROM {schema}.users u{where}", params).fetchone()[0]
+
+
+# ------------------------------
+# Writers
+# ------------------------------
+# Each writer takes the path to write and an iterable of row batches and
+# returns the number of rows written. Nothing holds more than one batch.
+
+def write_csv(path, batches):
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(EXPORT_COLUMNS)
+        written = 0
+        for batch in batches:
+            writer.writerows(batch)
+            written += len(batch)
+    return written
+
+
+HTML_HEADER = """
+<!DOCTYPE html>
+<html lang="en">
+<head>
+    <meta charset="UTF-8">
+    <title>Access Control Records</title>
+    <style>
+        body { font-family: Arial, sans-serif; margin: 20px; background-color: #f5f5f5; }
+        table { border-collapse: collapse; width: 100%; background: white; }
+        th, td { border: 1px solid #ccc; padding: 8px; text-align: center; }
+        th { background-color: #0078d7; color: white; }
+        img { width: 80px; height: 80px; border-radius: 8px; object-fit: cover; }
+    </style>
+</head>
+<body>
+    <h2>Access Control Records</h2>
+    <table>
+        <thead>
+            <tr>
+                <th>Tag</th>
+                <th>Name</th>
+                <th>Address</th>
+                <th>Purpose</th>
+                <th>Time In</th>
+                <th>Time Out</th>
+                <th>Date</th>
+                <th>Picture</th>
+            </tr>
+        </thead>
+        <tbody>
+"""
+
+HTML_FOOTER = """
+        </tbody>
+    </table>
+</body>
+</html>
+"""
+
+
+def image_mime_type(data: bytes) -> str:
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "image/webp"
+    return "image/jpeg"
+
+
+def write_html(path, batches):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(HTML_HEADER)
+        written = 0
+        for batch in batches:
+            for tag, name, address, purpose, time_in, time_out, date, picture in batch:
+                if picture:
+                    img_data = base64.b64encode(picture).decode("utf-8")
+                    img_tag = f'<img src="data:{image_mime_type(picture)};base64,{img_data}">'
+                else:
+                    img_tag = '<span style="color:#888;">No Image</span>'
+                cells = [tag, name, address, purpose, time_in, time_out, database.to_display_date(date)]
+                f.write("\n            <tr>\n")
+                for cell in cells:
+                    f.write(f"                <td>{html.escape(str(cell or ''))}</td>\n")
+                f.write(f"                <td>{img_tag}</td>\n            </tr>\n")
+            written += len(batch)
+        f.write(HTML_FOOTER)
+    return written
+
+
+# --- columnar (pyarrow is optional, only these formats need it) ---
+
+def _pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.ipc
+        import pyarrow.parquet
+        return pyarrow
+    except ImportError:
+        raise RuntimeError("Parquet/Arrow export needs pyarrow (pip install pyarrow).")
+
+
+def arrow_schema(pa):
+    return pa.schema([
+        ("tag", pa.string()),
+        ("name", pa.string()),
+        ("address", pa.string()),
+        ("purpose", pa.string()),
+        ("time_in", pa.timestamp("s")),
+        ("time_out", pa.timestamp("s")),
+        ("date", pa.date32()),
+    ])
+
+
+def _timestamp(day, text):
+    if day is None or not text:
+        return None
+    try:
+        return datetime.datetime.combine(day, datetime.time.fromisoformat(text))
+    except ValueError:
+        return None
+
+
+def to_record_batch(pa, batch):
+    """Typed Arrow columns from visit rows: ISO date -> date32, HH:MM:SS -> timestamps on that date."""
+    columns = [[], [], [], [], [], [], []]
+    for tag, name, address, purpose, time_in, time_out, date in batch:
+        try:
+            day = datetime.date.fromisoformat(date) if date else None
+        except ValueError:
+            day = None
+        checked_in = _timestamp(day, time_in)
+        checked_out = _timestamp(day, time_out)
+        if checked_in and checked_out and checked_out < checked_in:
+            # left after midnight
+            checked_out += datetime.timedelta(days=1)
+        for column, value in zip(columns, (tag, name, address, purpose, checked_in, checked_out, day)):
+            column.append(value)
+    return pa.record_batch(columns, schema=arrow_schema(pa))
+
+
+def write_parquet(path, batches, partition_by_date=False):
+    """
+    One Parquet file, or with partition_by_date a directory laid out
+    Hive-style (date=YYYY-MM-DD/part-N.parquet) that analytics tools read
+    as a single dataset. Batches ordered by date give each date one part;
+    a date that comes round again (the same day in an archive and the
+    live log) gets another part next to it. The date then lives in the
+    folder name only, as Hive layouts expect.
+    """
+    pa = _pyarrow()
+    schema = arrow_schema(pa)
+    written = 0
+    if not partition_by_date:
+        with pa.parquet.ParquetWriter(path, schema, compression="zstd") as writer:
+            for batch in batches:
+                writer.write_batch(to_record_batch(pa, batch))
+                written += len(batch)
+        return written
+
+    os.makedirs(path, exist_ok=True)
+    # date is the last column
+    schema = schema.remove(schema.get_field_index("date"))
+    writer, current = None, None
+    parts = {}
+    try:
+        for batch in batches:
+            start = 0
+            # split the batch wherever the date changes
+            for i in range(1, len(batch) + 1):
+                if i < len(batch) and batch[i][6] == batch[start][6]:
+                    continue
+                day = batch[start][6] or "unknown"
+                if day != current:
+                    if writer:
+                        writer.close()
+                    folder = os.path.join(path, f"date={day}")
+                    os.makedirs(folder, exist_ok=True)
+                    part = parts.get(day, 0)
+                    parts[day] = part + 1
+                    writer = pa.parquet.ParquetWriter(os.path.join(folder, f"part-{part}.parquet"), schema,
+                                                      compression="zstd")
+                    current = day
+                record_batch = to_record_batch(pa, batch[start:i])
+                writer.write_batch(pa.record_batch(record_batch.columns[:-1], schema=schema))
+                start = i
+            written += len(batch)
+    finally:
+        if writer:
+            writer.close()
+    return written
+
+
+def write_arrow(path, batches):
+    """Arrow IPC file (a.k.a. Feather v2)."""
+    pa = _pyarrow()
+    written = 0
+    with pa.OSFile(path, "wb") as sink, pa.ipc.new_file(sink, arrow_schema(pa)) as writer:
+        for batch in batches:
+            writer.write_batch(to_record_batch(pa, batch))
+            written += len(batch)
+    return written
+
+
+WRITERS = {
+    # format: (writer, needs photos)
+    "csv": (write_csv, False),
+    "html": (write_html, True),
+    "parquet": (write_parquet, False),
+    "arrow": (write_arrow, False),
+}
+
+
+def export_snapshot(db: database.Database, file_path: str, progress=None, cancelled=None, pages: int = 1024):
+    """
+    Consistent copy of the whole database through SQLite's online backup
+    API, copied `pages` pages at a time so writers are only briefly held up.
+    Returns the number of pages copied.
+    """
+    tmp_path = file_path + ".part"
+    _remove(tmp_path)
+    dst = sqlite3.connect(tmp_path)
+    copied = 0
+
+    def step(status, remaining, total):
+        nonlocal copied
+        copied = total - remaining
+        if progress:
+            progress(copied, total)
+        if cancelled and cancelled():
+            raise ExportCancelled()
+
+    try:
+        with db.read() as src:
+            src.backup(dst, pages=pages, progress=step)
+        dst.close()
+        os.replace(tmp_path, file_path)
+        return copied
+    except BaseException:
+        dst.close()
+        _remove(tmp_path)
+        raise
+
+
+def _remove(path):
+    if os.path.isdir(path):
+        shutil.rmtree(path)
+    elif os.path.exists(path):
+        os.remove(path)
+
+
+def export_visits(db: database.Database, file_path: str, type_of: str, start_date=None, end_date=None, text=None,
+                  progress=None, cancelled=None, batch_size=500, partition_by_date=False, archives=()):
+    """
+    Stream the users table into file_path as type_of ("csv", "html",
+    "parquet" or "arrow"); "sqlite" writes a snapshot of the whole
+    database instead and ignores the filters. Visits in the archive
+    databases listed in archives (oldest first, see archive.py) come
+    before the live ones.
+
+    progress(done, total) is called after each batch; if cancelled() returns
+    True the export stops, the partial file is removed and ExportCancelled
+    is raised. The file is written next to its destination and moved into
+    place only when complete.
+    """
+    if type_of == "sqlite":
+        with metrics.timer("export.sqlite"):
+            return export_snapshot(db, file_path, progress, cancelled)
+    if type_of not in WRITERS:
+        raise ValueError(f"Unknown export format: {type_of}")
+    writer, with_photos = WRITERS[type_of]
+    partition = type_of == "parquet" and partition_by_date
+
+    tmp_path = file_path + ".part"
+    with db.read() as conn:
+        # archives are attached one group at a time, outside any transaction
+        total = sum(count_visits(conn, start_date, end_date, text, schema)
+                    for schema in database.attach_each(conn, archives))
+        if not archives:
+            # one read snapshot for the count and the rows
+            conn.execute("BEGIN")
+        total += count_visits(conn, start_date, end_date, text)
+
+        def sources():
+            yield from database.attach_each(conn, archives)
+            if archives:
+                # the live rows still come from one snapshot
+                conn.execute("BEGIN")
+            yield "main"
+
+        def batches():
+            done = 0
+            order = "u.date, u.id" if partition else "u.id"
+            for schema in sources():
+                for batch in iter_visits(conn, start_date, end_date, text, with_photos, batch_size, order, schema):
+                    if cancelled and cancelled():
+                        raise ExportCancelled()
+                    yield batch
+                    done += len(batch)
+                    if progress:
+                        progress(done, total)
+
+        os.makedirs(os.path.dirname(file_path) or ".", exist_ok=True)
+        try:
+            with metrics.timer(f"export.{type_of}"):
+                if partition:
+                    written = writer(tmp_path, batches(), partition_by_date=True)
+                else:
+                    written = writer(tmp_path, batches())
+                # a directory (or a file replaced by one) can't be replaced in one step
+                if partition or os.path.isdir(file_path):
+                    _remove(file_path)
+                os.replace(tmp_path, file_path)
+        except BaseException:
+            _remove(tmp_path)
+            raise
+        metrics.count("export.rows", written)
+        return written
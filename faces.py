@@ -0,0 +1,269 @@
+# faces.py
+from concurrent.futures import ThreadPoolExecutor
+import os, threading, cv2, numpy as np
+import database
+
+MODELS_DIR = os.path.join(os.path.dirname(__file__), "models")
+# optional; download face_detection_yunet_2023mar.onnx from the OpenCV model zoo
+YUNET_MODEL = os.path.join(MODELS_DIR, "face_detection_yunet.onnx")
+
+
+class FaceDetector:
+    """
+    Finds the largest face in a BGR frame on the CPU.
+
+    Uses YuNet through OpenCV DNN when its ONNX model is in models/,
+    otherwise the Haar cascade bundled with opencv-python. Frames are
+    downscaled to detect_width before detection. Build it once through
+    face_detector(); loading a model is far slower than running it.
+    """
+
+    def __init__(self, detect_width: int = 320):
+        self.detect_width = detect_width
+        self.backend = None
+        # detectors keep internal buffers, one caller at a time
+        self._lock = threading.Lock()
+        if hasattr(cv2, "FaceDetectorYN") and os.path.exists(YUNET_MODEL):
+            self._yunet = cv2.FaceDetectorYN.create(YUNET_MODEL, "", (320, 320), 0.8)
+            self.backend = "yunet"
+        elif hasattr(cv2, "CascadeClassifier") and hasattr(cv2, "data"):
+            cascade = cv2.CascadeClassifier(os.path.join(cv2.data.haarcascades, "haarcascade_frontalface_default.xml"))
+            if not cascade.empty():
+                self._cascade = cascade
+                self.backend = "haar"
+
+    def available(self) -> bool:
+        return self.backend is not None
+
+    def detect(self, frame):
+        """(x, y, w, h) of the largest face in frame coordinates, or None."""
+        if not self.available():
+            return None
+        h, w = frame.shape[:2]
+        scale = min(1.0, self.detect_width / w)
+        small = cv2.resize(frame, (int(w * scale), int(h * scale)), interpolation=cv2.INTER_AREA) if scale < 1 else frame
+        with self._lock:
+            if self.backend == "yunet":
+                self._yunet.setInputSize((small.shape[1], small.shape[0]))
+                _, faces = self._yunet.detect(small)
+                boxes = [] if faces is None else [tuple(face[:4]) for face in faces]
+            else:
+                gray = cv2.equalizeHist(cv2.cvtColor(small, cv2.COLOR_BGR2GRAY))
+                boxes = self._cascade.detectMultiScale(gray, scaleFactor=1.1, minNeighbors=5, minSize=(40, 40))
+        if len(boxes) == 0:
+            return None
+        x, y, bw, bh = max(boxes, key=lambda box: box[2] * box[3])
+        return tuple(int(v / scale) for v in (x, y, bw, bh))
+
+
+_detector = None
+_detector_lock = threading.Lock()
+
+
+def face_detector() -> FaceDetector:
+    """The process-wide detector, loaded on first use."""
+    global _detector
+    with _detector_lock:
+        if _detector is None:
+            _detector = FaceDetector()
+    return _detector
+
+
+def sharpness(image) -> float:
+    """Variance of the Laplacian: higher means more in-focus detail."""
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+    return cv2.Laplacian(gray, cv2.CV_64F).var()
+
+
+def crop_face(frame, box, margin: float = 0.4):
+    """Square crop around box, widened by margin on every side and clamped to the frame."""
+    x, y, w, h = box
+    side = int(max(w, h) * (1 + 2 * margin))
+    cx, cy = x + w // 2, y + h // 2
+    frame_h, frame_w = frame.shape[:2]
+    side = min(side, frame_w, frame_h)
+    left = min(max(cx - side // 2, 0), frame_w - side)
+    top = min(max(cy - side // 2, 0), frame_h - side)
+    return frame[top:top + side, left:left + side]
+
+
+def best_face(frames, detector: FaceDetector = None):
+    """Face crop from whichever of frames has the sharpest detected face, or None if none has one."""
+    detector = detector or face_detector()
+    best, best_score = None, -1.0
+    for frame in frames:
+        box = detector.detect(frame)
+        if box is None:
+            continue
+        crop = crop_face(frame, box)
+        # scored at a common size so a larger face isn't favoured just for its pixel count
+        score = sharpness(cv2.resize(crop, (128, 128), interpolation=cv2.INTER_AREA))
+        if score > best_score:
+            best, best_score = crop, score
+    return best
+
+
+# ------------------------------
+# Recognition
+# ------------------------------
+# optional; face_recognition_sface_2021dec.onnx from the OpenCV model zoo
+SFACE_MODEL = os.path.join(MODELS_DIR, "face_recognition_sface.onnx")
+
+
+def recognition_available() -> bool:
+    """Whether SFace can be loaded; the pixel fallback isn't good enough to tell visitors apart."""
+    return hasattr(cv2, "FaceRecognizerSF") and os.path.exists(SFACE_MODEL)
+
+
+class FaceEmbedder:
+    """
+    Turns a face crop into an L2-normalised vector, so cosine similarity
+    is a dot product. Uses SFace (128-d) when its ONNX model is in
+    models/; otherwise a coarse 16x16 equalised-grayscale vector that only
+    recognises the same person under similar lighting and pose, and also
+    matches different people under similar lighting: reliable is False
+    then, and FaceRecognizer won't identify anyone with it.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        if recognition_available():
+            self._sface = cv2.FaceRecognizerSF.create(SFACE_MODEL, "")
+            self.model, self.dim, self.threshold = "sface", 128, 0.363
+            self.reliable = True
+        else:
+            self._sface = None
+            self.model, self.dim, self.threshold = "pixels16", 256, 0.9
+            self.reliable = False
+
+    def embed(self, face):
+        if self._sface is not None:
+            with self._lock:
+                vector = self._sface.feature(cv2.resize(face, (112, 112))).flatten().astype(np.float32)
+        else:
+            small = cv2.resize(face, (16, 16), interpolation=cv2.INTER_AREA)
+            vector = cv2.equalizeHist(cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)).astype(np.float32).flatten()
+            vector -= vector.mean()
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+
+class FaceIndex:
+    """
+    Brute-force nearest-neighbour index: embeddings live in one float32
+    matrix and a search is a single matrix-vector product, a few
+    milliseconds per 100k faces at 128 dimensions. add() is amortised
+    O(1); the matrix doubles when full.
+    """
+
+    def __init__(self, dim: int, capacity: int = 1024):
+        self.dim = dim
+        self._vectors = np.empty((capacity, dim), dtype=np.float32)
+        self._keys = []
+        self._rows = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._keys)
+
+    def add(self, key, vector):
+        with self._lock:
+            row = self._rows.get(key)
+            if row is None:
+                row = len(self._keys)
+                if row == len(self._vectors):
+                    grown = np.empty((len(self._vectors) * 2, self.dim), dtype=np.float32)
+                    grown[:row] = self._vectors[:row]
+                    self._vectors = grown
+                self._keys.append(key)
+                self._rows[key] = row
+            self._vectors[row] = vector
+
+    def search(self, vector, k: int = 1):
+        """[(key, cosine similarity)] of the k closest faces, best first."""
+        with self._lock:
+            count = len(self._keys)
+            if count == 0:
+                return []
+            scores = self._vectors[:count] @ vector
+            k = min(k, count)
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+            return [(self._keys[i], float(scores[i])) for i in top]
+
+
+class FaceRecognizer:
+    """
+    Recognises returning visitors from their stored photos.
+
+    On start-up a worker thread loads saved embeddings into a FaceIndex
+    and embeds any stored photo that doesn't have one yet. enroll() adds
+    newly saved photos on the same thread; identify() runs on the caller's.
+    """
+
+    def __init__(self, db, batch_size: int = 256):
+        self.db = db
+        self.batch_size = batch_size
+        self.embedder = FaceEmbedder()
+        self.index = FaceIndex(self.embedder.dim)
+        self._executor = ThreadPoolExecutor(1, thread_name_prefix="faces")
+        self.ready = self._executor.submit(self._load)
+
+    def close(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def enroll(self, photo: bytes):
+        """Embed a saved photo in the background and add it to the index."""
+        return self._executor.submit(self._enroll, [(database.photo_hash(photo), photo)])
+
+    def identify(self, face):
+        """(photo_hash, similarity) of the closest enrolled face above the threshold, or None."""
+        if not self.embedder.reliable:
+            # a wrong match would fill the form with another visitor's details
+            return None
+        matches = self.index.search(self.face_vector(face))
+        if matches and matches[0][1] >= self.embedder.threshold:
+            return matches[0]
+        return None
+
+    def face_vector(self, image):
+        """Embedding of the face in image; photos and live crops go through the same steps."""
+        box = face_detector().detect(image)
+        return self.embedder.embed(crop_face(image, box) if box else image)
+
+    def _load(self):
+        with self.db.read() as conn:
+            rows = conn.execute(
+                "SELECT photo_hash, vector FROM face_embeddings WHERE model=? AND length(vector) > 0",
+                (self.embedder.model,)
+            )
+            for photo_hash, vector in rows:
+                self.index.add(photo_hash, np.frombuffer(vector, dtype=np.float32))
+        # backfill photos saved before recognition existed (or under another model)
+        while True:
+            with self.db.read() as conn:
+                batch = conn.execute("""
+                    SELECT hash, data FROM photos WHERE hash NOT IN (
+                        SELECT photo_hash FROM face_embeddings WHERE model=?
+                    ) LIMIT ?
+                """, (self.embedder.model, self.batch_size)).fetchall()
+            if not batch:
+                return
+            self._enroll(batch)
+
+    def _enroll(self, photos):
+        embedded = []
+        for photo_hash, data in photos:
+            image = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+            vector = None if image is None else self.face_vector(image)
+            embedded.append((photo_hash, vector))
+        with self.db.write() as cursor:
+            cursor.executemany(
+                "INSERT OR REPLACE INTO face_embeddings (photo_hash, model, vector) VALUES (?, ?, ?)",
+                # undecodable photos get an empty row so the backfill doesn't retry them
+                [(photo_hash, self.embedder.model, b"" if vector is None else vector.tobytes())
+                 for photo_hash, vector in embedded]
+            )
+        for photo_hash, vector in embedded:
+            if vector is not None:
+                self.index.add(photo_hash, vector)
@@ -0,0 +1,338 @@
+# importer.py
+"""
+Bulk import of visits: pre-registered visitors for an event and
+historical logs from another system.
+
+Rows come from CSV (the columns export("csv") writes; headers as shown
+in the viewer, "Time In", work too), JSON Lines or a JSON array. A
+photo column names a file in the photos folder; without one the
+folder is searched for a file named after the tag, then the name.
+Rows are streamed, validated and normalized (tags padded to three
+digits, dates and times to ISO) and inserted in large batches. A visit
+already logged for the same name and date is skipped, as save_record
+would. Photos are read, or with process_photos cropped and re-encoded
+like a snapshot, on a worker pool while the previous batch is
+inserted.
+
+Each batch is one transaction that inserts with the triggers on users
+dropped and then catches up the full-text index, change log and
+statistics for its rows in a few statements (see
+database.restore_users_triggers); batches are short, so the running
+app's saves interleave with a large import. Pre-registered visitors
+can leave time_in empty.
+
+    python importer.py visitors.csv --photos ./photos --process-photos
+"""
+import argparse, csv, datetime, functools, json, multiprocessing, os, re, time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import database, metrics
+
+BATCH = 10000
+PHOTO_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp", ".bmp")
+# the size take_snapshot stores
+SNAPSHOT_SIZE = (200, 200)
+TAG_PATTERN = re.compile(r"^[A-Za-z0-9_-]{1,32}$")
+TIME_PATTERN = re.compile(r"^(\d{1,2}):(\d{2})(?::(\d{2}))?$")
+# accepted spellings of a column -> the users column
+ALIASES = {"picture": "photo", "photo_file": "photo", "time": "time_in", "timein": "time_in", "timeout": "time_out"}
+# most row errors kept in the report; the rest are only counted
+MAX_ERRORS = 100
+PHOTO_CHUNK = 32
+
+
+class ImportCancelled(Exception):
+    pass
+
+
+# ------------------------------
+# Reading
+# ------------------------------
+@functools.lru_cache(maxsize=256)
+def _column(header) -> str:
+    key = str(header).strip().lower().replace(" ", "_")
+    return ALIASES.get(key, key)
+
+
+def read_rows(path: str):
+    """Yield (line number, row) from a CSV, JSON Lines or JSON file; row is None where a line isn't an object."""
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".csv":
+        with open(path, encoding="utf-8-sig", newline="") as f:
+            reader = csv.reader(f)
+            header = [_column(h) for h in next(reader, [])]
+            if "name" not in header:
+                raise ValueError(f"{path} has no name column")
+            for row in reader:
+                if any(row):
+                    yield reader.line_num, dict(zip(header, row))
+    elif extension in (".jsonl", ".ndjson"):
+        with open(path, encoding="utf-8") as f:
+            for number, line in enumerate(f, start=1):
+                if line.strip():
+                    try:
+                        row = json.loads(line)
+                    except ValueError:
+                        row = None
+                    yield number, _canonical(row)
+    elif extension == ".json":
+        # an array has to be parsed whole; use JSON Lines for very large files
+        with open(path, encoding="utf-8") as f:
+            rows = json.load(f)
+        if isinstance(rows, dict):
+            rows = rows.get("visits")
+        if not isinstance(rows, list):
+            raise ValueError(f"{path} holds neither a list of visits nor {{\"visits\": [...]}}")
+        for number, row in enumerate(rows, start=1):
+            yield number, _canonical(row)
+    else:
+        raise ValueError(f"Unsupported import format: {extension or path}")
+
+
+def _canonical(row):
+    return {_column(key): value for key, value in row.items()} if isinstance(row, dict) else None
+
+
+def count_lines(path: str) -> int:
+    """Lines in path, a cheap upper bound on its rows."""
+    lines = 0
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            lines += block.count(b"\n")
+    return lines
+
+
+# ------------------------------
+# Validation
+# ------------------------------
+# Tags, dates and times repeat from row to row, so each distinct value
+# is parsed once (a failure isn't cached and raises every time).
+@functools.lru_cache(maxsize=4096)
+def normalize_tag(tag: str) -> str:
+    if not TAG_PATTERN.match(tag):
+        raise ValueError(f"bad tag {tag!r}")
+    return tag.rjust(3, '0')
+
+
+@functools.lru_cache(maxsize=1 << 17)
+def normalize_time(text: str) -> str:
+    """'9:05' -> '09:05:00'; empty stays empty."""
+    if not text:
+        return ""
+    match = TIME_PATTERN.match(text)
+    if not match or int(match.group(1)) > 23 or int(match.group(2)) > 59 or int(match.group(3) or 0) > 59:
+        raise ValueError(f"bad time {text!r}")
+    return f"{int(match.group(1)):02d}:{match.group(2)}:{match.group(3) or '00'}"
+
+
+@functools.lru_cache(maxsize=4096)
+def normalize_date(text: str, default: str = None) -> str:
+    if not text:
+        if default:
+            return default
+        raise ValueError("no date")
+    date = database.to_iso_date(text)
+    try:
+        datetime.date.fromisoformat(date)
+    except ValueError:
+        raise ValueError(f"bad date {text!r}") from None
+    return date
+
+
+def normalize(row, default_date: str = None) -> dict:
+    """
+    A visit (VISIT_FIELDS plus its photo reference, if any) from one row as
+    read_rows yields it; ValueError if it's invalid.
+    """
+    if row is None:
+        raise ValueError("not an object")
+    name = _text(row.get("name"))
+    if not name:
+        raise ValueError("no name")
+    return {
+        "tag": normalize_tag(_text(row.get("tag"))), "name": name, "address": _text(row.get("address")),
+        "purpose": _text(row.get("purpose")), "time_in": normalize_time(_text(row.get("time_in"))),
+        "time_out": normalize_time(_text(row.get("time_out"))),
+        "date": normalize_date(_text(row.get("date")), default_date), "photo": _text(row.get("photo")),
+    }
+
+
+def _text(value) -> str:
+    return value.strip() if isinstance(value, str) else "" if value is None else str(value).strip()
+
+
+# ------------------------------
+# Photos
+# ------------------------------
+def photo_index(photos_dir: str):
+    """Lower-cased file name without extension -> path, for the pictures in photos_dir."""
+    found = {}
+    if photos_dir and os.path.isdir(photos_dir):
+        for entry in os.scandir(photos_dir):
+            stem, extension = os.path.splitext(entry.name)
+            if extension.lower() in PHOTO_EXTENSIONS and entry.is_file():
+                found.setdefault(stem.lower(), entry.path)
+    return found
+
+
+def find_photo(visit: dict, photos_dir: str, index: dict):
+    """Path of the visit's photo, or None."""
+    if visit["photo"]:
+        path = visit["photo"] if os.path.isabs(visit["photo"]) else os.path.join(photos_dir or "", visit["photo"])
+        return path if os.path.isfile(path) else None
+    return index.get(visit["tag"].lower()) or index.get(visit["tag"].lstrip("0").lower()) or index.get(visit["name"].lower())
+
+
+def load_photo(path: str, process: bool = False, size=SNAPSHOT_SIZE, quality: int = 90):
+    """
+    The file's bytes, or with process the picture cropped to the middle
+    square and encoded as a size JPEG like a snapshot. Stored as they are,
+    photos have to be JPEG or WebP like snapshots, so other formats need
+    process. None if the file can't be used. Runs in pool workers.
+    """
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+    except OSError:
+        return None
+    if not process:
+        is_jpeg, is_webp = data[:3] == b"\xff\xd8\xff", data[:4] == b"RIFF" and data[8:12] == b"WEBP"
+        return data if is_jpeg or is_webp else None
+    import cv2, numpy as np
+    image = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+    if image is None:
+        return None
+    h, w = image.shape[:2]
+    side = min(h, w)
+    top, left = (h - side) // 2, (w - side) // 2
+    image = cv2.resize(image[top:top + side, left:left + side], tuple(size), interpolation=cv2.INTER_AREA)
+    ok, encoded = cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    return encoded.tobytes() if ok else None
+
+
+# ------------------------------
+# Import
+# ------------------------------
+INSERT = """
+    INSERT INTO users (tag, name, address, purpose, time_in, time_out, date, photo_hash)
+    SELECT ?, ?, ?, ?, ?, ?, ?, ? WHERE NOT EXISTS (SELECT 1 FROM users WHERE name=? AND date=?)
+"""
+
+
+def import_visits(db: database.Database, path: str, photos_dir: str = None, process_photos: bool = False,
+                  workers: int = None, default_date: str = None, batch_size: int = BATCH, progress=None,
+                  cancelled=None):
+    """
+    Import the visits in path (see the module docstring) and return a
+    report. progress(done, total) is called after each batch (from the
+    writer thread), total being the line count. If cancelled() returns
+    True ImportCancelled is raised; the batches already committed are kept.
+    """
+    started = time.perf_counter()
+    total = count_lines(path)
+    report = {"file": path, "rows": 0, "imported": 0, "duplicates": 0, "invalid": 0, "errors": [],
+              "photos": 0, "missing_photos": 0, "unreadable_photos": 0}
+    index = photo_index(photos_dir)
+    use_photos = bool(photos_dir)
+    # decoding and encoding are CPU-bound; plain reads only wait on the disk
+    pool = None
+    if use_photos:
+        # spawned, not forked: forking a process that runs Qt and database threads isn't safe
+        pool = (ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn")) if process_photos
+                else ThreadPoolExecutor(workers or 4))
+    # photo path -> hash once stored (None if unreadable); every photo is read once, however many visits share it
+    submitted, stored = set(), {}
+    writer = ThreadPoolExecutor(1, thread_name_prefix="import-writer")
+
+    def batches():
+        batch = []
+        for line, row in read_rows(path):
+            report["rows"] += 1
+            try:
+                visit = normalize(row, default_date)
+            except ValueError as e:
+                report["invalid"] += 1
+                if len(report["errors"]) < MAX_ERRORS:
+                    report["errors"].append({"line": line, "error": str(e)})
+                continue
+            batch.append(visit)
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def submit_photos(batch):
+        """(paths, results) of the batch's photos not loaded yet; results is the pool's lazy iterator."""
+        paths = []
+        for visit in batch:
+            visit["photo"] = find_photo(visit, photos_dir, index) if use_photos else None
+            if visit["photo"] is None:
+                report["missing_photos"] += use_photos
+            elif visit["photo"] not in submitted:
+                submitted.add(visit["photo"])
+                paths.append(visit["photo"])
+        if not paths:
+            return paths, ()
+        # sent to the workers in chunks, one round trip per chunk rather than per photo
+        return paths, pool.map(load_photo, paths, [process_photos] * len(paths), chunksize=PHOTO_CHUNK)
+
+    def insert(batch, jobs):
+        with db.write() as cursor:
+            triggers = database.drop_users_triggers(cursor)
+            last_id = cursor.execute("SELECT COALESCE(MAX(id), 0) FROM users").fetchone()[0]
+            for photo_path, data in zip(*jobs):
+                stored[photo_path] = database.store_photo(cursor, data) if data else None
+                report["photos" if data else "unreadable_photos"] += 1
+            rows = [(v["tag"], v["name"], v["address"], v["purpose"], v["time_in"], v["time_out"], v["date"],
+                     stored.get(v["photo"]), v["name"], v["date"]) for v in batch]
+            cursor.executemany(INSERT, rows)
+            report["imported"] += cursor.rowcount
+            report["duplicates"] += len(rows) - cursor.rowcount
+            database.restore_users_triggers(cursor, triggers, last_id)
+        if progress:
+            progress(report["rows"], total)
+
+    try:
+        with metrics.timer("import.visits"):
+            # the next batch is parsed, and its photos loaded, while this one goes in
+            inserting = None
+            for batch in batches():
+                if cancelled and cancelled():
+                    raise ImportCancelled()
+                jobs = submit_photos(batch)
+                if inserting:
+                    inserting.result()
+                inserting = writer.submit(insert, batch, jobs)
+            if inserting:
+                inserting.result()
+    finally:
+        writer.shutdown()
+        if pool:
+            pool.shutdown(cancel_futures=True)
+    metrics.count("import.rows", report["imported"])
+    report["seconds"] = round(time.perf_counter() - started, 3)
+    report["rows_per_s"] = round(report["rows"] / report["seconds"]) if report["seconds"] else 0
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("file", help="CSV, JSON Lines (.jsonl) or JSON file of visits")
+    parser.add_argument("--db", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "my_db.db"))
+    parser.add_argument("--photos", help="folder of visitor photos")
+    parser.add_argument("--process-photos", action="store_true", help="crop and re-encode photos like snapshots")
+    parser.add_argument("--workers", type=int, help="photo worker processes (default: one per CPU)")
+    parser.add_argument("--date", help="date for rows without one (pre-registrations)")
+    args = parser.parse_args()
+
+    db = database.Database(args.db)
+    try:
+        report = import_visits(db, args.file, args.photos, args.process_photos, args.workers,
+                               database.to_iso_date(args.date) or None)
+    finally:
+        db.close()
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
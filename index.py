@@ -2,22 +2,57 @@
 from PyQt5.QtWidgets import (
     QLabel, QMainWindow, QPushButton, QApplication, QFormLayout, QVBoxLayout,
     QHBoxLayout, QWidget, QLineEdit, QMessageBox, QDialog, QFrame, QAction,
-    QTableWidget, QTableWidgetItem, QComboBox
+    QTableView, QComboBox, QProgressDialog, QFileDialog
 )
-from PyQt5.QtCore import Qt, QTimer
-from PyQt5.QtGui import QPixmap, QImage, QColor, QFont
-import sys, datetime, sqlite3, os, cv2, csv, base64
+from PyQt5.QtCore import Qt, QTimer, QThread, pyqtSignal
+from PyQt5.QtGui import QPixmap
+import sys, datetime, os, threading, time
+from camera import CameraDiscovery, CaptureWorker, encode_snapshot, snapshot_settings
+from thumbnails import ThumbnailStore, profile_pixmap
+import database
+from viewer import VisitTableModel
+from dashboard import Dashboard
+from performance import PerformancePanel
+import exporter, importer, archive, metrics
+from write_queue import WriteQueue, JournalInUse
+from records import Records
+from presence import Presence, CHECK_IN, CHECK_OUT
+import sync
 
-def list_available_cameras(max_index_to_check=10):
-    available_cameras = []
-    for i in range(max_index_to_check):
-        cap = cv2.VideoCapture(i, cv2.CAP_DSHOW if sys.platform.startswith("win") else 0)
-        if cap.isOpened():
-            available_cameras.append(i)
-            cap.release()
-    return available_cameras
-
-available_cameras = list_available_cameras()
+# ------------------------------
+# Themes
+# ------------------------------
+# Built once at import and set on the window before its widgets exist, so
+# each widget is styled as it is created instead of re-polished afterwards.
+THEMES = {
+    "light": """
+        QMainWindow,QDialog{background-color:#f0f0f0;}
+        QLabel{font-size:17px;font-weight:500;color:#222;}
+        #title{font-size:28px;font-weight:bold;color:black;letter-spacing:2px;}
+        QLineEdit{padding:8px 12px;font-size:16px;border:1px solid #999;border-radius:8px;background:white;color:black;}
+        QPushButton{background-color:#0078d7;color:white;border-radius:8px;font-size:16px;padding:6px 12px;}
+        QPushButton:hover{background-color:#005fa3;}
+        QMenuBar, QMenu{background-color:#C8E1FA;color:#1E2832;font-size:15px}
+        QMenuBar::item::selected{background-color:#C8C8C8;color:#1E1E1E;font-size:15px}
+        QMenu::item::selected{background-color:#C8C8C8;color:#1E1E1E;font-size:15px}
+        QComboBox{background-color:#0078d7;color:white;font-size:14px}
+        #form_frame, #data{background-color:#ffffff;border-radius:12px;padding:20px;border:1px solid #ccc;}
+    """,
+    "dark": """
+        QMainWindow,QDialog{background-color:#2A2A2A;}
+        QLabel{font-size:17px;font-weight:500;color:white;}
+        #title{font-size:28px;font-weight:bold;color:white;letter-spacing:2px;}
+        QLineEdit{padding:8px 12px;font-size:16px;border:1px solid #bdbdbd;border-radius:8px;background:#f7f7f7;}
+        QPushButton{background-color:#0078d7;color:white;border-radius:8px;font-size:16px;padding:6px 12px;}
+        QPushButton:hover{background-color:#005fa3;}
+        QMenuBar{background-color:#1E2832;color:#C8E1FA;font-size:15px}
+        QMenuBar::item::selected{background-color:#1E1E1E;color:#C8C8C8;font-size:15px}
+        QMenu{background-color:#1E2832;color:#C8E1FA;font-size:15px}
+        QMenu::item::selected{background-color:#1E1E1E;color:#C8C8C8;font-size:15px}
+        QComboBox{background-color:#0078d7;color:white;font-size:14px}
+        #form_frame, #data{background-color:#1E1E1E;border-radius:12px;padding:20px;border:1px solid #3A3A3A;}
+    """,
+}
 
 class AdminLogin(QDialog):
     def __init__(self, parent):
@@ -56,30 +91,143 @@ class AdminLogin(QDialog):
         self.parent.admin = False
         self.destroy()
 
+class ExportWorker(QThread):
+    progress = pyqtSignal(int, int)
+    done = pyqtSignal(str)
+    failed = pyqtSignal(str)
+
+    def __init__(self, db, file_path, type_of, start_date=None, end_date=None, text=None, parent=None, **options):
+        super().__init__(parent)
+        self.args = (db, file_path, type_of, start_date, end_date, text)
+        self.options = options
+        self._cancelled = False
+
+    def cancel(self):
+        self._cancelled = True
+
+    def run(self):
+        try:
+            exporter.export_visits(
+                *self.args,
+                progress=self.progress.emit,
+                cancelled=lambda: self._cancelled,
+                **self.options
+            )
+            self.done.emit(self.args[1])
+        except exporter.ExportCancelled:
+            pass
+        except Exception as e:
+            self.failed.emit(f"Error exporting records:\n{e}")
+
+class BackupWorker(QThread):
+    done = pyqtSignal(dict)
+    failed = pyqtSignal(str)
+
+    def __init__(self, db, target, parent=None):
+        super().__init__(parent)
+        self.db = db
+        self.target = target
+
+    def run(self):
+        try:
+            import backup
+            self.done.emit(backup.backup(self.db, self.target))
+        except Exception as e:
+            self.failed.emit(f"Error backing up to {self.target.name}:\n{e}")
+
+class RetentionWorker(QThread):
+    done = pyqtSignal(dict)
+    failed = pyqtSignal(str)
+
+    def __init__(self, db, archive_dir, older_than_days, parent=None):
+        super().__init__(parent)
+        self.args = (db, archive_dir, older_than_days)
+
+    def run(self):
+        try:
+            self.done.emit(archive.archive_old_visits(*self.args))
+        except Exception as e:
+            self.failed.emit(f"Error archiving old visits:\n{e}")
+
+class ImportWorker(QThread):
+    progress = pyqtSignal(int, int)
+    done = pyqtSignal(dict)
+    failed = pyqtSignal(str)
+
+    def __init__(self, db, file_path, photos_dir=None, parent=None):
+        super().__init__(parent)
+        self.args = (db, file_path, photos_dir)
+        self._cancelled = False
+
+    def cancel(self):
+        self._cancelled = True
+
+    def run(self):
+        try:
+            # photos come out cropped and sized like snapshots
+            self.done.emit(importer.import_visits(
+                *self.args, process_photos=True, progress=self.progress.emit, cancelled=lambda: self._cancelled
+            ))
+        except importer.ImportCancelled:
+            pass
+        except Exception as e:
+            self.failed.emit(f"Error importing visits:\n{e}")
+
 class MainWindow(QMainWindow):
+    writeDone = pyqtSignal(str, bool)
+
     def __init__(self):
         super().__init__()
+        self.writeDone.connect(self.write_done)
         self.dark_mode = True
         self.setWindowTitle("Access Control Management System")
         self.setGeometry(100, 100, 600, 400)
 
-        self.db_path = os.path.join(os.path.dirname(__file__), "my_db.db")
+        # ACCESS_CONTROL_DB points the app at another database file (benchmarks, training installs)
+        self.db_path = os.environ.get("ACCESS_CONTROL_DB") or os.path.join(os.path.dirname(__file__), "my_db.db")
         self.create_database()
-        self.initUI()
         self.set_dark_theme()
+        self.initUI()
 
         # state for camera
-        self.cap = None
-        self.cam_timer = None
+        self.capture = None
         self.current_camera_index = None
         self.admin = False
 
+        # per-session snapshot state; size, quality and format come from ACCESS_CONTROL_SNAPSHOT_*
+        self.snapshot = None
+        try:
+            self.snapshot_settings = snapshot_settings()
+        except ValueError as e:
+            print(f"Snapshot settings ignored: {e}", file=sys.stderr)
+            self.snapshot_settings = snapshot_settings({})
+
+        # camera enumeration runs in the background, never on the startup path
+        self.camera_discovery = CameraDiscovery(self)
+        self.camera_discovery.camerasChanged.connect(self.update_camera_list)
+        QTimer.singleShot(0, self.camera_discovery.refresh)
+        QTimer.singleShot(0, self.load_vision)
+
+    def closeEvent(self, event):
+        if self.retention_worker:
+            self.retention_worker.wait()
+        if self.replicator:
+            self.replicator.stop()
+        self._closing = True
+        if self.face_recognizer:
+            self.face_recognizer.close()
+        self.write_queue.close()
+        self.db.close()
+        super().closeEvent(event)
+
     # ------------------------------
     # Database and Utility
     # ------------------------------
     def backup_to_cloud(self, access_token: str = None):
         """
-        Upload the DB to Dropbox if access_token is provided.
+        Back the DB up to Dropbox if access_token is provided, in the background:
+        a consistent snapshot of which only the chunks changed since the last
+        backup are uploaded (see backup.py).
         NOTE: Do NOT hardcode tokens in code; pass them at runtime or via env var.
         """
         if not access_token:
@@ -87,32 +235,69 @@ class MainWindow(QMainWindow):
             return
 
         try:
-            import dropbox
-            dbx = dropbox.Dropbox(access_token)
-            with open(self.db_path, "rb") as f:
-                backup_name = f"backup_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.db"
-                dbx.files_upload(f.read(), f"/{backup_name}", mode=dropbox.files.WriteMode.overwrite)
-            QMessageBox.information(self, "Backup Complete", "Database backup uploaded to Dropbox successfully!")
+            import backup
+            target = backup.DropboxTarget(access_token)
         except Exception as e:
-            QMessageBox.critical(self, "Backup Failed", f"Error uploading to Dropbox:\n{e}")
+            QMessageBox.critical(self, "Backup Failed", f"Error connecting to Dropbox:\n{e}")
+            return
+        worker = BackupWorker(self.db, target, self)
+        worker.done.connect(lambda report: QMessageBox.information(
+            self, "Backup Complete",
+            f"Database backup uploaded to Dropbox successfully!\n"
+            f"{report['chunks_sent']} of {report['chunks']} chunks sent ({report['bytes_sent'] / 2 ** 20:.1f} MB)."
+        ))
+        worker.failed.connect(lambda message: QMessageBox.critical(self, "Backup Failed", message))
+        worker.finished.connect(worker.deleteLater)
+        self.backup_worker = worker
+        worker.start()
 
     def create_database(self):
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS users (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    tag TEXT,
-                    name TEXT,
-                    address TEXT,
-                    purpose TEXT,
-                    time_in TEXT,
-                    time_out TEXT,
-                    date TEXT,
-                    picture BLOB
-                )
-            """)
-            conn.commit()
+        # creates the schema or upgrades an existing my_db.db in place, then
+        # keeps the connections open for the life of the window
+        self.db = database.Database(self.db_path)
+        # replays anything journaled but not committed before a crash
+        self.write_queue = WriteQueue(self.db, self.db_path + "-writes.jsonl")
+        # needs OpenCV; built by load_vision once the window is up
+        self.face_recognizer = None
+        self._closing = False
+        self.thumbnails = ThumbnailStore(self.db)
+        self.archive_dir = archive.archive_dir_for(self.db_path)
+        self.records = Records(self.db, self.write_queue, self.face_recognizer, self.archive_dir)
+        # who is inside, for badge scans at the gate
+        self.presence = Presence(self.db, self.write_queue)
+        # exchanges visits with other gates when ACCESS_CONTROL_PEERS/_SYNC_PORT are set
+        try:
+            self.replicator = sync.start_from_env(self.db)
+        except ValueError as e:
+            # misconfigured replication leaves this gate working on its own
+            print(f"Replication not started: {e}", file=sys.stderr)
+            self.replicator = None
+        # visits older than ACCESS_CONTROL_RETENTION_DAYS move to monthly archives
+        self.retention_worker = None
+        retention_days = os.environ.get("ACCESS_CONTROL_RETENTION_DAYS")
+        if retention_days:
+            self.retention_worker = RetentionWorker(self.db, self.archive_dir, int(retention_days), self)
+            self.retention_worker.failed.connect(lambda message: print(message, file=sys.stderr))
+            self.retention_worker.start()
+
+    def load_vision(self):
+        """
+        Import OpenCV and load the face models on a background thread, off
+        the startup path; a snapshot taken before they are ready waits for
+        the import.
+        """
+        threading.Thread(target=self._load_vision, name="vision-loader", daemon=True).start()
+
+    def _load_vision(self):
+        from faces import face_detector, recognition_available, FaceRecognizer
+        face_detector()
+        if self._closing or not recognition_available():
+            # without the SFace model returning visitors aren't recognised (nor the form prefilled)
+            return
+        # loads face embeddings (and embeds older photos) in the background
+        recognizer = FaceRecognizer(self.db)
+        self.face_recognizer = recognizer
+        self.records.face_recognizer = recognizer
 
     def get_current_time(self, mode):
         current_time = datetime.datetime.now().strftime("%H:%M:%S")
@@ -137,43 +322,51 @@ class MainWindow(QMainWindow):
         time_in = datetime.datetime.now().strftime("%H:%M:%S")
         purpose = self.purpose.text().strip()
         time_out = self.timeout.text().strip()
-        date = self.date.text().strip()
+        date = database.to_iso_date(self.date.text())
 
         if not name or not address or not date or not purpose:
             QMessageBox.warning(self, "Error", "Please fill all required fields.")
             return
 
-        # Load profile image as bytes (temp.jpg created by camera)
-        images_dir = os.path.join(os.path.dirname(__file__), "images")
-        os.makedirs(images_dir, exist_ok=True)
-        profile_path = os.path.join(images_dir, "temp.jpg")
-        picture_data = None
-        if os.path.exists(profile_path):
-            with open(profile_path, "rb") as f:
-                picture_data = f.read()
-
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            cursor.execute("SELECT * FROM users WHERE name=? AND date=?", (name, date))
-            record = cursor.fetchone()
-
-            if record:
-                reply = QMessageBox.question(self, "Confirm", f"Update profile for {name}?", QMessageBox.Yes | QMessageBox.No)
-                if reply == QMessageBox.Yes:
-                    cursor.execute(
-                        "UPDATE users SET time_out=?, picture=? WHERE name=? AND date=?",
-                        (time_out, picture_data, name, date)
-                    )
-            else:
-                cursor.execute(
-                    "INSERT INTO users (tag, name, address, time_in, purpose, time_out, date, picture) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
-                    (tag, name, address, time_in, purpose, time_out, date, picture_data)
-                )
-            conn.commit()
+        # encoded snapshot held in memory by take_snapshot (None if no photo was taken)
+        picture_data = self.snapshot
+
+        # also sees a record saved a moment ago that is still queued
+        with metrics.timer("ui.save_record.lookup"):
+            record = self.records.find_visit_id(name, date) is not None
+
+        visit = {
+            "tag": tag, "name": name, "address": address, "purpose": purpose,
+            "time_in": time_in, "time_out": time_out, "date": date, "picture": picture_data
+        }
+        # handed to the write queue: journaled now, committed with the next batch.
+        # The confirmation is asked before anything is queued, so an open
+        # dialog never holds the database lock
+        if record:
+            reply = QMessageBox.question(self, "Confirm", f"Update profile for {name}?", QMessageBox.Yes | QMessageBox.No)
+            if reply == QMessageBox.Yes:
+                with metrics.timer("ui.save_record.queue"):
+                    self.watch_write(self.records.save(visit, update=True), name)
+        else:
+            with metrics.timer("ui.save_record.queue"):
+                self.watch_write(self.records.save(visit), name)
 
         self.clear()
         QMessageBox.information(self, "Success", "Record saved successfully!")
 
+    def watch_write(self, future, name):
+        def done(f):
+            ok = f.exception() is None and f.result() is not None
+            # the future resolves on the write queue's thread; hop back to the GUI thread
+            self.writeDone.emit(name, ok)
+        future.add_done_callback(done)
+
+    def write_done(self, name: str, ok: bool):
+        if ok:
+            self.statusBar().showMessage(f"Record for {name} committed to disk.", 5000)
+        else:
+            QMessageBox.critical(self, "Save Failed", f"The record for {name} could not be written to the database.")
+
     def clear(self):
         self.tag.clear()
         self.name.clear()
@@ -182,22 +375,39 @@ class MainWindow(QMainWindow):
         self.timeout.clear()
         self.date.clear()
 
-        images_dir = os.path.join(os.path.dirname(__file__), "images")
-        os.makedirs(images_dir, exist_ok=True)
-        profile_path = os.path.join(images_dir, "profile.jpg")
-        temp_image = os.path.join(images_dir, "temp.jpg")
+        self.snapshot = None
 
-        if os.path.exists(profile_path):
-            pixmap = QPixmap(profile_path).scaled(100, 90, Qt.KeepAspectRatio, Qt.SmoothTransformation)
+        pixmap = profile_pixmap()
+        if pixmap is not None:
             self.picture.setPixmap(pixmap)
         else:
             self.picture.clear()
 
-        if os.path.exists(temp_image):
-            try:
-                os.remove(temp_image)
-            except Exception:
-                pass
+    def scan_tag(self):
+        """A badge scan (readers type the tag and press Enter): check the visitor in or out."""
+        tag = self.scan_input.text().strip()
+        self.scan_input.clear()
+        if not tag:
+            return
+        result = self.presence.scan(tag)
+        visit = result["visit"]
+        if result["action"] == CHECK_OUT:
+            self.statusBar().showMessage(f"{visit['name']} checked out at {visit['time_out']}.", 8000)
+        elif result["action"] == CHECK_IN:
+            self.statusBar().showMessage(f"{visit['name']} checked in at {visit['time_in']}.", 8000)
+        else:
+            # nobody expected under this tag: register the visitor with the form
+            self.clear()
+            self.tag.setText(result["tag"])
+            self.name.setFocus()
+            self.statusBar().showMessage(f"Tag {result['tag']} is not expected today; fill in the visitor.", 8000)
+        if result["stale"]:
+            stale = result["stale"]
+            QMessageBox.warning(
+                self, "Open Visit",
+                f"Tag {result['tag']} was still checked in for {stale['name']} since "
+                f"{stale['date']} {stale['time_in']}; that visit needs a time out."
+            )
 
     def load_record(self):
         dialog = QDialog(self)
@@ -211,112 +421,133 @@ class MainWindow(QMainWindow):
 
         def load():
             tag = tag_input.text().strip()
-            date = datetime.datetime.now().strftime("%d/%m/%Y")
             if not tag:
                 QMessageBox.warning(dialog, "Error", "Please enter a tag.")
                 return
 
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                cursor.execute("SELECT * FROM users WHERE tag=? AND date=?", (tag.rjust(3, '0'), date))
-                record = cursor.fetchone()
+            with metrics.timer("ui.load_record"):
+                # today's visit for this tag
+                record = self.records.lookup(tag)
                 if record:
-                    # [0]=id, [1]=tag, [2]=name, [3]=address, [4]=purpose, [5]=time_in,
-                    #  [6]=time_out, [7]=date, [8]=picture
-                    self.tag.setText(str(record[1] or ""))
-                    self.name.setText(str(record[2] or ""))
-                    self.address.setText(str(record[3] or ""))
-                    self.purpose.setText(str(record[4] or ""))
-                    self.timeout.setText(str(record[6] or ""))
-                    self.date.setText(str(record[7] or ""))
-                    if record[8]:
-                        pixmap = QPixmap()
-                        pixmap.loadFromData(record[8])
-                        self.picture.setPixmap(pixmap.scaled(100, 90, Qt.KeepAspectRatio, Qt.SmoothTransformation))
-                    else:
-                        path = os.path.join(os.path.dirname(__file__), "images", "profile.jpg")
-                        if os.path.exists(path):
-                            self.picture.setPixmap(QPixmap(path).scaled(100, 90, Qt.KeepAspectRatio, Qt.SmoothTransformation))
-                else:
-                    QMessageBox.warning(dialog, "Not Found", f"No record found for tag: {tag}")
+                    self.tag.setText(str(record["tag"] or ""))
+                    self.name.setText(str(record["name"] or ""))
+                    self.address.setText(str(record["address"] or ""))
+                    self.purpose.setText(str(record["purpose"] or ""))
+                    self.timeout.setText(str(record["time_out"] or ""))
+                    self.date.setText(database.to_display_date(record["date"]))
+                    # cached, pre-scaled thumbnail; the full photo is decoded at most once, ever
+                    pixmap = self.thumbnails.pixmap(record["photo_hash"]) or profile_pixmap()
+                    if pixmap is not None:
+                        self.picture.setPixmap(pixmap)
+            if not record:
+                QMessageBox.warning(dialog, "Not Found", f"No record found for tag: {tag}")
             dialog.close()
 
         submit.clicked.connect(load)
         dialog.exec_()
     
-    def export(self, type_of):
-        file_path = os.path.join(os.path.expanduser("~"), "Documents", f"file.{type_of}")
-        with sqlite3.connect(self.db_path) as f:
-            conn = f.cursor()
-            conn.execute("SELECT tag, name, address, purpose, time_in, time_out, date FROM users")
-            info = conn.fetchall()
-        
-        if type_of == "csv":
-            with open(file_path, "w", encoding="utf-8") as e:
-                writer = csv.writer(e)
-                writer.writerow(["tag", "name", "address", "purpose", "time_in", "time_out", "date"])
-                writer.writerows(info)
-        elif type_of == "html":
-            with open(file_path, "w", encoding="utf-8") as e:
-                e.write("""
-<!DOCTYPE html>
-<html lang="en">
-<head>
-    <meta charset="UTF-8">
-    <title>Access Control Records</title>
-    <style>
-        body { font-family: Arial, sans-serif; margin: 20px; background-color: #f5f5f5; }
-        table { border-collapse: collapse; width: 100%; background: white; }
-        th, td { border: 1px solid #ccc; padding: 8px; text-align: center; }
-        th { background-color: #0078d7; color: white; }
-        img { width: 80px; height: 80px; border-radius: 8px; object-fit: cover; }
-    </style>
-</head>
-<body>
-    <h2>Access Control Records</h2>
-    <table>
-        <thead>
-            <tr>
-                <th>Tag</th>
-                <th>Name</th>
-                <th>Address</th>
-                <th>Purpose</th>
-                <th>Time In</th>
-                <th>Time Out</th>
-                <th>Date</th>
-                <th>Picture</th>
-            </tr>
-        </thead>
-        <tbody>
-""")
-
-            for row in info:
-                tag, name, address, purpose, time_in, time_out, date, picture = row
-                if picture:
-                    img_data = base64.b64encode(picture).decode("utf-8")
-                    img_tag = f'<img src="data:image/jpeg;base64,{img_data}">'
-                else:
-                    img_tag = '<span style="color:#888;">No Image</span>'
-
-                e.write(f"""
-            <tr>
-                <td>{tag or ''}</td>
-                <td>{name or ''}</td>
-                <td>{address or ''}</td>
-                <td>{purpose or ''}</td>
-                <td>{time_in or ''}</td>
-                <td>{time_out or ''}</td>
-                <td>{date or ''}</td>
-                <td>{img_tag}</td>
-            </tr>
-""")
-
-            e.write("""
-        </tbody>
-    </table>
-</body>
-</html>
-""")
+    def export_filtered(self, type_of, text: str = "", **options):
+        """Ask for the date range and search text to export (the viewer's filter by default), then export."""
+        dialog = QDialog(self)
+        dialog.setWindowTitle(f"Export to {type_of}")
+        layout = QFormLayout(dialog)
+        start_input, end_input, text_input = QLineEdit(), QLineEdit(), QLineEdit(text.strip())
+        start_input.setPlaceholderText("dd/mm/YYYY, empty for the first visit")
+        end_input.setPlaceholderText("dd/mm/YYYY, empty for the last visit")
+        text_input.setPlaceholderText("empty for every visit")
+        layout.addRow("From:", start_input)
+        layout.addRow("To:", end_input)
+        layout.addRow("Search:", text_input)
+        submit = QPushButton("Export")
+        layout.addRow(submit)
+
+        def export():
+            try:
+                start_date, end_date = (importer.normalize_date(field.text().strip()) if field.text().strip() else None
+                                        for field in (start_input, end_input))
+            except ValueError as e:
+                QMessageBox.warning(dialog, "Error", f"Dates are dd/mm/YYYY: {e}")
+                return
+            dialog.accept()
+            self.export(type_of, start_date, end_date, text_input.text().strip() or None, **options)
+
+        submit.clicked.connect(export)
+        dialog.exec_()
+
+    def export(self, type_of, start_date: str = None, end_date: str = None, text: str = None,
+               partition_by_date: bool = False):
+        """
+        Export visits (optionally only those between start_date and end_date
+        and matching text) on a background thread with a cancellable progress dialog.
+        type_of is csv, html, parquet, arrow, or sqlite for a snapshot of the whole database.
+        """
+        # a partitioned export is a directory of files, kept apart from the single-file one
+        name = "file_by_date" if partition_by_date else f"file.{type_of}"
+        file_path = os.path.join(os.path.expanduser("~"), "Documents", name)
+
+        progress = QProgressDialog(f"Exporting to {type_of}...", "Cancel", 0, 100, self)
+        progress.setWindowTitle("Export")
+        progress.setWindowModality(Qt.WindowModal)
+        progress.setMinimumDuration(300)
+        progress.setValue(0)
+
+        # queued check-ins belong in the export, as in Records.export
+        self.write_queue.flush()
+        # archived months the range reaches are exported along with the live log
+        worker = ExportWorker(self.db, file_path, type_of, start_date, end_date, text, self,
+                              partition_by_date=partition_by_date,
+                              archives=archive.needed_archives(self.archive_dir, start_date, end_date))
+        progress.canceled.connect(worker.cancel)
+        worker.progress.connect(lambda done, total: progress.setValue(int(done * 100 / total) if total else 100))
+        worker.failed.connect(lambda message: QMessageBox.critical(self, "Export Failed", message))
+        worker.done.connect(self.export_finished)
+        worker.finished.connect(progress.close)
+        worker.finished.connect(worker.deleteLater)
+        self.export_worker = worker
+        worker.start()
+
+    def import_visits(self):
+        """Bulk-import visits from a CSV or JSON file, with an optional folder of photos (see importer.py)."""
+        if not self.admin:
+            QMessageBox.information(self, "Not admin", "You are not the admin")
+            return
+        file_path, _ = QFileDialog.getOpenFileName(
+            self, "Import Visits", os.path.expanduser("~"), "Visits (*.csv *.json *.jsonl *.ndjson)"
+        )
+        if not file_path:
+            return
+        photos_dir = None
+        if QMessageBox.question(self, "Photos", "Import visitor photos from a folder?",
+                                QMessageBox.Yes | QMessageBox.No) == QMessageBox.Yes:
+            photos_dir = QFileDialog.getExistingDirectory(self, "Photos Folder", os.path.dirname(file_path)) or None
+
+        progress = QProgressDialog("Importing visits...", "Cancel", 0, 100, self)
+        progress.setWindowTitle("Import")
+        progress.setWindowModality(Qt.WindowModal)
+        progress.setMinimumDuration(300)
+        progress.setValue(0)
+
+        worker = ImportWorker(self.db, file_path, photos_dir, self)
+        progress.canceled.connect(worker.cancel)
+        worker.progress.connect(lambda done, total: progress.setValue(min(int(done * 100 / total), 99) if total else 99))
+        worker.failed.connect(lambda message: QMessageBox.critical(self, "Import Failed", message))
+        worker.done.connect(self.import_finished)
+        worker.finished.connect(progress.close)
+        worker.finished.connect(worker.deleteLater)
+        self.import_worker = worker
+        worker.start()
+
+    def import_finished(self, report):
+        text = (f"{report['imported']} visits imported, {report['duplicates']} already logged, "
+                f"{report['invalid']} invalid ({report['rows_per_s']} rows/s).")
+        if report["photos"] or report["missing_photos"] or report["unreadable_photos"]:
+            text += (f"\n{report['photos']} photos stored, {report['unreadable_photos']} unreadable, "
+                     f"{report['missing_photos']} visits without one.")
+        if report["errors"]:
+            text += "\n\n" + "\n".join(f"Line {e['line']}: {e['error']}" for e in report["errors"][:10])
+        QMessageBox.information(self, "Import Complete", text)
+
+    def export_finished(self, file_path):
         msgbox = QMessageBox(self)
         msgbox.setWindowTitle("File saved sucessfully")
         msgbox.setText(f"File is saved at {file_path}")
@@ -327,6 +558,8 @@ class MainWindow(QMainWindow):
 
     def view(self):
         if self.admin:
+            # until the window is on screen with its first page of rows
+            started = time.perf_counter()
             dialog = QMainWindow(self)
             dialog.setWindowTitle("View Logs")
             dialog.resize(self.width() + 150, self.height() + 100)
@@ -335,8 +568,16 @@ class MainWindow(QMainWindow):
             file = menu.addMenu("File")
 
             export = file.addMenu("Export")
-            export.addAction("Export to csv").triggered.connect(lambda: self.export("csv"))
-            export.addAction("Export to html").triggered.connect(lambda: self.export("html"))
+            # a date range and the search box's text narrow down what is exported
+            export.addAction("Export to csv").triggered.connect(lambda: self.export_filtered("csv", search_input.text()))
+            export.addAction("Export to html").triggered.connect(lambda: self.export_filtered("html", search_input.text()))
+            export.addAction("Export to parquet").triggered.connect(
+                lambda: self.export_filtered("parquet", search_input.text()))
+            export.addAction("Export to parquet (by date)").triggered.connect(
+                lambda: self.export_filtered("parquet", search_input.text(), partition_by_date=True))
+            export.addAction("Export to arrow").triggered.connect(lambda: self.export_filtered("arrow", search_input.text()))
+            export.addSeparator()
+            export.addAction("Database snapshot").triggered.connect(lambda: self.export("sqlite"))
 
             # --- CENTRAL WIDGET ---
             win = QWidget()
@@ -351,51 +592,54 @@ class MainWindow(QMainWindow):
             search_box.addWidget(search_input)
             vbox.addLayout(search_box)
 
-            # --- TABLE WIDGET ---
-            table = QTableWidget()
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                cursor.execute("SELECT tag, name, address, time_in, purpose, time_out, date FROM users")
-                info = cursor.fetchall()
-
-                rows, columns = len(info), 7
-                table.setRowCount(rows)
-                table.setColumnCount(columns)
-
-                for row_idx, row_val in enumerate(info):
-                    for col_idx, cell in enumerate(row_val):
-                        text = "" if cell is None else str(cell)
-                        item = QTableWidgetItem(text)
-                        item.setTextAlignment(Qt.AlignCenter)
-                        item.setBackground(QColor(30, 30, 40))
-                        item.setFont(QFont("Consolas", 10))
-                        table.setItem(row_idx, col_idx, item)
-
-                table.setHorizontalHeaderLabels(["Tag", "Name", "Address", "Time In", "Purpose", "Time Out", "Date"])
+            # --- TABLE VIEW ---
+            # rows are paged in from SQLite as the view scrolls
+            model = VisitTableModel(self.db, self.thumbnails, dialog, archive_dir=self.archive_dir)
+            table = QTableView()
+            table.setModel(model)
+            table.verticalHeader().setDefaultSectionSize(model.THUMB_SIZE[1] + 4)
+            table.setColumnWidth(0, model.THUMB_SIZE[0] + 12)
+            # thumbnails queued for rows scrolled past are dropped
+            table.verticalScrollBar().valueChanged.connect(model.drop_queued_thumbnails)
             vbox.addWidget(table)
             win.setLayout(vbox)
             dialog.setCentralWidget(win)
 
             # --- FILTER FUNCTION ---
-            def filter_table():
-                filter_text = search_input.text().strip().lower()
-                for row in range(table.rowCount()):
-                    match = False
-                    for col in range(table.columnCount()):
-                        item = table.item(row, col)
-                        if filter_text in item.text().lower():
-                            match = True
-                            break
-                    table.setRowHidden(row, not match)
-
-            # Connect filter
-            search_input.textChanged.connect(filter_table)
+            # debounced: the query runs once typing pauses, not on every keystroke
+            search_timer = QTimer(dialog)
+            search_timer.setSingleShot(True)
+            search_timer.setInterval(200)
+            search_timer.timeout.connect(lambda: model.set_filter(search_input.text()))
+            search_input.textChanged.connect(lambda _: search_timer.start())
+            dialog.setAttribute(Qt.WA_DeleteOnClose)
 
             dialog.show()
+            metrics.observe("ui.view", (time.perf_counter() - started) * 1000)
         else:
             QMessageBox.information(self, "Not admin", "You are not the admin")
 
 
+    def dashboard(self):
+        if self.admin:
+            # figures come from the aggregate tables the save path keeps current (see stats.py)
+            dialog = Dashboard(self.db, self)
+            dialog.setAttribute(Qt.WA_DeleteOnClose)
+            dialog.show()
+        else:
+            QMessageBox.information(self, "Not admin", "You are not the admin")
+
+    def performance(self):
+        if self.admin:
+            # one profiler for the session, so a capture survives closing the panel
+            if not hasattr(self, "profiler"):
+                self.profiler = metrics.Profiler()
+            dialog = PerformancePanel(profiler=self.profiler, parent=self)
+            dialog.setAttribute(Qt.WA_DeleteOnClose)
+            dialog.show()
+        else:
+            QMessageBox.information(self, "Not admin", "You are not the admin")
+
     def settings(self):
         admin = AdminLogin(self)
         if admin.exec_() == QDialog.Accepted:
@@ -413,6 +657,12 @@ class MainWindow(QMainWindow):
             self.toggle_theme()
         elif command.text() == "View Table":
             self.view()
+        elif command.text() == "Import Visits":
+            self.import_visits()
+        elif command.text() == "Dashboard":
+            self.dashboard()
+        elif command.text() == "Performance":
+            self.performance()
         elif command.text() == "Clear All":
             self.clear()
         elif command.text() == "Clear Date":
@@ -425,6 +675,29 @@ class MainWindow(QMainWindow):
     # ------------------------------
     # Camera Integration
     # ------------------------------
+    def update_camera_list(self, cameras: list):
+        """
+        Slot connected to CameraDiscovery.camerasChanged.
+        Refreshes the camera dialog's combo box without reopening the camera.
+        """
+        combo = getattr(self, "combo", None)
+        if combo is None:
+            return
+        try:
+            current = combo.currentText()
+            items = [str(i) for i in cameras] if cameras else ["0"]
+            if current and current not in items:
+                items.insert(0, current)
+            combo.blockSignals(True)
+            combo.clear()
+            combo.addItems(items)
+            combo.setCurrentIndex(items.index(current) if current in items else 0)
+            combo.blockSignals(False)
+            self.current_camera_index = combo.currentIndex()
+        except RuntimeError:
+            # dialog (and its combo) already destroyed
+            self.combo = None
+
     def change_camera(self, index: int):
         """
         Slot connected to QComboBox.currentIndexChanged[int].
@@ -451,8 +724,10 @@ class MainWindow(QMainWindow):
         btn_hbox = QHBoxLayout()
         snap_btn = QPushButton("Snap")
         self.combo = QComboBox()
-        # Populate combo with available cameras
-        cam_items = [str(i) for i in available_cameras] if available_cameras else ["0"]
+        # Populate combo with the cached camera list; a rescan is scheduled
+        # if it has expired and will update the combo when it finishes
+        cameras = self.camera_discovery.cameras()
+        cam_items = [str(i) for i in cameras] if cameras else ["0"]
         self.combo.clear()
         self.combo.addItems(cam_items)
         # ensure index bounds
@@ -472,65 +747,88 @@ class MainWindow(QMainWindow):
         close_btn.clicked.connect(self.close_camera_dialog)
         self.cam_dialog.closeEvent = lambda a0: self.close_camera_dialog()
 
-        # open camera
+        # open camera; the capture worker owns the device and converts frames
         cam_index = int(self.combo.currentText()) if self.combo.count() > 0 else 0
-        api_preference = cv2.CAP_DSHOW if sys.platform.startswith("win") else 0
-        self.cap = cv2.VideoCapture(cam_index, api_preference)
-        if not self.cap.isOpened():
-            QMessageBox.critical(self, "Camera Error", f"Unable to access the camera (index {cam_index}).")
-            return
-
-        # start timer to update frames
-        self.cam_timer = QTimer()
-        self.cam_timer.timeout.connect(self.update_camera_frame)
-        self.cam_timer.start(30)
+        self.capture = CaptureWorker(cam_index, (self.cam_label.width(), self.cam_label.height()))
+        self.capture.frameReady.connect(self.update_camera_frame)
+        self.capture.failed.connect(self.camera_failed)
+        self.capture.start()
+        self.camera_discovery.in_use = {cam_index}
 
         self.cam_dialog.exec_()
 
+    def camera_failed(self, message: str):
+        QMessageBox.critical(self, "Camera Error", message)
+        self.close_camera_dialog()
+
     def update_camera_frame(self):
-        if not self.cap:
+        if not self.capture:
             return
-        ret, frame = self.cap.read()
-        if not ret:
+        qimg = self.capture.latest_frame()
+        if qimg is None:
+            # an earlier signal already picked up the newest frame
             return
+        with metrics.timer("ui.camera_frame"):
+            self.cam_label.setPixmap(QPixmap.fromImage(qimg))
 
-        frame_rgb = cv2.cvtColor(cv2.flip(frame, 1), cv2.COLOR_BGR2RGB)
-        h, w, ch = frame_rgb.shape
-        bytes_per_line = ch * w
-        qimg = QImage(frame_rgb.data, w, h, bytes_per_line, QImage.Format_RGB888)
-        scaled = qimg.scaled(self.cam_label.width(), self.cam_label.height(), Qt.KeepAspectRatio)
-        self.cam_label.setPixmap(QPixmap.fromImage(scaled))
+        stats = self.capture.stats()
+        self.cam_dialog.setWindowTitle(f"Camera - Snap Profile Photo ({stats['fps']} fps, {stats['dropped']} dropped)")
 
     def take_snapshot(self):
-        if not self.cap:
+        if not self.capture or not self.capture.isRunning():
             QMessageBox.warning(self, "Error", "Camera is not active.")
             return
-        ret, frame = self.cap.read()
-        if not ret:
+        frames = self.capture.recent_raw_frames()
+        if not frames:
             QMessageBox.warning(self, "Error", "Failed to capture image.")
             return
 
-        # naive crop/resize (you can integrate a face detector here later)
-        face_crop = cv2.resize(cv2.flip(frame, 1), (200, 200))
-        images_dir = os.path.join(os.path.dirname(__file__), "images")
-        os.makedirs(images_dir, exist_ok=True)
-        profile_path = os.path.join(images_dir, "temp.jpg")
-        cv2.imwrite(profile_path, face_crop)
-
-        pixmap = QPixmap(profile_path).scaled(100, 90, Qt.KeepAspectRatio, Qt.SmoothTransformation)
-        self.picture.setPixmap(pixmap)
+        import cv2
+        from faces import face_detector, best_face, sharpness
+        detector = face_detector()
+        if detector.available():
+            # crop to the face in the sharpest of the last few frames
+            face_crop = best_face(frames, detector)
+            if face_crop is None:
+                QMessageBox.warning(self, "No Face", "No face detected. Look at the camera and try again.")
+                return
+        else:
+            # no detection model installed: whole sharpest frame
+            face_crop = max(frames, key=sharpness)
+        face_crop = cv2.flip(face_crop, 1)
+        # encoded once, in memory; the same bytes feed the preview and save_record
+        self.snapshot = encode_snapshot(face_crop, **self.snapshot_settings)
+
+        pixmap = self.thumbnails.snapshot_pixmap(self.snapshot)
+        if pixmap is not None:
+            self.picture.setPixmap(pixmap)
+        if not self.name.text().strip() and self.face_recognizer:
+            self.prefill_returning_visitor(face_crop)
         QMessageBox.information(self, "Saved", "Profile picture updated.")
         self.close_camera_dialog()
 
+    def prefill_returning_visitor(self, face):
+        """Fill the empty form fields from the last visit of the closest matching enrolled face."""
+        match = self.face_recognizer.identify(face)
+        if not match:
+            return
+        photo_hash, similarity = match
+        with self.db.read() as conn:
+            record = conn.execute(
+                "SELECT name, address, purpose FROM users WHERE photo_hash=? ORDER BY id DESC LIMIT 1", (photo_hash,)
+            ).fetchone()
+        if not record:
+            return
+        for field, value in zip((self.name, self.address, self.purpose), record):
+            if not field.text().strip():
+                field.setText(value or "")
+        self.statusBar().showMessage(f"Returning visitor recognised: {record[0]} ({similarity:.2f})", 8000)
+
     def close_camera_dialog(self):
         try:
-            if hasattr(self, "cam_timer") and self.cam_timer is not None and self.cam_timer.isActive():
-                self.cam_timer.stop()
-        except Exception:
-            pass
-        try:
-            if hasattr(self, "cap") and self.cap is not None:
-                self.cap.release()
+            if getattr(self, "capture", None) is not None:
+                self.capture.frameReady.disconnect()
+                self.capture.stop()
         except Exception:
             pass
         try:
@@ -538,8 +836,9 @@ class MainWindow(QMainWindow):
                 self.cam_dialog.close()
         except Exception:
             pass
-        self.cap = None
-        self.cam_timer = None
+        self.capture = None
+        self.combo = None
+        self.camera_discovery.in_use = set()
 
     # ------------------------------
     # UI Setup
@@ -551,6 +850,7 @@ class MainWindow(QMainWindow):
         # --- TITLE + LOGO ---
         hbox = QHBoxLayout()
         self.title = QLabel("Access Control System")
+        self.title.setObjectName("title")
 
         logo = QLabel()
         logo_path = os.path.join("images", "logo.png")
@@ -572,11 +872,18 @@ class MainWindow(QMainWindow):
         toggle.setShortcut("Ctrl+T")
         view = QAction("View Table", self)
         view.setShortcut("Ctrl+V")
+        import_action = QAction("Import Visits", self)
+        dashboard = QAction("Dashboard", self)
+        dashboard.setShortcut("Ctrl+D")
+        performance = QAction("Performance", self)
         settings_action = QAction("Sign In", self)
         file.addAction(save)
         file.addAction(load)
         file.addAction(toggle)
         file.addAction(view)
+        file.addAction(import_action)
+        file.addAction(dashboard)
+        file.addAction(performance)
         file.addSeparator()
         file.addAction(settings_action)
         file.triggered.connect(self.menu_commands)
@@ -587,6 +894,12 @@ class MainWindow(QMainWindow):
         edit.addAction("Clear Timeout")
         edit.triggered.connect(self.menu_commands)
 
+        # --- BADGE SCAN ---
+        self.scan_input = QLineEdit()
+        self.scan_input.setPlaceholderText("Scan tag")
+        self.scan_input.returnPressed.connect(self.scan_tag)
+        vbox.addWidget(self.scan_input)
+
         # --- FORM ---
         self.form_frame = QFrame()
         self.form_frame.setObjectName("form_frame")
@@ -611,9 +924,9 @@ class MainWindow(QMainWindow):
         self.date.setReadOnly(True)
 
         picture_hbox = QHBoxLayout()
-        profile_path = os.path.join("images", "profile.jpg")
-        if os.path.exists(profile_path):
-            self.picture.setPixmap(QPixmap(profile_path).scaled(100, 90, Qt.KeepAspectRatio, Qt.SmoothTransformation))
+        pixmap = profile_pixmap()
+        if pixmap is not None:
+            self.picture.setPixmap(pixmap)
         picture_hbox.addWidget(self.picture, alignment=Qt.AlignCenter)
 
         change_btn = QPushButton("Change Photo")
@@ -649,41 +962,21 @@ class MainWindow(QMainWindow):
     # Themes
     # ------------------------------
     def set_light_theme(self):
-        self.title.setStyleSheet("font-size:28px;font-weight:bold;color:black;letter-spacing:2px;")
-        self.setStyleSheet("""
-            QMainWindow,QDialog{background-color:#f0f0f0;}
-            QLabel{font-size:17px;font-weight:500;color:#222;}
-            QLineEdit{padding:8px 12px;font-size:16px;border:1px solid #999;border-radius:8px;background:white;color:black;}
-            QPushButton{background-color:#0078d7;color:white;border-radius:8px;font-size:16px;padding:6px 12px;}
-            QPushButton:hover{background-color:#005fa3;}
-            QMenuBar, QMenu{background-color:#C8E1FA;color:#1E2832;font-size:15px}
-            QMenuBar::item::selected{background-color:#C8C8C8;color:#1E1E1E;font-size:15px}
-            QMenu::item::selected{background-color:#C8C8C8;color:#1E1E1E;font-size:15px}
-            QComboBox{background-color:#0078d7;color:white;font-size:14px}
-            #form_frame, #data{background-color:#ffffff;border-radius:12px;padding:20px;border:1px solid #ccc;}
-                """)
+        self.setStyleSheet(THEMES["light"])
 
     def set_dark_theme(self):
-        self.title.setStyleSheet("font-size:28px;font-weight:bold;color:white;letter-spacing:2px;")
-        self.setStyleSheet("""
-            QMainWindow,QDialog{background-color:#2A2A2A;}
-            QLabel{font-size:17px;font-weight:500;color:white;}
-            QLineEdit{padding:8px 12px;font-size:16px;border:1px solid #bdbdbd;border-radius:8px;background:#f7f7f7;}
-            QPushButton{background-color:#0078d7;color:white;border-radius:8px;font-size:16px;padding:6px 12px;}
-            QPushButton:hover{background-color:#005fa3;}
-            QMenuBar{background-color:#1E2832;color:#C8E1FA;font-size:15px}
-            QMenuBar::item::selected{background-color:#1E1E1E;color:#C8C8C8;font-size:15px}
-            QMenu{background-color:#1E2832;color:#C8E1FA;font-size:15px}
-            QMenu::item::selected{background-color:#1E1E1E;color:#C8C8C8;font-size:15px}
-            QComboBox{background-color:#0078d7;color:white;font-size:14px}
-            #form_frame, #data{background-color:#1E1E1E;border-radius:12px;padding:20px;border:1px solid #3A3A3A;}
-        """)
+        self.setStyleSheet(THEMES["dark"])
 
 # ------------------------------
 # Run App
 # ------------------------------
 if __name__ == "__main__":
     app = QApplication(sys.argv)
-    window = MainWindow()
+    try:
+        window = MainWindow()
+    except JournalInUse:
+        # a second copy on the same database would replay and truncate the first one's journal
+        QMessageBox.critical(None, "Already Running", "The app is already open on this database.")
+        sys.exit(1)
     window.show()
     sys.exit(app.exec_())
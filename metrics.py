@@ -0,0 +1,193 @@
+# metrics.py
+"""
+In-process timers and counters for the hot paths: saves, lookups,
+exports, the log viewer, camera frames, JPEG encoding and database
+commits. Each timer is a latency histogram with fixed buckets, so it
+costs a couple of microseconds per call and a few hundred bytes
+whatever the traffic.
+
+    with metrics.timer("db.write_batch"):
+        ...
+    metrics.count("write_queue.records", len(batch))
+
+snapshot(), to_json() and to_prometheus() dump everything for the
+admin panel (performance.py), the service's GET /metrics or offline
+analysis. Profiler captures a cProfile run on demand.
+ACCESS_CONTROL_METRICS=0 turns timing off.
+"""
+import bisect, cProfile, io, json, os, pstats, threading, time
+
+# bucket upper bounds in milliseconds; a last bucket takes anything slower
+BUCKETS_MS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+
+class Histogram:
+    __slots__ = ("counts", "count", "total", "max", "_lock")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS_MS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, ms: float):
+        bucket = bisect.bisect_left(BUCKETS_MS, ms)
+        with self._lock:
+            self.counts[bucket] += 1
+            self.count += 1
+            self.total += ms
+            if ms > self.max:
+                self.max = ms
+
+    def quantile(self, q: float) -> float:
+        """Estimate of the q-quantile in ms, interpolated within its bucket."""
+        with self._lock:
+            counts, count, largest = list(self.counts), self.count, self.max
+        if not count:
+            return 0.0
+        rank, seen = q * count, 0
+        for bucket, n in enumerate(counts):
+            if n and seen + n >= rank:
+                lower = BUCKETS_MS[bucket - 1] if bucket else 0.0
+                upper = BUCKETS_MS[bucket] if bucket < len(BUCKETS_MS) else largest
+                return min(lower + (upper - lower) * (rank - seen) / n, largest)
+            seen += n
+        return largest
+
+    def summary(self):
+        return {
+            "count": self.count, "mean_ms": self.total / self.count if self.count else 0.0,
+            "p50_ms": self.quantile(0.5), "p95_ms": self.quantile(0.95), "p99_ms": self.quantile(0.99),
+            "max_ms": self.max, "buckets": list(self.counts),
+        }
+
+
+class _Timer:
+    __slots__ = ("histogram", "start")
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe((time.perf_counter() - self.start) * 1000)
+
+
+class _NullTimer:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class Registry:
+    """Named histograms and counters, safe to update from any thread."""
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self.started = time.time()
+        self._histograms = {}
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def histogram(self, name: str) -> Histogram:
+        histogram = self._histograms.get(name)
+        if histogram is None:
+            with self._lock:
+                histogram = self._histograms.setdefault(name, Histogram())
+        return histogram
+
+    def timer(self, name: str):
+        """Context manager recording how long its block took under name."""
+        return _Timer(self.histogram(name)) if self.enabled else _NULL_TIMER
+
+    def observe(self, name: str, ms: float):
+        if self.enabled:
+            self.histogram(name).observe(ms)
+
+    def count(self, name: str, n: int = 1):
+        if self.enabled:
+            with self._lock:
+                self._counters[name] = self._counters.get(name, 0) + n
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+            self.started = time.time()
+
+    def snapshot(self):
+        with self._lock:
+            histograms, counters = dict(self._histograms), dict(self._counters)
+        return {
+            "uptime_s": time.time() - self.started, "buckets_ms": list(BUCKETS_MS),
+            "timers": {name: histograms[name].summary() for name in sorted(histograms)},
+            "counters": dict(sorted(counters.items())),
+        }
+
+    def to_json(self) -> str:
+        return json.dumps(self.snapshot(), indent=2)
+
+    def to_prometheus(self, prefix: str = "access_control") -> str:
+        """The Prometheus text format: one histogram (in seconds) per timer, one counter per count."""
+        snapshot = self.snapshot()
+        lines = [f"# TYPE {prefix}_duration_seconds histogram"]
+        for name, timer in snapshot["timers"].items():
+            cumulative = 0
+            for bound, n in zip(BUCKETS_MS + (float("inf"),), timer["buckets"]):
+                cumulative += n
+                le = "+Inf" if bound == float("inf") else repr(bound / 1000)
+                lines.append(f'{prefix}_duration_seconds_bucket{{op="{name}",le="{le}"}} {cumulative}')
+            lines.append(f'{prefix}_duration_seconds_sum{{op="{name}"}} {timer["mean_ms"] * timer["count"] / 1000}')
+            lines.append(f'{prefix}_duration_seconds_count{{op="{name}"}} {timer["count"]}')
+        lines.append(f"# TYPE {prefix}_events_total counter")
+        for name, value in snapshot["counters"].items():
+            lines.append(f'{prefix}_events_total{{name="{name}"}} {value}')
+        return "\n".join(lines) + "\n"
+
+
+class Profiler:
+    """
+    cProfile on demand. It profiles the thread that calls start() (the GUI
+    thread from the admin panel) until stop().
+    """
+
+    def __init__(self):
+        self._profile = None
+        self.started = None
+
+    def running(self) -> bool:
+        return self._profile is not None
+
+    def start(self):
+        if self._profile is None:
+            self._profile = cProfile.Profile()
+            self.started = time.perf_counter()
+            self._profile.enable()
+
+    def stop(self, path: str = None, limit: int = 30) -> str:
+        """Stop profiling; returns the top functions by cumulative time and writes a .prof file to path if given."""
+        if self._profile is None:
+            return ""
+        self._profile.disable()
+        profile, self._profile = self._profile, None
+        if path:
+            profile.dump_stats(path)
+        out = io.StringIO()
+        out.write(f"{time.perf_counter() - self.started:.1f} s profiled\n")
+        pstats.Stats(profile, stream=out).sort_stats("cumulative").print_stats(limit)
+        return out.getvalue()
+
+
+REGISTRY = Registry(enabled=os.environ.get("ACCESS_CONTROL_METRICS", "1") != "0")
+timer = REGISTRY.timer
+observe = REGISTRY.observe
+count = REGISTRY.count
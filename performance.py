@@ -0,0 +1,109 @@
+# performance.py
+from PyQt5.QtWidgets import (
+    QDialog, QVBoxLayout, QHBoxLayout, QPushButton, QTableWidget, QTableWidgetItem, QHeaderView, QPlainTextEdit,
+    QLabel, QMessageBox
+)
+from PyQt5.QtCore import QTimer
+from PyQt5.QtGui import QFont
+import datetime, os
+import metrics
+
+
+class PerformancePanel(QDialog):
+    """
+    Admin view of the metrics registry: latency per timed operation and
+    the counters, refreshed every couple of seconds. Can reset them, dump
+    them as JSON or Prometheus text, and profile the GUI thread on demand.
+    """
+
+    REFRESH_MS = 2000
+    HEADERS = ["Operation", "Count", "Mean ms", "p50 ms", "p95 ms", "p99 ms", "Max ms"]
+
+    def __init__(self, registry: metrics.Registry = metrics.REGISTRY, profiler: metrics.Profiler = None,
+                 dump_dir: str = None, parent=None):
+        super().__init__(parent)
+        self.registry = registry
+        self.profiler = profiler or metrics.Profiler()
+        self.dump_dir = dump_dir or os.path.join(os.path.expanduser("~"), "Documents")
+        self.setWindowTitle("Performance")
+        self.resize(760, 560)
+
+        layout = QVBoxLayout(self)
+        self.status = QLabel()
+        layout.addWidget(self.status)
+        self.table = QTableWidget(0, len(self.HEADERS))
+        self.table.setHorizontalHeaderLabels(self.HEADERS)
+        self.table.setEditTriggers(QTableWidget.NoEditTriggers)
+        self.table.verticalHeader().setVisible(False)
+        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeToContents)
+        self.table.horizontalHeader().setSectionResizeMode(0, QHeaderView.Stretch)
+        layout.addWidget(self.table)
+        self.counters = QLabel()
+        self.counters.setWordWrap(True)
+        layout.addWidget(self.counters)
+
+        buttons = QHBoxLayout()
+        for label, slot in (("Reset", self.reset), ("Save JSON", lambda: self.dump("json")),
+                            ("Save Prometheus", lambda: self.dump("prom"))):
+            button = QPushButton(label)
+            button.clicked.connect(slot)
+            buttons.addWidget(button)
+        self.profile_btn = QPushButton()
+        self.profile_btn.clicked.connect(self.toggle_profile)
+        buttons.addWidget(self.profile_btn)
+        layout.addLayout(buttons)
+
+        self.profile_output = QPlainTextEdit()
+        self.profile_output.setReadOnly(True)
+        self.profile_output.setFont(QFont("Monospace", 9))
+        self.profile_output.setVisible(False)
+        layout.addWidget(self.profile_output)
+
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.refresh)
+        self.timer.start(self.REFRESH_MS)
+        self.refresh()
+
+    def refresh(self):
+        snapshot = self.registry.snapshot()
+        timers = snapshot["timers"]
+        self.table.setRowCount(len(timers))
+        for row, (name, timer) in enumerate(timers.items()):
+            values = [name, timer["count"]] + [f"{timer[key]:.2f}" for key in
+                                               ("mean_ms", "p50_ms", "p95_ms", "p99_ms", "max_ms")]
+            for column, value in enumerate(values):
+                self.table.setItem(row, column, QTableWidgetItem(str(value)))
+        self.counters.setText("   ".join(f"{name}: {value}" for name, value in snapshot["counters"].items()))
+        state = "on" if self.registry.enabled else "off (ACCESS_CONTROL_METRICS=0)"
+        self.status.setText(f"Timing {state}, collected over {snapshot['uptime_s'] / 60:.1f} min")
+        self.profile_btn.setText("Stop profiling" if self.profiler.running() else "Start profiling")
+
+    def reset(self):
+        self.registry.reset()
+        self.refresh()
+
+    def _path(self, extension: str) -> str:
+        stamp = datetime.datetime.now().strftime("%Y%m%d-%H%M%S")
+        return os.path.join(self.dump_dir, f"access-control-metrics-{stamp}.{extension}")
+
+    def dump(self, kind: str):
+        path = self._path("json" if kind == "json" else "prom")
+        text = self.registry.to_json() if kind == "json" else self.registry.to_prometheus()
+        try:
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(text)
+        except OSError as e:
+            QMessageBox.critical(self, "Save Failed", f"Could not write {path}:\n{e}")
+            return
+        QMessageBox.information(self, "Saved", f"Metrics saved to {path}")
+
+    def toggle_profile(self):
+        if self.profiler.running():
+            path = self._path("prof")
+            os.makedirs(self.dump_dir, exist_ok=True)
+            report = self.profiler.stop(path)
+            self.profile_output.setPlainText(f"Saved to {path} (open with pstats or snakeviz)\n{report}")
+            self.profile_output.setVisible(True)
+        else:
+            self.profiler.start()
+        self.refresh()
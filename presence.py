@@ -0,0 +1,136 @@
+# presence.py
+"""
+Badge scans at the gate. One scan of a tag toggles its visitor: checked
+out if the tag is inside, checked in if a visit is pre-registered for it
+today (see importer.py), in one short durable transaction either way.
+
+Who is inside is kept in memory (tag -> visit), loaded from the
+open_visits table that triggers on users keep current (see
+database._v9_statistics), so a check-out needs no lookup first. The
+update itself is guarded, so a visit another process checked out
+meanwhile is looked up again rather than checked out twice.
+
+A visit that runs past midnight stays under its check-in date and is
+checked out with a time_out earlier than its time_in. One left open
+for longer than max_stay_hours (a badge returned without a scan) is
+not closed by the next visitor's scan: it is reported as stale instead.
+"""
+import datetime, threading
+import database, metrics
+
+CHECK_IN, CHECK_OUT, UNKNOWN = "check_in", "check_out", "unknown"
+
+
+def normalize_tag(tag) -> str:
+    return str(tag).strip().rjust(3, '0')
+
+
+class Presence:
+    """
+    The scan-to-toggle state machine over the visits currently inside.
+
+    write_queue, when given, is flushed before a scan if it still holds
+    records, so a visit saved from the form a moment ago is seen.
+    """
+
+    def __init__(self, db: database.Database, write_queue=None, max_stay_hours: float = 24):
+        self.db = db
+        self.write_queue = write_queue
+        self.max_stay = datetime.timedelta(hours=max_stay_hours)
+        self._lock = threading.Lock()
+        self.reload()
+
+    def reload(self):
+        """Reload who is inside from the database; the latest check-in wins when a tag has several."""
+        with self.db.read() as conn:
+            rows = conn.execute("""
+                SELECT o.tag, o.visit_id, o.date, u.time_in FROM open_visits o JOIN users u ON u.id = o.visit_id
+                ORDER BY o.date, u.time_in
+            """).fetchall()
+        with self._lock:
+            self._inside = {tag: (visit_id, date, time_in) for tag, visit_id, date, time_in in rows}
+
+    def inside(self):
+        """{tag: (visit_id, date, time_in)} of the visits checked in and not out."""
+        with self._lock:
+            return dict(self._inside)
+
+    def scan(self, tag: str, now: datetime.datetime = None) -> dict:
+        """
+        Toggle the visit for tag and return what happened: action is
+        check_in, check_out or unknown (nothing inside or expected under
+        this tag), visit is the visit's row as a dict, stale an open visit
+        too old to be this scan's.
+        """
+        tag = normalize_tag(tag)
+        now = now or datetime.datetime.now()
+        if self.write_queue is not None and self.write_queue.pending():
+            self.write_queue.flush()
+        with self._lock, metrics.timer("presence.scan"):
+            # acknowledged at the gate, so it must survive a power cut like a form save
+            with self.db.write(durable=True) as cursor:
+                result = self._toggle(cursor, tag, now)
+            # memory follows the committed state only
+            if result["action"] == CHECK_OUT:
+                self._inside.pop(tag, None)
+            elif result["action"] == CHECK_IN:
+                visit = result["visit"]
+                self._inside[tag] = (visit["id"], visit["date"], visit["time_in"])
+        metrics.count(f"presence.{result['action']}")
+        return result
+
+    # --- transitions ---
+    def _toggle(self, cursor, tag, now):
+        result = {"action": UNKNOWN, "tag": tag, "visit": None, "stale": None}
+        time = now.strftime("%H:%M:%S")
+        entry = self._inside.get(tag)
+        if entry is not None and self._fresh(entry, now) and self._check_out(cursor, entry[0], time):
+            return dict(result, action=CHECK_OUT, visit=self._visit(cursor, entry[0]))
+        # not inside as far as memory knows, or checked out elsewhere since: ask the table
+        self._inside.pop(tag, None)
+        entry = cursor.execute("""
+            SELECT o.visit_id, o.date, u.time_in FROM open_visits o JOIN users u ON u.id = o.visit_id
+            WHERE o.tag=? ORDER BY o.date DESC, u.time_in DESC LIMIT 1
+        """, (tag,)).fetchone()
+        if entry is not None:
+            if self._fresh(entry, now) and self._check_out(cursor, entry[0], time):
+                return dict(result, action=CHECK_OUT, visit=self._visit(cursor, entry[0]))
+            result["stale"] = self._visit(cursor, entry[0])
+        visit_id = self._check_in(cursor, tag, now.date().isoformat(), time)
+        if visit_id is not None:
+            result.update(action=CHECK_IN, visit=self._visit(cursor, visit_id))
+        return result
+
+    def _fresh(self, entry, now) -> bool:
+        _, date, time_in = entry
+        try:
+            started = datetime.datetime.fromisoformat(f"{date}T{time_in}")
+        except ValueError:
+            return False
+        return now - started <= self.max_stay
+
+    @staticmethod
+    def _check_out(cursor, visit_id, time) -> bool:
+        return cursor.execute(
+            "UPDATE users SET time_out=? WHERE id=? AND COALESCE(time_in, '') <> '' AND COALESCE(time_out, '') = ''",
+            (time, visit_id)
+        ).rowcount == 1
+
+    @staticmethod
+    def _check_in(cursor, tag, date, time):
+        """Id of today's pre-registered visit for tag, now checked in, or None if there is none."""
+        row = cursor.execute(
+            "SELECT id FROM users WHERE tag=? AND date=? AND COALESCE(time_in, '') = '' ORDER BY id LIMIT 1",
+            (tag, date)
+        ).fetchone()
+        if row is None:
+            return None
+        cursor.execute("UPDATE users SET time_in=? WHERE id=?", (time, row[0]))
+        return row[0]
+
+    @staticmethod
+    def _visit(cursor, visit_id):
+        row = cursor.execute(
+            f"SELECT id, {', '.join(database.VISIT_COLUMNS)} FROM users WHERE id=?", (visit_id,)
+        ).fetchone()
+        return dict(zip(["id"] + database.VISIT_COLUMNS, row)) if row else None
@@ -0,0 +1,137 @@
+# records.py
+from concurrent.futures import Future
+import datetime, threading
+import database, exporter, archive, metrics
+from write_queue import WriteQueue
+
+TIME_FORMAT = "%H:%M:%S"
+
+
+class VisitExists(Exception):
+    """A visit for this name is already logged on this date."""
+
+
+class VisitNotFound(Exception):
+    """No visit matches the tag (or name) on this date."""
+
+
+def now_time() -> str:
+    return datetime.datetime.now().strftime(TIME_FORMAT)
+
+
+def today() -> str:
+    return datetime.date.today().isoformat()
+
+
+class Records:
+    """
+    Visit logic with no UI attached, shared by the desktop window and the
+    HTTP service.
+
+    Writes go through the WriteQueue and come back as Futures. Until its
+    batch commits, a visit is also kept in a small in-memory table of
+    pending writes, so lookups and duplicate checks see it straight away
+    without waiting on (flushing) the queue. Photos of saved visits are
+    enrolled with the face recognizer when one is given. Exports include
+    the archived months (see archive.py) in archive_dir.
+    """
+
+    def __init__(self, db: database.Database, write_queue: WriteQueue, face_recognizer=None, archive_dir: str = None):
+        self.db = db
+        self.archive_dir = archive_dir
+        self.write_queue = write_queue
+        self.face_recognizer = face_recognizer
+        # (name, date) -> visit dict, for inserts not yet committed
+        self._pending = {}
+        self._lock = threading.RLock()
+
+    # --- reads ---
+    def find_visit_id(self, name: str, date: str):
+        """Id of the visit for name on date; 0 if it is still queued, None if there is none."""
+        with self._lock:
+            if (name, date) in self._pending:
+                return 0
+            with metrics.timer("db.find_visit"), self.db.read() as conn:
+                row = conn.execute("SELECT id FROM users WHERE name=? AND date=?", (name, date)).fetchone()
+        return row[0] if row else None
+
+    def lookup(self, tag: str, date: str = None):
+        """The visit for tag on date (default today) as a dict, or None; archived visits are found too."""
+        date = database.to_iso_date(date) or today()
+        tag = tag.strip().rjust(3, '0')
+        sql = """
+            SELECT id, tag, name, address, purpose, time_in, time_out, date, photo_hash
+            FROM {schema}.users WHERE tag=? AND date=?
+        """
+        archived = False
+        with metrics.timer("db.lookup"), self.db.read() as conn:
+            row = conn.execute(sql.format(schema="main"), (tag, date)).fetchone()
+            if row is None:
+                # a visit moved out by retention is still found in its month's archive (read-only, no live id)
+                for schema in database.attach_each(conn, archive.needed_archives(self.archive_dir, date, date)):
+                    row = conn.execute(sql.format(schema=schema), (tag, date)).fetchone()
+                    archived = row is not None
+        if row:
+            visit = dict(zip(("id", "tag", "name", "address", "purpose", "time_in", "time_out", "date",
+                              "photo_hash"), row))
+            if archived:
+                visit.update(id=None, archived=True)
+            return visit
+        with self._lock:
+            for visit in self._pending.values():
+                if visit["date"] == date and visit["tag"].rjust(3, '0') == tag:
+                    fields = {field: visit[field] for field in database.VISIT_FIELDS}
+                    photo = database.photo_hash(visit["picture"]) if visit.get("picture") else None
+                    return dict(fields, id=None, photo_hash=photo)
+        return None
+
+    # --- writes ---
+    def save(self, visit: dict, update: bool = False) -> Future:
+        """Queue visit (VISIT_FIELDS plus optional picture bytes) as a new record or an update of name/date."""
+        key = (visit["name"], visit["date"])
+        with self._lock:
+            future = self.write_queue.submit("update" if update else "insert", visit)
+            if not update:
+                self._pending[key] = visit
+
+        def done(f):
+            with self._lock:
+                if self._pending.get(key) is visit:
+                    del self._pending[key]
+            if self.face_recognizer and visit.get("picture") and f.exception() is None and f.result() is not None:
+                # recognisable on their next visit
+                self.face_recognizer.enroll(visit["picture"])
+        future.add_done_callback(done)
+        return future
+
+    def check_in(self, tag: str, name: str, address: str, purpose: str, picture: bytes = None,
+                 date: str = None, time_in: str = None) -> Future:
+        """Log a new visit; raises VisitExists if name already checked in on date."""
+        date = database.to_iso_date(date) or today()
+        visit = {
+            # stored padded, the way lookups ask for it
+            "tag": tag.strip().rjust(3, '0'), "name": name, "address": address, "purpose": purpose,
+            "time_in": time_in or now_time(), "time_out": "", "date": date, "picture": picture
+        }
+        # checked and queued under one lock so two gates can't log the same visit twice
+        with self._lock:
+            if self.find_visit_id(name, date) is not None:
+                raise VisitExists(f"{name} is already checked in on {date}")
+            return self.save(visit)
+
+    def check_out(self, tag: str, date: str = None, time_out: str = None) -> Future:
+        """Set time_out on the visit for tag on date; raises VisitNotFound if there is none."""
+        date = database.to_iso_date(date) or today()
+        visit = self.lookup(tag, date)
+        if visit is None or visit.get("archived"):
+            raise VisitNotFound(f"No visit for tag {tag} on {date}")
+        return self.save({"name": visit["name"], "date": date, "time_out": time_out or now_time()}, update=True)
+
+    # --- export ---
+    def export(self, file_path: str, type_of: str, start_date=None, end_date=None, text=None, **options):
+        """Export visits to file_path (see exporter.export_visits); returns the number of rows written."""
+        # queued records belong in the export
+        self.write_queue.flush()
+        start_date, end_date = database.to_iso_date(start_date) or None, database.to_iso_date(end_date) or None
+        options.setdefault("archives", archive.needed_archives(self.archive_dir, start_date, end_date))
+        return exporter.export_visits(self.db, file_path, type_of, start_date, end_date, text, **options)
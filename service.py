@@ -0,0 +1,254 @@
+# service.py
+"""
+Headless visit log for badge readers and turnstiles: a small HTTP/JSON
+API over the same database as the desktop app, no Qt required.
+
+    python service.py --db my_db.db --port 8080
+
+    POST /check-in    {"tag", "name", "address", "purpose", "picture"?: base64, "date"?, "time_in"?}
+    POST /check-out   {"tag", "date"?, "time_out"?}
+    POST /scan        {"tag"}  check the tag's visitor out, or in if pre-registered today
+    GET  /visits/<tag>[?date=YYYY-MM-DD]
+    POST /export      {"format", "start_date"?, "end_date"?, "text"?}
+    GET  /stats[?date=YYYY-MM-DD]
+    GET  /metrics     latency histograms and counters, Prometheus text format
+    GET  /health
+
+Writes are acknowledged once committed. Concurrent check-ins share the
+write queue's batched transactions; reads use the pooled reader
+connections. Blocking work runs on a thread pool so the event loop only
+parses and answers requests.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit, parse_qs, unquote
+import argparse, asyncio, base64, binascii, datetime, json, os
+import archive, database, importer, metrics, stats
+from presence import Presence, UNKNOWN
+from records import Records, VisitExists, VisitNotFound
+from write_queue import WriteQueue
+
+MAX_BODY = 16 * 1024 * 1024
+REASONS = {200: "OK", 201: "Created", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+           409: "Conflict", 413: "Payload Too Large", 500: "Internal Server Error"}
+
+
+class HTTPError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+def _required(body: dict, *fields):
+    missing = [field for field in fields if not str(body.get(field) or "").strip()]
+    if missing:
+        raise HTTPError(400, f"Missing fields: {', '.join(missing)}")
+    return [str(body[field]).strip() for field in fields]
+
+
+def _optional(field: str, value, normalize):
+    """value checked and normalized (see importer.normalize_date/_time), or None if absent."""
+    value = str(value or "").strip()
+    if not value:
+        return None
+    try:
+        return normalize(value)
+    except ValueError as e:
+        raise HTTPError(400, f"{field}: {e}")
+
+
+ENDPOINTS = {"check-in", "check-out", "scan", "visits", "export", "stats", "metrics", "health"}
+
+
+def _timer_name(method: str, target: str) -> str:
+    # one timer per endpoint; anything else shares one, so clients can't mint names
+    endpoint = urlsplit(target).path.split("/")[1:2]
+    return f"service.{method.upper()} /{endpoint[0] if endpoint and endpoint[0] in ENDPOINTS else 'other'}"
+
+
+class VisitService:
+    """Routes requests to a Records core; one instance per database."""
+
+    def __init__(self, db_path: str, export_dir: str, workers: int = 16):
+        database.create_database(db_path)
+        self.db = database.Database(db_path)
+        # a journal of its own, so the service can run alongside the desktop app
+        self.write_queue = WriteQueue(self.db, db_path + "-service-writes.jsonl", seq_key="service_write_journal_seq")
+        self.records = Records(self.db, self.write_queue, archive_dir=archive.archive_dir_for(db_path))
+        self.presence = Presence(self.db, self.write_queue)
+        self.export_dir = export_dir
+        self.executor = ThreadPoolExecutor(workers, thread_name_prefix="service")
+        self.requests = 0
+
+    def close(self):
+        self.executor.shutdown()
+        self.write_queue.close()
+        self.db.close()
+
+    async def _blocking(self, fn, *args, **kwargs):
+        return await asyncio.get_running_loop().run_in_executor(self.executor, lambda: fn(*args, **kwargs))
+
+    # --- endpoints ---
+    async def check_in(self, body: dict):
+        tag, name, address, purpose = _required(body, "tag", "name", "address", "purpose")
+        picture = None
+        if body.get("picture"):
+            try:
+                picture = base64.b64decode(body["picture"], validate=True)
+            except (binascii.Error, ValueError):
+                raise HTTPError(400, "picture must be base64")
+        date = _optional("date", body.get("date"), importer.normalize_date)
+        time_in = _optional("time_in", body.get("time_in"), importer.normalize_time)
+        try:
+            future = await self._blocking(self.records.check_in, tag, name, address, purpose, picture, date, time_in)
+        except VisitExists as e:
+            raise HTTPError(409, str(e))
+        return 201, {"id": await asyncio.wrap_future(future)}
+
+    async def check_out(self, body: dict):
+        tag, = _required(body, "tag")
+        date = _optional("date", body.get("date"), importer.normalize_date)
+        time_out = _optional("time_out", body.get("time_out"), importer.normalize_time)
+        try:
+            future = await self._blocking(self.records.check_out, tag, date, time_out)
+        except VisitNotFound as e:
+            raise HTTPError(404, str(e))
+        return 200, {"id": await asyncio.wrap_future(future)}
+
+    async def scan(self, body: dict):
+        tag, = _required(body, "tag")
+        result = await self._blocking(self.presence.scan, tag)
+        if result["action"] == UNKNOWN:
+            raise HTTPError(404, f"Tag {result['tag']} is not expected today")
+        return 200, result
+
+    async def lookup(self, tag: str, query: dict):
+        date = _optional("date", query.get("date", [None])[0], importer.normalize_date)
+        visit = await self._blocking(self.records.lookup, tag, date)
+        if visit is None:
+            raise HTTPError(404, f"No visit for tag {tag}")
+        return 200, visit
+
+    async def export(self, body: dict):
+        type_of, = _required(body, "format")
+        if type_of not in ("csv", "html", "parquet", "arrow", "sqlite"):
+            raise HTTPError(400, f"Unknown export format: {type_of}")
+        # the file name is chosen here, never taken from the request
+        stamp = datetime.datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+        file_path = os.path.join(self.export_dir, f"visits-{stamp}.{type_of}")
+        start_date = _optional("start_date", body.get("start_date"), importer.normalize_date)
+        end_date = _optional("end_date", body.get("end_date"), importer.normalize_date)
+        rows = await self._blocking(self.records.export, file_path, type_of, start_date, end_date, body.get("text"))
+        return 200, {"path": file_path, "rows": rows}
+
+    async def stats(self, query: dict):
+        date = _optional("date", query.get("date", [None])[0], importer.normalize_date)
+        return 200, await self._blocking(stats.summary, self.db, date)
+
+    async def health(self):
+        return 200, {"requests": self.requests, "write_queue": self.write_queue.stats()}
+
+    async def route(self, method: str, target: str, body: bytes):
+        url = urlsplit(target)
+        path = url.path.rstrip("/")
+        if method == "GET" and path.startswith("/visits/"):
+            return await self.lookup(unquote(path[len("/visits/"):]), parse_qs(url.query))
+        if method == "GET" and path == "/stats":
+            return await self.stats(parse_qs(url.query))
+        if method == "GET" and path == "/metrics":
+            return 200, metrics.REGISTRY.to_prometheus()
+        if method == "GET" and path == "/health":
+            return await self.health()
+        handlers = {"/check-in": self.check_in, "/check-out": self.check_out, "/scan": self.scan, "/export": self.export}
+        if path not in handlers:
+            raise HTTPError(404, f"No such endpoint: {path}")
+        if method != "POST":
+            raise HTTPError(405, f"{path} expects POST")
+        try:
+            payload = json.loads(body or b"{}")
+        except ValueError:
+            raise HTTPError(400, "Body must be JSON")
+        if not isinstance(payload, dict):
+            raise HTTPError(400, "Body must be a JSON object")
+        return await handlers[path](payload)
+
+    # --- HTTP/1.1 ---
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """One connection; requests on it are answered in order (keep-alive)."""
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    key, _, value = line.decode("latin-1").partition(":")
+                    headers[key.strip().lower()] = value.strip()
+                try:
+                    method, target, version = request_line.decode("latin-1").split()
+                    length = int(headers.get("content-length", 0))
+                    if length > MAX_BODY:
+                        raise HTTPError(413, "Request body too large")
+                    body = await reader.readexactly(length) if length else b""
+                    self.requests += 1
+                    with metrics.timer(_timer_name(method, target)):
+                        status, payload = await self.route(method.upper(), target, body)
+                except asyncio.IncompleteReadError:
+                    raise
+                except HTTPError as e:
+                    status, payload = e.status, {"error": str(e)}
+                except ValueError:
+                    status, payload = 400, {"error": "Malformed request"}
+                except Exception as e:
+                    status, payload = 500, {"error": str(e)}
+                keep_alive = (headers.get("connection", "").lower() != "close"
+                              and request_line.rstrip().endswith(b"HTTP/1.1") and status != 413)
+                if isinstance(payload, str):
+                    data, content_type = payload.encode("utf-8"), "text/plain; version=0.0.4"
+                else:
+                    data, content_type = json.dumps(payload).encode("utf-8"), "application/json"
+                writer.write(
+                    f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\n"
+                    f"Content-Type: {content_type}\r\nContent-Length: {len(data)}\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode("latin-1") + data
+                )
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+
+async def serve(service: VisitService, host: str, port: int, ready=None):
+    """Run until cancelled; ready(port) is called once the socket is listening."""
+    server = await asyncio.start_server(service.handle, host, port, backlog=1024)
+    if ready:
+        ready(server.sockets[0].getsockname()[1])
+    async with server:
+        await server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "my_db.db"))
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--export-dir", default=os.path.join(os.path.expanduser("~"), "Documents"))
+    args = parser.parse_args()
+
+    service = VisitService(args.db, args.export_dir)
+    try:
+        asyncio.run(serve(service, args.host, args.port,
+                          ready=lambda port: print(f"Listening on http://{args.host}:{port}")))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.close()
+
+
+if __name__ == "__main__":
+    main()
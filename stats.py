@@ -0,0 +1,88 @@
+# stats.py
+"""
+Occupancy and traffic statistics, read from the aggregate tables that
+triggers on users keep current (see database._v9_statistics): visits
+per day, per hour of check-in and per purpose, and the visits not
+checked out yet. Visits pre-registered but not checked in (no time_in)
+don't count until the visitor scans in. Every query reads a few index rows, however long the
+log is. Archived months (archive.py) carry their own aggregates.
+"""
+import datetime
+import database
+
+
+def today() -> str:
+    return datetime.date.today().isoformat()
+
+
+def occupancy(conn, date: str = None) -> int:
+    """
+    Visitors checked in and not checked out yet, whatever day they came
+    in, so a visit that runs past midnight still counts; only those who
+    checked in on date when one is given.
+    """
+    if date is None:
+        return conn.execute("SELECT count(*) FROM open_visits").fetchone()[0]
+    row = conn.execute("SELECT open FROM stats_daily WHERE date=?", (date,)).fetchone()
+    return row[0] if row else 0
+
+
+def inside(conn, date: str = None, limit: int = 500):
+    """[(tag, name, purpose, time_in)] of the visits still open (checked in on date, if given), earliest first."""
+    if date is None:
+        return conn.execute("""
+            SELECT u.tag, u.name, u.purpose, u.time_in FROM open_visits o JOIN users u ON u.id = o.visit_id
+            ORDER BY o.date, u.time_in LIMIT ?
+        """, (limit,)).fetchall()
+    return conn.execute("""
+        SELECT u.tag, u.name, u.purpose, u.time_in FROM open_visits o JOIN users u ON u.id = o.visit_id
+        WHERE o.date = ? ORDER BY u.time_in LIMIT ?
+    """, (date, limit)).fetchall()
+
+
+def daily_counts(conn, start_date: str, end_date: str):
+    """[(date, visits, still open)] for each day with visits between the dates, inclusive."""
+    return conn.execute("""
+        SELECT date, visits, open FROM stats_daily WHERE date BETWEEN ? AND ? AND visits > 0 ORDER BY date
+    """, (start_date, end_date)).fetchall()
+
+
+def hourly_counts(conn, date: str = None):
+    """Check-ins on date in each hour of the day, a list of 24 counts."""
+    hours = [0] * 24
+    for hour, visits in conn.execute("SELECT hour, visits FROM stats_hourly WHERE date=?", (date or today(),)):
+        if 0 <= hour < 24:
+            hours[hour] = visits
+    return hours
+
+
+def purpose_counts(conn, start_date: str, end_date: str):
+    """[(purpose, visits)] between the dates, most common first."""
+    return conn.execute("""
+        SELECT purpose, sum(visits) FROM stats_purpose WHERE date BETWEEN ? AND ?
+        GROUP BY purpose HAVING sum(visits) > 0 ORDER BY 2 DESC, 1
+    """, (start_date, end_date)).fetchall()
+
+
+def summary(db: database.Database, date: str = None, days: int = 14):
+    """
+    Everything the dashboard shows for date (default today) and the days
+    before it, as a dict. For today, inside is everyone not checked out
+    yet, including visits begun on an earlier day.
+    """
+    date = database.to_iso_date(date) or today()
+    open_on = None if date == today() else date
+    first = (datetime.date.fromisoformat(date) - datetime.timedelta(days=days - 1)).isoformat()
+    with db.read() as conn:
+        # one read transaction, so the figures agree with each other
+        conn.execute("BEGIN")
+        daily = daily_counts(conn, first, date)
+        return {
+            "date": date,
+            "inside": occupancy(conn, open_on),
+            "visits": sum(visits for day, visits, _ in daily if day == date),
+            "hourly": hourly_counts(conn, date),
+            "daily": [list(row) for row in daily],
+            "purposes": [list(row) for row in purpose_counts(conn, first, date)],
+            "inside_visits": [list(row) for row in inside(conn, open_on)],
+        }
@@ -0,0 +1,516 @@
+# sync.py
+"""
+Replication of visits between gate stations.
+
+Each database keeps a change log (the changes table): a monotonic seq per
+changed visit, maintained by triggers. A station sends a peer the visits
+changed since the last seq that peer acknowledged and applies what comes
+back, so only deltas travel, never whole database files. Photos are
+content-addressed and travel separately, once: a station asks for the
+ones its visits refer to but it doesn't have.
+
+Visits are matched across stations by (name, date), the same key
+save_record uses. Two copies of a visit merge field by field:
+
+  - time_out: the later time wins, and any time beats an empty one, so a
+    checkout at gate B is never undone by gate A's still-open copy;
+  - photo_hash: a photo beats none; if both have one, the higher hash
+    (arbitrary, but the same choice on every station);
+  - tag, address, purpose, time_in: taken from the earlier check-in; a
+    visit not checked in yet (empty time_in, a pre-registration) counts
+    as later than any check-in, so a badge scan at one gate is kept.
+
+The merge is commutative, associative and idempotent, so stations reach
+the same state whatever order deltas arrive in, and re-sending is
+harmless.
+
+Over TCP, stations prove to each other that they know a shared secret
+(HMAC challenge-response on the handshake) before any visit is sent or
+applied, and every frame after that carries an HMAC of its content and
+position, so frames can't be forged, altered or replayed.
+"""
+import base64, hashlib, hmac, json, os, socket, socketserver, struct, sys, threading, uuid, zlib
+import database
+from archive import ARCHIVED_BEFORE_KEY
+
+STATION_KEY = "station_id"
+COLUMNS = database.VISIT_COLUMNS
+BATCH = 1000
+NONCE = 16
+# before authentication only nonces and MACs travel
+HANDSHAKE_FRAME = 64
+MAX_FRAME = 256 * 1024 * 1024
+
+
+# ------------------------------
+# Deltas
+# ------------------------------
+def encode_delta(delta: dict) -> bytes:
+    return zlib.compress(json.dumps(delta, separators=(",", ":")).encode("utf-8"), 6)
+
+
+def decode_delta(data: bytes) -> dict:
+    return json.loads(zlib.decompress(data))
+
+
+def merge_visits(local: dict, incoming: dict) -> dict:
+    """The merged state of two copies of the same visit (see the module docstring)."""
+    def check_in_key(visit):
+        return (not visit["time_in"],) + tuple(visit[col] or "" for col in ("time_in", "tag", "address", "purpose"))
+
+    merged = dict(min(local, incoming, key=check_in_key))
+    merged["time_out"] = max(local["time_out"] or "", incoming["time_out"] or "")
+    merged["photo_hash"] = max(local["photo_hash"] or "", incoming["photo_hash"] or "") or None
+    return merged
+
+
+class Station:
+    """This database's side of replication: its station id, change log and peer cursors."""
+
+    def __init__(self, db: database.Database):
+        self.db = db
+        with db.write() as cursor:
+            station_id = database.get_meta(cursor, STATION_KEY)
+            if station_id is None:
+                station_id = uuid.uuid4().hex[:16]
+                database.set_meta(cursor, STATION_KEY, station_id)
+        self.station_id = station_id
+
+    # --- cursors ---
+    def cursor(self, name: str) -> int:
+        with self.db.read() as conn:
+            return int(database.get_meta(conn, f"sync:{name}", 0))
+
+    def set_cursor(self, name: str, seq: int):
+        with self.db.write() as cursor:
+            database.set_meta(cursor, f"sync:{name}", seq)
+
+    def last_seq(self) -> int:
+        with self.db.read() as conn:
+            return conn.execute("SELECT COALESCE(MAX(seq), 0) FROM changes").fetchone()[0]
+
+    # --- outgoing ---
+    def delta_since(self, seq: int, limit: int = BATCH, skip=None) -> dict:
+        """
+        Visits changed after seq, oldest change first. skip maps (name, date) to a visit state the receiver is
+        known to have; visits still in that state are left out. "more" is
+        set when limit cut the delta short.
+        """
+        skip = skip or {}
+        cols = ", ".join(f"u.{col}" for col in COLUMNS)
+        with self.db.read() as conn:
+            rows = conn.execute(f"""
+                SELECT c.seq, {cols} FROM changes c JOIN users u ON u.id = c.visit_id
+                WHERE c.seq > ? ORDER BY c.seq LIMIT ?
+            """, (seq, limit)).fetchall()
+        visits = [list(row[1:]) for row in rows if skip.get((row[2], row[7])) != tuple(row[1:])]
+        return {
+            "origin": self.station_id, "since": seq, "seq": rows[-1][0] if rows else seq,
+            "more": len(rows) == limit, "visits": visits,
+        }
+
+    # --- incoming ---
+    def apply(self, delta: dict):
+        """
+        Merge a peer's delta into this database. Returns {(name, date): state}
+        for the visits that now match the peer's copy exactly, for delta_since(skip=...).
+        """
+        in_sync = {}
+        with self.db.write() as cursor:
+            # visits this station has archived stay archived
+            archived_before = database.get_meta(cursor, ARCHIVED_BEFORE_KEY) or ""
+            for values in delta["visits"]:
+                incoming = dict(zip(COLUMNS, values))
+                key = (incoming["name"], incoming["date"])
+                if (incoming["date"] or "") < archived_before:
+                    in_sync[key] = tuple(incoming[col] for col in COLUMNS)
+                    continue
+                row = cursor.execute(
+                    f"SELECT id, {', '.join(COLUMNS)} FROM users WHERE name=? AND date=? ORDER BY id LIMIT 1", key
+                ).fetchone()
+                if row is None:
+                    cursor.execute(
+                        f"INSERT INTO users ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))})",
+                        [incoming[col] for col in COLUMNS]
+                    )
+                    merged = incoming
+                else:
+                    local = dict(zip(COLUMNS, row[1:]))
+                    merged = merge_visits(local, incoming)
+                    if merged != local:
+                        # the change triggers log it again, so it is passed on to other peers
+                        cursor.execute(
+                            f"UPDATE users SET {', '.join(f'{col}=?' for col in COLUMNS)} WHERE id=?",
+                            [merged[col] for col in COLUMNS] + [row[0]]
+                        )
+                if all((merged[col] or "") == (incoming[col] or "") for col in COLUMNS):
+                    in_sync[key] = tuple(merged[col] for col in COLUMNS)
+        return in_sync
+
+    # --- photos ---
+    def missing_photos(self, limit: int = 256):
+        """Hashes of photos visits refer to that this database doesn't have yet."""
+        with self.db.read() as conn:
+            return [row[0] for row in conn.execute("""
+                SELECT DISTINCT photo_hash FROM users u WHERE photo_hash IS NOT NULL
+                AND NOT EXISTS (SELECT 1 FROM photos p WHERE p.hash = u.photo_hash) LIMIT ?
+            """, (limit,))]
+
+    def photos(self, hashes) -> dict:
+        """{hash: base64 data} for the requested photos this database has."""
+        found = {}
+        with self.db.read() as conn:
+            for digest in hashes:
+                data = database.load_photo(conn, digest)
+                if data:
+                    found[digest] = base64.b64encode(data).decode("ascii")
+        return found
+
+    def store_photos(self, photos: dict):
+        with self.db.write() as cursor:
+            for digest, data in photos.items():
+                data = base64.b64decode(data)
+                # content-addressed: anything that doesn't hash to its name is dropped
+                if database.photo_hash(data) == digest:
+                    database.store_photo(cursor, data)
+
+
+# ------------------------------
+# Peers
+# ------------------------------
+# A peer's exchange(station) sends this station's unacknowledged changes,
+# applies the peer's, and returns {"sent": bytes, "received": bytes, "visits": n}.
+
+class FilePeer:
+    """
+    A folder every station can reach (network share, synced folder, USB
+    stick). Each station drops its deltas in <folder>/<station_id>/ and
+    reads the other stations' from there; photos go in <folder>/photos/,
+    one file per hash, written by whichever station gets there first.
+    """
+
+    def __init__(self, folder: str):
+        self.folder = os.path.abspath(folder)
+        self.name = f"file:{self.folder}"
+
+    def exchange(self, station: Station):
+        stats = {"sent": 0, "received": 0, "visits": 0}
+        outbox = os.path.join(self.folder, station.station_id)
+        photo_dir = os.path.join(self.folder, "photos")
+        os.makedirs(outbox, exist_ok=True)
+        os.makedirs(photo_dir, exist_ok=True)
+        sent = station.cursor(f"{self.name}:sent")
+        while True:
+            delta = station.delta_since(sent)
+            if delta["visits"]:
+                hashes = {visit[7] for visit in delta["visits"] if visit[7]}
+                new = [digest for digest in hashes if not os.path.exists(os.path.join(photo_dir, digest))]
+                for digest, data in station.photos(new).items():
+                    stats["sent"] += _write_atomic(os.path.join(photo_dir, digest), base64.b64decode(data))
+                # photos first, so a delta never names one that isn't there
+                stats["sent"] += _write_atomic(os.path.join(outbox, f"{delta['seq']:012d}.delta"), encode_delta(delta))
+            sent = delta["seq"]
+            station.set_cursor(f"{self.name}:sent", sent)
+            if not delta["more"]:
+                break
+
+        for origin in sorted(os.listdir(self.folder)):
+            inbox = os.path.join(self.folder, origin)
+            if origin == station.station_id or not os.path.isdir(inbox):
+                continue
+            received = station.cursor(f"{self.name}:{origin}")
+            # file names are the zero-padded seq of the delta's last change
+            for file_name in sorted(os.listdir(inbox)):
+                if not file_name.endswith(".delta") or int(file_name[:-6]) <= received:
+                    continue
+                with open(os.path.join(inbox, file_name), "rb") as f:
+                    data = f.read()
+                delta = decode_delta(data)
+                station.apply(delta)
+                received = delta["seq"]
+                station.set_cursor(f"{self.name}:{origin}", received)
+                stats["received"] += len(data)
+                stats["visits"] += len(delta["visits"])
+
+        photos = {}
+        for digest in station.missing_photos(limit=-1):
+            path = os.path.join(photo_dir, digest)
+            if os.path.exists(path):
+                with open(path, "rb") as f:
+                    photos[digest] = base64.b64encode(f.read()).decode("ascii")
+                stats["received"] += os.path.getsize(path)
+        station.store_photos(photos)
+        return stats
+
+
+def _write_atomic(path: str, data: bytes) -> int:
+    with open(path + ".part", "wb") as f:
+        f.write(data)
+    os.replace(path + ".part", path)
+    return len(data)
+
+
+def _send_frame(sock, data: bytes):
+    sock.sendall(struct.pack(">I", len(data)) + data)
+
+
+def _recv_frame(sock, limit: int = MAX_FRAME) -> bytes:
+    header = _recv_exactly(sock, 4)
+    size = struct.unpack(">I", header)[0]
+    if size > limit:
+        raise ConnectionError(f"frame of {size} bytes is too large")
+    return _recv_exactly(sock, size)
+
+
+def _recv_exactly(sock, size: int) -> bytes:
+    chunks = []
+    while size:
+        chunk = sock.recv(min(size, 1 << 20))
+        if not chunk:
+            raise ConnectionError("peer closed the connection")
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b"".join(chunks)
+
+
+class AuthenticationError(ConnectionError):
+    """The other end doesn't know the shared secret, or a frame was tampered with."""
+
+
+class _Channel:
+    """
+    Authenticated frames over a connected socket. The handshake proves
+    each side knows secret and derives a key for the session; every frame
+    then ends with an HMAC over its direction, sequence number and data.
+    """
+
+    def __init__(self, sock, secret: bytes, server: bool):
+        if not secret:
+            raise ValueError("replication over TCP needs a shared secret")
+        self.sock = sock
+        self._sent = self._received = 0
+        mine = os.urandom(NONCE)
+        if server:
+            _send_frame(sock, mine)
+            frame = _recv_frame(sock, HANDSHAKE_FRAME)
+            theirs, proof = frame[:NONCE], frame[NONCE:]
+            self._check(proof, _mac(secret, b"client", mine + theirs))
+            _send_frame(sock, _mac(secret, b"server", theirs + mine))
+            self.key = _mac(secret, b"session", mine + theirs)
+        else:
+            theirs = _recv_frame(sock, HANDSHAKE_FRAME)
+            if len(theirs) != NONCE:
+                raise AuthenticationError("bad handshake")
+            _send_frame(sock, mine + _mac(secret, b"client", theirs + mine))
+            self._check(_recv_frame(sock, HANDSHAKE_FRAME), _mac(secret, b"server", mine + theirs))
+            self.key = _mac(secret, b"session", theirs + mine)
+        self._out, self._in = (b"s", b"c") if server else (b"c", b"s")
+
+    @staticmethod
+    def _check(proof: bytes, expected: bytes):
+        if not hmac.compare_digest(proof, expected):
+            raise AuthenticationError("the peer doesn't know the shared secret")
+
+    def send(self, data: bytes):
+        tag = _mac(self.key, self._out, struct.pack(">Q", self._sent) + data)
+        self._sent += 1
+        _send_frame(self.sock, data + tag)
+
+    def recv(self) -> bytes:
+        frame = _recv_frame(self.sock)
+        data, tag = frame[:-32], frame[-32:]
+        self._check(tag, _mac(self.key, self._in, struct.pack(">Q", self._received) + data))
+        self._received += 1
+        return data
+
+
+def _mac(key: bytes, label: bytes, data: bytes) -> bytes:
+    return hmac.new(key, label + data, hashlib.sha256).digest()
+
+
+class SocketPeer:
+    """
+    A station running serve(). Each round trip carries this station's
+    delta one way and the peer's the other, as length-prefixed, compressed
+    JSON frames over one TCP connection. Both sides also list the photos
+    they are missing ("want") and answer the other's list on the next trip.
+    secret is the stations' shared secret (see _Channel).
+    """
+
+    def __init__(self, host: str, port: int, secret: bytes, timeout: float = 5):
+        self.address = (host, port)
+        self.secret = secret
+        self.timeout = timeout
+        self.name = f"tcp:{host}:{port}"
+
+    def exchange(self, station: Station):
+        stats = {"sent": 0, "received": 0, "visits": 0}
+        sent = station.cursor(f"{self.name}:sent")
+        received = station.cursor(f"{self.name}:received")
+        # visits just received from the peer, so they aren't sent straight back
+        peer_has = {}
+        peer_done, peer_wants, asked = False, [], set()
+        with socket.create_connection(self.address, self.timeout) as sock:
+            channel = _Channel(sock, self.secret, server=False)
+            while True:
+                delta = station.delta_since(sent, skip=peer_has)
+                want = [digest for digest in station.missing_photos() if digest not in asked]
+                give = station.photos(peer_wants)
+                if peer_done and not delta["visits"] and not want and not give:
+                    sent = delta["seq"]
+                    station.set_cursor(f"{self.name}:sent", sent)
+                    if delta["more"]:
+                        continue
+                    break
+                # a photo the peer didn't have is asked for once per exchange
+                asked.update(want)
+                request = encode_delta({"since": received, "delta": delta, "want": want, "photos": give})
+                channel.send(request)
+                reply_data = channel.recv()
+                reply = decode_delta(reply_data)
+                station.store_photos(reply["photos"])
+                peer_wants = reply["want"]
+                reply = reply["delta"]
+                peer_has.update(station.apply(reply))
+                sent, received = delta["seq"], reply["seq"]
+                station.set_cursor(f"{self.name}:sent", sent)
+                station.set_cursor(f"{self.name}:received", received)
+                stats["sent"] += len(request) + 4
+                stats["received"] += len(reply_data) + 4
+                stats["visits"] += len(reply["visits"])
+                peer_done = not reply["more"]
+        return stats
+
+
+class _SyncHandler(socketserver.BaseRequestHandler):
+    def handle(self):
+        station = self.server.station
+        try:
+            # nothing is read or sent before the caller has proved it knows the secret
+            channel = _Channel(self.request, self.server.secret, server=True)
+        except (ConnectionError, OSError):
+            return
+        while True:
+            try:
+                request = decode_delta(channel.recv())
+                station.store_photos(request["photos"])
+                # don't echo back what the caller just sent us
+                in_sync = station.apply(request["delta"])
+                reply = {
+                    "station": station.station_id, "delta": station.delta_since(request["since"], skip=in_sync),
+                    "photos": station.photos(request["want"]), "want": station.missing_photos(),
+                }
+                channel.send(encode_delta(reply))
+            except (ConnectionError, OSError):
+                return
+            except Exception as e:
+                # a malformed delta or a locked database: drop this peer's connection, keep serving
+                self.server.last_error = f"{self.client_address[0]}: {e!r}"
+                print(f"Replication request from {self.client_address[0]} failed: {e!r}", file=sys.stderr)
+                return
+
+
+class SyncServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, station: Station, host: str, port: int, secret: bytes):
+        if not secret:
+            raise ValueError("replication over TCP needs a shared secret")
+        self.station = station
+        self.secret = secret
+        self.last_error = None
+        super().__init__((host, port), _SyncHandler)
+
+
+def serve(station: Station, host: str = "127.0.0.1", port: int = 8765, *, secret: bytes) -> SyncServer:
+    """
+    Answer SocketPeer exchanges on a background thread; call shutdown() on
+    the result to stop. Only local connections unless host says otherwise.
+    """
+    server = SyncServer(station, host, port, secret)
+    threading.Thread(target=server.serve_forever, name="sync-server", daemon=True).start()
+    return server
+
+
+def peer_from_spec(spec: str, secret: bytes = None):
+    """'host:port' is a SocketPeer; anything else is a folder for a FilePeer."""
+    host, _, port = spec.rpartition(":")
+    if host and port.isdigit() and not os.path.isdir(spec):
+        return SocketPeer(host, int(port), secret)
+    return FilePeer(spec)
+
+
+class Replicator:
+    """Exchanges deltas with every peer every interval seconds on a background thread."""
+
+    def __init__(self, station: Station, peers, interval: float = 10.0, server: SyncServer = None):
+        self.station = station
+        self.peers = list(peers)
+        self.interval = interval
+        self.server = server
+        self.last_error = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="sync", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join()
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+
+    def sync_once(self):
+        totals = {"sent": 0, "received": 0, "visits": 0}
+        for peer in self.peers:
+            try:
+                for key, value in peer.exchange(self.station).items():
+                    totals[key] += value
+            except (OSError, ValueError) as e:
+                # an unreachable gate is retried next round
+                self.last_error = f"{peer.name}: {e}"
+            except Exception as e:
+                # a locked database or a malformed delta: report it, the other peers still go
+                self.last_error = f"{peer.name}: {e!r}"
+                print(f"Replication with {peer.name} failed: {e!r}", file=sys.stderr)
+        return totals
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.sync_once()
+            except Exception as e:
+                # nothing may end the thread but stop()
+                self.last_error = repr(e)
+                print(f"Replication round failed: {e!r}", file=sys.stderr)
+            self._stop.wait(self.interval)
+
+
+def start_from_env(db: database.Database, environ=os.environ):
+    """
+    Start replication if this install is configured for it, else return None:
+
+        ACCESS_CONTROL_PEERS=gate-b:8765,/mnt/share/gates   peers to exchange with
+        ACCESS_CONTROL_SYNC_PORT=8765                       accept exchanges on this port
+        ACCESS_CONTROL_SYNC_HOST=0.0.0.0                    ...on this interface (default 127.0.0.1)
+        ACCESS_CONTROL_SYNC_SECRET=...                      shared by the stations; needed for TCP
+        ACCESS_CONTROL_SYNC_INTERVAL=10                     seconds between rounds
+    """
+    specs = [spec.strip() for spec in environ.get("ACCESS_CONTROL_PEERS", "").split(",") if spec.strip()]
+    port = environ.get("ACCESS_CONTROL_SYNC_PORT")
+    if not specs and not port:
+        return None
+    secret = environ.get("ACCESS_CONTROL_SYNC_SECRET", "").encode("utf-8") or None
+    peers = [peer_from_spec(spec, secret) for spec in specs]
+    if not secret and (port or any(isinstance(peer, SocketPeer) for peer in peers)):
+        raise ValueError("ACCESS_CONTROL_SYNC_SECRET must be set to replicate over TCP")
+    station = Station(db)
+    server = serve(station, environ.get("ACCESS_CONTROL_SYNC_HOST", "127.0.0.1"), int(port), secret=secret) if port else None
+    replicator = Replicator(station, peers,
+                            float(environ.get("ACCESS_CONTROL_SYNC_INTERVAL", 10)), server)
+    replicator.start()
+    return replicator
@@ -0,0 +1,24 @@
+# tests/conftest.py
+import os, sys
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import database
+
+
+@pytest.fixture
+def db(tmp_path):
+    """A fresh database at the current schema."""
+    db = database.Database(str(tmp_path / "visits.db"))
+    yield db
+    db.close()
+
+
+
+@pytest.fixture(scope="session")
+def qapp():
+    """The QApplication the Qt models need, headless."""
+    pytest.importorskip("PyQt5")
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    from PyQt5.QtWidgets import QApplication
+    return QApplication.instance() or QApplication([])
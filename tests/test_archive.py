@@ -0,0 +1,68 @@
+# tests/test_archive.py
+import datetime
+import pytest
+import archive, database
+from records import Records, VisitNotFound
+from write_queue import WriteQueue
+
+
+@pytest.fixture
+def archived(db, tmp_path):
+    """A log with one visit from 2024 moved out to the archives and one live visit."""
+    with db.write() as cursor:
+        for name, date in (("Ada Okafor", "2024-03-05"), ("Bola Eze", "2026-10-18")):
+            database.insert_visit(cursor, {"tag": "001", "name": name, "address": "1 Broad Street", "purpose": "audit",
+                                           "time_in": "09:00:00", "time_out": "", "date": date})
+    archive_dir = str(tmp_path / "archive")
+    report = archive.archive_old_visits(db, archive_dir, 365, today=datetime.date(2026, 10, 18))
+    assert report["visits"] == 1
+    return db, archive_dir
+
+
+def test_lookup_falls_back_to_the_archive(archived, tmp_path):
+    db, archive_dir = archived
+    write_queue = WriteQueue(db, str(tmp_path / "writes.jsonl"))
+    try:
+        records = Records(db, write_queue, archive_dir=archive_dir)
+        visit = records.lookup("1", "2024-03-05")
+        assert (visit["name"], visit["archived"], visit["id"]) == ("Ada Okafor", True, None)
+        assert records.lookup("1", "2026-10-18")["name"] == "Bola Eze"
+        with pytest.raises(VisitNotFound):
+            records.check_out("1", "2024-03-05")
+    finally:
+        write_queue.close()
+
+
+def test_viewer_filter_reaches_the_archive(archived, qapp):
+    from thumbnails import ThumbnailStore
+    from viewer import VisitTableModel
+    db, archive_dir = archived
+    model = VisitTableModel(db, ThumbnailStore(db), archive_dir=archive_dir)
+    model.set_filter("audit")
+    while model.canFetchMore():
+        model.fetchMore()
+    assert sorted(row[2] for row in model.rows) == ["Ada Okafor", "Bola Eze"]
+
+
+def test_partitioned_export_keeps_a_day_in_both_the_archive_and_the_log(db, tmp_path):
+    pyarrow = pytest.importorskip("pyarrow")
+    import pyarrow.dataset
+    import exporter
+
+    def add(name, date):
+        with db.write() as cursor:
+            database.insert_visit(cursor, {"tag": "001", "name": name, "address": "x", "purpose": "audit",
+                                           "time_in": "09:00:00", "time_out": "", "date": date})
+    add("Ada Okafor", "2024-01-05")
+    add("Bola Eze", "2024-01-06")
+    archive_dir = str(tmp_path / "archive")
+    archive.archive_old_visits(db, archive_dir, 365, today=datetime.date(2026, 10, 18))
+    # imported after the archiving, for a day already archived
+    add("Chidi Bello", "2024-01-05")
+
+    path = str(tmp_path / "by_date")
+    archives = archive.needed_archives(archive_dir, "2024-01-01", "2024-01-31")
+    assert exporter.export_visits(db, path, "parquet", "2024-01-01", "2024-01-31",
+                                  partition_by_date=True, archives=archives) == 3
+    table = pyarrow.dataset.dataset(path, partitioning="hive").to_table()
+    assert sorted(table.column("name").to_pylist()) == ["Ada Okafor", "Bola Eze", "Chidi Bello"]
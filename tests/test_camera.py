@@ -0,0 +1,26 @@
+# tests/test_camera.py
+import pytest
+
+pytest.importorskip("PyQt5")
+from camera import IMAGE_ENCODINGS, snapshot_settings
+
+
+def test_snapshot_settings_default():
+    assert snapshot_settings({}) == {"size": (200, 200), "quality": 90, "format": "jpeg"}
+
+
+def test_snapshot_settings_from_the_environment():
+    settings = snapshot_settings({"ACCESS_CONTROL_SNAPSHOT_FORMAT": "WebP", "ACCESS_CONTROL_SNAPSHOT_QUALITY": "75",
+                                  "ACCESS_CONTROL_SNAPSHOT_SIZE": "160x120"})
+    assert settings == {"size": (160, 120), "quality": 75, "format": "webp"}
+    assert settings["format"] in IMAGE_ENCODINGS
+
+
+@pytest.mark.parametrize("environ", [{"ACCESS_CONTROL_SNAPSHOT_FORMAT": "png"},
+                                     {"ACCESS_CONTROL_SNAPSHOT_QUALITY": "0"},
+                                     {"ACCESS_CONTROL_SNAPSHOT_QUALITY": "high"},
+                                     {"ACCESS_CONTROL_SNAPSHOT_SIZE": "200"},
+                                     {"ACCESS_CONTROL_SNAPSHOT_SIZE": "0x200"}])
+def test_snapshot_settings_rejects(environ):
+    with pytest.raises(ValueError):
+        snapshot_settings(environ)
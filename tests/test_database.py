@@ -0,0 +1,70 @@
+# tests/test_database.py
+import sqlite3
+import database
+
+PICTURE = b"\xff\xd8\xff" + b"legacy jpeg" * 50
+
+
+def legacy_database(path):
+    """A my_db.db as the original app left it: version 0, dd/mm/YYYY dates, pictures inline."""
+    conn = sqlite3.connect(path, isolation_level=None)
+    database._v1_create_users(conn.cursor())
+    conn.executemany(
+        "INSERT INTO users (tag, name, address, purpose, time_in, time_out, date, picture) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+        [("7", "Ada Okafor", "1 Broad Street", "meeting", "09:00:00", "10:00:00", "17/10/2026", PICTURE),
+         ("8", "Bola Eze", "2 Marina Road", "delivery", "11:30:00", "", "18/10/2026", None),
+         ("009", "Chidi Bello", "3 Allen Avenue", "audit", "", "", "18/10/2026", b"")]
+    )
+    conn.close()
+
+
+def test_legacy_database_migrates_to_the_current_schema(tmp_path):
+    path = str(tmp_path / "my_db.db")
+    legacy_database(path)
+    db = database.Database(path)
+    try:
+        with db.read() as conn:
+            assert database.schema_version(conn) == database.SCHEMA_VERSION == len(database.MIGRATIONS)
+            assert [row[0] for row in conn.execute("SELECT date FROM users ORDER BY id")] == \
+                ["2026-10-17", "2026-10-18", "2026-10-18"]
+            # pictures moved to the content-addressed store
+            assert conn.execute("SELECT photo_hash FROM users WHERE id=1").fetchone()[0] == database.photo_hash(PICTURE)
+            assert database.load_photo(conn, database.photo_hash(PICTURE)) == PICTURE
+            assert conn.execute("SELECT count(*) FROM changes").fetchone()[0] == 3
+            # only Bola is checked in and not out; Chidi is pre-registered
+            assert conn.execute("SELECT visit_id, tag FROM open_visits").fetchall() == [(2, "008")]
+            assert conn.execute("SELECT date, visits, open FROM stats_daily ORDER BY date").fetchall() == \
+                [("2026-10-17", 1, 0), ("2026-10-18", 1, 1)]
+            if database.has_fts(conn):
+                assert [row[1] for row in database.search_visits(conn, ["name"], "Marina", 10)] == ["Bola Eze"]
+    finally:
+        db.close()
+
+
+def test_migrating_again_changes_nothing(tmp_path):
+    path = str(tmp_path / "my_db.db")
+    legacy_database(path)
+    database.create_database(path)
+    database.create_database(path)
+    conn = sqlite3.connect(path)
+    try:
+        assert database.schema_version(conn) == database.SCHEMA_VERSION
+        assert conn.execute("SELECT count(*) FROM users").fetchone()[0] == 3
+    finally:
+        conn.close()
+
+
+def test_triggers_dropped_for_a_bulk_insert_are_caught_up(db):
+    with db.write() as cursor:
+        database.insert_visit(cursor, {"tag": "1", "name": "Ada Okafor", "address": "x", "purpose": "audit",
+                                       "time_in": "09:00:00", "time_out": "", "date": "2026-10-18"})
+        last = cursor.execute("SELECT MAX(id) FROM users").fetchone()[0]
+        triggers = database.drop_users_triggers(cursor)
+        cursor.executemany("INSERT INTO users (tag, name, address, purpose, time_in, time_out, date) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                           [("2", "Bola Eze", "y", "audit", "10:00:00", "", "2026-10-18"),
+                            ("3", "Chidi Bello", "z", "audit", "", "", "2026-10-18")])
+        database.restore_users_triggers(cursor, triggers, last)
+    with db.read() as conn:
+        assert conn.execute("SELECT tag FROM open_visits ORDER BY tag").fetchall() == [("001",), ("002",)]
+        assert conn.execute("SELECT visits, open FROM stats_daily").fetchone() == (2, 2)
+        assert conn.execute("SELECT count(*) FROM changes").fetchone()[0] == 3
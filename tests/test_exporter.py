@@ -0,0 +1,28 @@
+# tests/test_exporter.py
+import os
+import pytest
+import database, exporter
+
+
+@pytest.fixture
+def visits(db):
+    with db.write() as cursor:
+        for day in ("2026-10-17", "2026-10-18"):
+            database.insert_visit(cursor, {"tag": "001", "name": "Ada Okafor", "address": "1 Broad Street",
+                                           "purpose": "meeting", "time_in": "09:00:00", "time_out": "", "date": day})
+    return db
+
+
+@pytest.mark.parametrize("partitioned_first", [False, True])
+def test_parquet_then_partitioned_to_the_same_path(visits, tmp_path, partitioned_first):
+    pytest.importorskip("pyarrow")
+    path = str(tmp_path / "visits.parquet")
+    for partition in (partitioned_first, not partitioned_first):
+        assert exporter.export_visits(visits, path, "parquet", partition_by_date=partition) == 2
+        assert os.path.isdir(path) == partition
+    assert not os.path.exists(path + ".part")
+
+
+def test_csv_date_range(visits, tmp_path):
+    path = str(tmp_path / "visits.csv")
+    assert exporter.export_visits(visits, path, "csv", "2026-10-18", "2026-10-18") == 1
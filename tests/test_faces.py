@@ -0,0 +1,21 @@
+# tests/test_faces.py
+import pytest
+
+np = pytest.importorskip("numpy")
+cv2 = pytest.importorskip("cv2")
+import faces
+
+
+def test_pixel_fallback_identifies_nobody(db, monkeypatch):
+    monkeypatch.setattr(faces, "SFACE_MODEL", "/nonexistent/sface.onnx")
+    recognizer = faces.FaceRecognizer(db)
+    try:
+        recognizer.ready.result()
+        assert not recognizer.embedder.reliable
+        face = np.full((120, 120, 3), 128, dtype=np.uint8)
+        cv2.circle(face, (60, 60), 30, (40, 80, 200), -1)
+        recognizer.index.add("somebody", recognizer.face_vector(face))
+        # the very same picture: a perfect pixel match, still not trusted
+        assert recognizer.identify(face) is None
+    finally:
+        recognizer.close()
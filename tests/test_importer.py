@@ -0,0 +1,60 @@
+# tests/test_importer.py
+import pytest
+import importer
+
+
+@pytest.mark.parametrize("text, expected", [("9:05", "09:05:00"), ("09:05:30", "09:05:30"), ("23:59", "23:59:00"),
+                                            ("", "")])
+def test_normalize_time(text, expected):
+    assert importer.normalize_time(text) == expected
+
+
+@pytest.mark.parametrize("text", ["24:00", "12:60", "12:00:60", "noon", "9", "garbage"])
+def test_normalize_time_rejects(text):
+    with pytest.raises(ValueError):
+        importer.normalize_time(text)
+
+
+@pytest.mark.parametrize("text, expected", [("18/10/2026", "2026-10-18"), ("2026-10-18", "2026-10-18")])
+def test_normalize_date(text, expected):
+    assert importer.normalize_date(text) == expected
+
+
+@pytest.mark.parametrize("text", ["31/02/2026", "not-a-date", "2026-13-01", ""])
+def test_normalize_date_rejects(text):
+    with pytest.raises(ValueError):
+        importer.normalize_date(text)
+
+
+def test_normalize_date_default():
+    assert importer.normalize_date("", "2026-10-18") == "2026-10-18"
+
+
+def test_normalize_tag():
+    assert importer.normalize_tag("7") == "007"
+    assert importer.normalize_tag("A1234") == "A1234"
+    with pytest.raises(ValueError):
+        importer.normalize_tag("bad tag")
+
+
+def test_normalize_row():
+    visit = importer.normalize({"name": " Ada Okafor ", "tag": "7", "time_in": "9:00", "date": None}, "2026-10-18")
+    assert visit == {"tag": "007", "name": "Ada Okafor", "address": "", "purpose": "", "time_in": "09:00:00",
+                     "time_out": "", "date": "2026-10-18", "photo": ""}
+    for row in (None, {"tag": "1", "date": "2026-10-18"}):
+        with pytest.raises(ValueError):
+            importer.normalize(row)
+
+
+def test_import_csv(db, tmp_path):
+    path = tmp_path / "visitors.csv"
+    path.write_text("Name,Tag,Date,Time In\nAda Okafor,1,18/10/2026,\nBola Eze,2,18/10/2026,9:30\n"
+                    "Chidi Bello,x y,18/10/2026,\n", encoding="utf-8")
+    report = importer.import_visits(db, str(path))
+    assert (report["imported"], report["invalid"], report["duplicates"]) == (2, 1, 0)
+    assert importer.import_visits(db, str(path))["duplicates"] == 2
+    with db.read() as conn:
+        assert conn.execute("SELECT tag, time_in FROM users ORDER BY id").fetchall() == [("001", ""), ("002", "09:30:00")]
+        # Ada is pre-registered: not inside, not counted
+        assert conn.execute("SELECT tag FROM open_visits").fetchall() == [("002",)]
+        assert conn.execute("SELECT visits, open FROM stats_daily").fetchone() == (1, 1)
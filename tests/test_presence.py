@@ -0,0 +1,81 @@
+# tests/test_presence.py
+import datetime
+import pytest
+import database
+from presence import Presence, CHECK_IN, CHECK_OUT, UNKNOWN
+
+TODAY = datetime.date(2026, 10, 18)
+MORNING = datetime.datetime(2026, 10, 18, 9, 0)
+
+
+def add(db, tag, name, time_in="", date=TODAY, time_out=""):
+    with db.write() as cursor:
+        return database.insert_visit(cursor, {"tag": tag, "name": name, "address": "x", "purpose": "meeting",
+                                              "time_in": time_in, "time_out": time_out, "date": date.isoformat()})
+
+
+@pytest.fixture
+def presence(db):
+    return Presence(db)
+
+
+def test_pre_registered_visitor_scans_in_then_out(db):
+    add(db, "001", "Ada Okafor")
+    presence = Presence(db)
+    assert presence.inside() == {}
+    result = presence.scan("1", MORNING)
+    assert (result["action"], result["visit"]["time_in"]) == (CHECK_IN, "09:00:00")
+    assert list(presence.inside()) == ["001"]
+    result = presence.scan("001", MORNING.replace(hour=17))
+    assert (result["action"], result["visit"]["time_out"]) == (CHECK_OUT, "17:00:00")
+    assert presence.inside() == {}
+    # checked out for the day; a third scan isn't expected
+    assert presence.scan("001", MORNING.replace(hour=18))["action"] == UNKNOWN
+
+
+def test_unknown_tag(presence):
+    result = presence.scan("042", MORNING)
+    assert (result["action"], result["tag"], result["visit"]) == (UNKNOWN, "042", None)
+
+
+def test_visit_past_midnight_keeps_its_date(db):
+    add(db, "004", "Dee Lawal", time_in="23:00:00")
+    result = Presence(db).scan("4", datetime.datetime(2026, 10, 19, 1, 30))
+    visit = result["visit"]
+    assert result["action"] == CHECK_OUT
+    assert (visit["date"], visit["time_in"], visit["time_out"]) == ("2026-10-18", "23:00:00", "01:30:00")
+
+
+def test_visit_left_open_too_long_is_reported_not_closed(db):
+    stale = add(db, "003", "Cy Obi", time_in="08:00:00", date=TODAY - datetime.timedelta(days=3))
+    add(db, "003", "Emeka Sanni")
+    result = Presence(db).scan("003", MORNING)
+    assert (result["action"], result["stale"]["id"]) == (CHECK_IN, stale)
+    assert result["visit"]["name"] == "Emeka Sanni"
+    with db.read() as conn:
+        assert conn.execute("SELECT time_out FROM users WHERE id=?", (stale,)).fetchone()[0] == ""
+
+
+def test_visit_checked_out_elsewhere_is_not_closed_twice(db):
+    visit = add(db, "002", "Bola Eze")
+    presence = Presence(db)
+    assert presence.scan("002", MORNING)["action"] == CHECK_IN
+    # another gate (or the form) checks the visitor out; memory still has them inside
+    with db.write() as cursor:
+        cursor.execute("UPDATE users SET time_out='10:00:00' WHERE id=?", (visit,))
+    assert presence.scan("002", MORNING.replace(hour=11))["action"] == UNKNOWN
+    assert presence.inside() == {}
+    with db.read() as conn:
+        assert conn.execute("SELECT time_out FROM users WHERE id=?", (visit,)).fetchone()[0] == "10:00:00"
+
+
+def test_visit_checked_in_elsewhere_is_checked_out(db):
+    presence = Presence(db)
+    add(db, "5", "Funke Ibrahim", time_in="08:30:00")
+    assert presence.scan("005", MORNING)["action"] == CHECK_OUT
+
+
+def test_reload_sees_who_is_inside(db):
+    add(db, "6", "Grace Danjuma", time_in="08:30:00")
+    add(db, "7", "Hassan Bello", time_in="08:45:00", time_out="09:00:00")
+    assert list(Presence(db).inside()) == ["006"]
@@ -0,0 +1,58 @@
+# tests/test_service.py
+import asyncio, json
+import pytest
+import service
+
+
+@pytest.fixture
+def visit_service(tmp_path):
+    svc = service.VisitService(str(tmp_path / "visits.db"), str(tmp_path))
+    yield svc
+    svc.close()
+
+
+def post(svc, path, body):
+    return asyncio.run(svc.route("POST", path, json.dumps(body).encode()))
+
+
+CHECK_IN = {"tag": "9", "name": "Ada Okafor", "address": "1 Broad Street", "purpose": "meeting"}
+
+
+@pytest.mark.parametrize("fields", [{"date": "not-a-date"}, {"time_in": "garbage"}, {"time_in": "25:00"},
+                                    {"date": "31/02/2026"}])
+def test_check_in_rejects_bad_dates_and_times(visit_service, fields):
+    with pytest.raises(service.HTTPError) as error:
+        post(visit_service, "/check-in", dict(CHECK_IN, **fields))
+    assert error.value.status == 400
+
+
+def test_check_in_and_out_normalize_dates_and_times(visit_service):
+    status, _ = post(visit_service, "/check-in", dict(CHECK_IN, date="18/10/2026", time_in="9:05"))
+    assert status == 201
+    with pytest.raises(service.HTTPError) as error:
+        post(visit_service, "/check-out", {"tag": "9", "date": "2026-10-18", "time_out": "17:61"})
+    assert error.value.status == 400
+    status, _ = post(visit_service, "/check-out", {"tag": "9", "date": "2026-10-18", "time_out": "17:30"})
+    assert status == 200
+    status, visit = asyncio.run(visit_service.route("GET", "/visits/9?date=2026-10-18", b""))
+    assert (visit["time_in"], visit["time_out"]) == ("09:05:00", "17:30:00")
+
+
+@pytest.mark.parametrize("method, target, body", [
+    ("POST", "/export", {"format": "csv", "start_date": "not-a-date"}),
+    ("POST", "/export", {"format": "csv", "start_date": "2026-10-01", "end_date": "2026-13-01"}),
+    ("GET", "/stats?date=yesterday", None),
+])
+def test_export_and_stats_reject_bad_dates(visit_service, method, target, body):
+    with pytest.raises(service.HTTPError) as error:
+        asyncio.run(visit_service.route(method, target, json.dumps(body).encode() if body else b""))
+    assert error.value.status == 400
+
+
+def test_export_and_stats_normalize_dates(visit_service):
+    post(visit_service, "/check-in", dict(CHECK_IN, date="2026-10-18", time_in="09:00"))
+    visit_service.write_queue.flush()
+    status, result = post(visit_service, "/export", {"format": "csv", "start_date": "18/10/2026", "end_date": "18/10/2026"})
+    assert (status, result["rows"]) == (200, 1)
+    status, summary = asyncio.run(visit_service.route("GET", "/stats?date=18/10/2026", b""))
+    assert (status, summary["date"], summary["visits"]) == (200, "2026-10-18", 1)
@@ -0,0 +1,93 @@
+# tests/test_stats.py
+import datetime
+import database, stats
+
+
+def add(cursor, **fields):
+    values = {"tag": "001", "name": "Ada Okafor", "address": "1 Broad Street", "purpose": "meeting",
+              "time_in": "09:00:00", "time_out": "", "date": "2026-10-18"}
+    values.update(fields)
+    return database.insert_visit(cursor, values)
+
+
+def rebuilt(db):
+    """The stats tables as the triggers left them, and as rebuilt from users."""
+    tables = ("stats_daily", "stats_hourly", "stats_purpose", "open_visits")
+
+    def dump(cursor):
+        return {table: sorted(cursor.execute(f"SELECT * FROM {table}").fetchall()) for table in tables}
+
+    with db.write() as cursor:
+        incremental = dump(cursor)
+        database.rebuild_statistics(cursor)
+        return incremental, dump(cursor)
+
+
+def test_visit_without_time_in_has_no_hour(db):
+    with db.write() as cursor:
+        cursor.execute("INSERT INTO users (tag, name, address, purpose, date) VALUES ('002', 'Bola Eze', 'x', 'audit', '2026-10-18')")
+        add(cursor, time_in="")
+    with db.read() as conn:
+        assert stats.hourly_counts(conn, "2026-10-18") == [0] * 24
+    incremental, full = rebuilt(db)
+    assert incremental == full
+
+
+def test_visit_without_time_in_can_be_inserted(db):
+    with db.write() as cursor:
+        cursor.execute("INSERT INTO users (tag, name, date) VALUES ('001', 'Ada Okafor', '2026-10-18')")
+    with db.read() as conn:
+        assert conn.execute("SELECT count(*) FROM users").fetchone()[0] == 1
+
+
+def test_triggers_match_rebuild(db):
+    with db.write() as cursor:
+        first = add(cursor, time_in="08:15:00")
+        add(cursor, name="Bola Eze", time_in="13:40:00", purpose="delivery", time_out="14:00:00")
+        add(cursor, name="Chidi Bello", time_in="13:05:00", date="2026-10-17")
+        cursor.execute("UPDATE users SET time_out='10:00:00' WHERE id=?", (first,))
+    with db.read() as conn:
+        hours = stats.hourly_counts(conn, "2026-10-18")
+        assert (hours[8], hours[13]) == (1, 1)
+        assert stats.occupancy(conn, "2026-10-18") == 0
+        assert stats.occupancy(conn, "2026-10-17") == 1
+    incremental, full = rebuilt(db)
+    assert incremental == full
+
+
+def test_pre_registrations_count_once_checked_in(db):
+    with db.write() as cursor:
+        ids = [add(cursor, tag=f"00{i}", name=f"Visitor {i}", time_in="") for i in range(3)]
+    summary = stats.summary(db, "2026-10-18")
+    assert (summary["inside"], summary["visits"], summary["hourly"][0], summary["inside_visits"]) == (0, 0, 0, [])
+
+    with db.write() as cursor:
+        cursor.execute("UPDATE users SET time_in='11:59:21' WHERE id=?", (ids[0],))
+    summary = stats.summary(db, "2026-10-18")
+    assert (summary["inside"], summary["visits"], summary["hourly"][11]) == (1, 1, 1)
+    assert [row[1] for row in summary["inside_visits"]] == ["Visitor 0"]
+    incremental, full = rebuilt(db)
+    assert incremental == full
+
+
+def test_visit_past_midnight_is_still_inside(db):
+    with db.write() as cursor:
+        add(cursor, tag="001", name="Ada Okafor", time_in="23:10:00", date="2026-10-17")
+        add(cursor, tag="002", name="Bola Eze", time_in="08:00:00", date="2026-10-18")
+        add(cursor, tag="003", name="Chidi Bello", time_in="09:00:00", time_out="09:30:00", date="2026-10-18")
+    with db.read() as conn:
+        assert stats.occupancy(conn) == 2
+        assert [row[1] for row in stats.inside(conn)] == ["Ada Okafor", "Bola Eze"]
+        # asked for one day, only the visits checked in that day
+        assert stats.occupancy(conn, "2026-10-18") == 1
+        assert [row[1] for row in stats.inside(conn, "2026-10-18")] == ["Bola Eze"]
+
+
+def test_dashboard_counts_yesterdays_open_visit_today(db):
+    yesterday = (datetime.date.today() - datetime.timedelta(days=1)).isoformat()
+    with db.write() as cursor:
+        add(cursor, time_in="23:10:00", date=yesterday)
+    summary = stats.summary(db)
+    assert (summary["inside"], summary["visits"]) == (1, 0)
+    assert [row[1] for row in summary["inside_visits"]] == ["Ada Okafor"]
+    assert stats.summary(db, yesterday)["inside"] == 1
@@ -0,0 +1,130 @@
+# tests/test_sync.py
+import socket, sqlite3, threading
+import pytest
+import database, sync
+from sync import merge_visits
+
+
+def copy(**fields):
+    values = {"tag": "001", "name": "Ada Okafor", "address": "1 Broad Street", "purpose": "meeting",
+              "time_in": "", "time_out": "", "date": "2026-10-18", "photo_hash": None}
+    values.update(fields)
+    return values
+
+
+def test_check_in_beats_pre_registration_both_ways():
+    pre_registered, scanned = copy(), copy(time_in="11:59:21")
+    assert merge_visits(pre_registered, scanned)["time_in"] == "11:59:21"
+    assert merge_visits(scanned, pre_registered)["time_in"] == "11:59:21"
+
+
+def test_earlier_check_in_wins():
+    early, late = copy(time_in="08:00:00", tag="002"), copy(time_in="09:00:00", tag="003")
+    assert merge_visits(early, late) == merge_visits(late, early)
+    assert merge_visits(late, early)["tag"] == "002"
+
+
+def test_later_check_out_wins():
+    open_, closed = copy(time_in="08:00:00"), copy(time_in="08:00:00", time_out="17:00:00")
+    assert merge_visits(open_, closed)["time_out"] == "17:00:00"
+    assert merge_visits(closed, open_)["time_out"] == "17:00:00"
+
+
+def stations(tmp_path):
+    dbs = [database.Database(str(tmp_path / f"{name}.db")) for name in "AB"]
+    with dbs[0].write() as cursor:
+        database.insert_visit(cursor, dict(copy(time_in="08:00:00"), picture=None))
+    return dbs, [sync.Station(db) for db in dbs]
+
+
+def count(db):
+    with db.read() as conn:
+        return conn.execute("SELECT count(*) FROM users").fetchone()[0]
+
+
+def test_socket_exchange_with_the_shared_secret(tmp_path):
+    dbs, (a, b) = stations(tmp_path)
+    server = sync.serve(b, "127.0.0.1", 0, secret=b"s3cret")
+    try:
+        sync.SocketPeer("127.0.0.1", server.server_address[1], b"s3cret").exchange(a)
+        assert count(dbs[1]) == 1
+    finally:
+        server.shutdown()
+        server.server_close()
+        for db in dbs:
+            db.close()
+
+
+def test_socket_exchange_refused_without_the_secret(tmp_path):
+    dbs, (a, b) = stations(tmp_path)
+    server = sync.serve(b, "127.0.0.1", 0, secret=b"s3cret")
+    try:
+        with pytest.raises(ConnectionError):
+            sync.SocketPeer("127.0.0.1", server.server_address[1], b"guess").exchange(a)
+        assert count(dbs[1]) == 0
+        with pytest.raises(ValueError):
+            sync.serve(b, "127.0.0.1", 0, secret=b"")
+    finally:
+        server.shutdown()
+        server.server_close()
+        for db in dbs:
+            db.close()
+
+
+def test_tcp_replication_needs_a_secret(db):
+    with pytest.raises(ValueError):
+        sync.start_from_env(db, {"ACCESS_CONTROL_SYNC_PORT": "0"})
+
+
+class FailingPeer:
+    name = "failing"
+
+    def __init__(self):
+        self.calls = threading.Semaphore(0)
+
+    def exchange(self, station):
+        self.calls.release()
+        raise sqlite3.OperationalError("database is locked")
+
+
+class CountingPeer:
+    name = "counting"
+
+    def __init__(self):
+        self.calls = threading.Semaphore(0)
+
+    def exchange(self, station):
+        self.calls.release()
+        return {"sent": 0, "received": 0, "visits": 0}
+
+
+def test_replicator_survives_a_peer_raising_a_non_os_error(db):
+    failing, counting = FailingPeer(), CountingPeer()
+    replicator = sync.Replicator(sync.Station(db), [failing, counting], interval=0.01)
+    replicator.start()
+    try:
+        # round after round, the other peer still gets its exchange
+        for _ in range(3):
+            assert failing.calls.acquire(timeout=5) and counting.calls.acquire(timeout=5)
+        assert "database is locked" in replicator.last_error
+    finally:
+        replicator.stop()
+
+
+def test_server_survives_a_malformed_delta(tmp_path):
+    dbs, (a, b) = stations(tmp_path)
+    server = sync.serve(b, "127.0.0.1", 0, secret=b"s3cret")
+    try:
+        with socket.create_connection(server.server_address, timeout=5) as sock:
+            channel = sync._Channel(sock, b"s3cret", server=False)
+            channel.send(b"not a delta")
+            with pytest.raises(ConnectionError):
+                channel.recv()
+        assert "error" in server.last_error.lower()
+        sync.SocketPeer("127.0.0.1", server.server_address[1], b"s3cret").exchange(a)
+        assert count(dbs[1]) == 1
+    finally:
+        server.shutdown()
+        server.server_close()
+        for db in dbs:
+            db.close()
@@ -0,0 +1,34 @@
+# tests/test_write_queue.py
+import pytest
+from write_queue import WriteQueue, JournalInUse
+
+VISIT = {"tag": "001", "name": "Ada Okafor", "address": "1 Broad Street", "purpose": "meeting",
+         "time_in": "09:00:00", "time_out": "", "date": "2026-10-18"}
+
+
+def test_second_queue_on_a_journal_is_refused(db, tmp_path):
+    journal = str(tmp_path / "visits.db-writes.jsonl")
+    first = WriteQueue(db, journal, max_delay=1)
+    try:
+        first.submit("insert", VISIT)
+        with pytest.raises(JournalInUse):
+            WriteQueue(db, journal)
+    finally:
+        first.close()
+    with db.read() as conn:
+        assert conn.execute("SELECT count(*) FROM users").fetchone()[0] == 1
+    # free again once the first queue is closed
+    WriteQueue(db, journal).close()
+
+
+def test_queues_on_separate_journals_run_side_by_side(db, tmp_path):
+    app = WriteQueue(db, str(tmp_path / "visits.db-writes.jsonl"))
+    service = WriteQueue(db, str(tmp_path / "visits.db-service-writes.jsonl"), seq_key="service_write_journal_seq")
+    try:
+        app.submit("insert", VISIT).result()
+        service.submit("insert", dict(VISIT, tag="002")).result()
+    finally:
+        app.close()
+        service.close()
+    with db.read() as conn:
+        assert conn.execute("SELECT count(*) FROM users").fetchone()[0] == 2
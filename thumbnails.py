@@ -0,0 +1,117 @@
+# thumbnails.py
+from PyQt5.QtCore import Qt, QBuffer, QByteArray, QIODevice
+from PyQt5.QtGui import QImage, QPixmap, QPixmapCache
+import os
+import database
+
+# stored thumbnails fit in this box; smaller sizes are scaled from them
+THUMBNAIL_SIZE = (128, 128)
+THUMBNAIL_QUALITY = 85
+PROFILE_PATH = os.path.join(os.path.dirname(__file__), "images", "profile.jpg")
+
+
+def render_image(data: bytes, size) -> QImage:
+    """Decode image bytes and scale them to fit size. QImage is safe to use off the GUI thread."""
+    image = QImage.fromData(data)
+    if image.isNull():
+        return image
+    return image.scaled(size[0], size[1], Qt.KeepAspectRatio, Qt.SmoothTransformation)
+
+
+def encode_jpeg(image: QImage, quality: int = THUMBNAIL_QUALITY) -> bytes:
+    data = QByteArray()
+    buffer = QBuffer(data)
+    buffer.open(QIODevice.WriteOnly)
+    image.save(buffer, "JPG", quality)
+    buffer.close()
+    return bytes(data)
+
+
+class ThumbnailStore:
+    """
+    Decoded, pre-scaled photos for display.
+
+    Pixmaps are kept in Qt's QPixmapCache (an LRU bounded by cache_kb and
+    keyed by photo hash and size), backed by small JPEG thumbnails stored
+    in the photo_thumbnails table. A full photo is decoded at most once:
+    the first time its thumbnail is needed.
+
+    pixmap() must be called on the GUI thread; thumbnail_image() does the
+    database and decoding work and may run on any thread.
+    """
+
+    def __init__(self, db: database.Database, cache_kb: int = 20 * 1024):
+        self.db = db
+        QPixmapCache.setCacheLimit(cache_kb)
+
+    @staticmethod
+    def cache_key(photo_hash: str, size) -> str:
+        return f"thumb:{photo_hash}:{size[0]}x{size[1]}"
+
+    def cached(self, photo_hash: str, size):
+        """The cached pixmap, or None without touching the database."""
+        pixmap = QPixmapCache.find(self.cache_key(photo_hash, size))
+        return pixmap if pixmap is not None and not pixmap.isNull() else None
+
+    def cache(self, photo_hash: str, size, image: QImage) -> QPixmap:
+        pixmap = QPixmap.fromImage(image)
+        QPixmapCache.insert(self.cache_key(photo_hash, size), pixmap)
+        return pixmap
+
+    def pixmap(self, photo_hash: str, size=(100, 90), data: bytes = None):
+        """
+        Pixmap of a photo scaled to fit size, or None if there's no such photo.
+        Pass data when the full photo is already in memory (e.g. a fresh snapshot).
+        """
+        if not photo_hash:
+            return None
+        pixmap = self.cached(photo_hash, size)
+        if pixmap is not None:
+            return pixmap
+        image = self.thumbnail_image(photo_hash, size, data)
+        return None if image.isNull() else self.cache(photo_hash, size, image)
+
+    def thumbnail_image(self, photo_hash: str, size, data: bytes = None) -> QImage:
+        """The stored thumbnail scaled to size, rendering and storing it first if needed."""
+        with self.db.read() as conn:
+            row = conn.execute("SELECT data FROM photo_thumbnails WHERE hash=?", (photo_hash,)).fetchone()
+            if row is None and data is None:
+                data = database.load_photo(conn, photo_hash)
+        if row is not None:
+            return render_image(row[0], size)
+        if not data:
+            return QImage()
+
+        thumbnail = render_image(data, THUMBNAIL_SIZE)
+        if thumbnail.isNull():
+            return thumbnail
+        # only stored once the photo itself is (a snapshot may never be saved)
+        with self.db.write() as cursor:
+            cursor.execute("""
+                INSERT OR IGNORE INTO photo_thumbnails (hash, data)
+                SELECT hash, ? FROM photos WHERE hash=?
+            """, (encode_jpeg(thumbnail), photo_hash))
+        if (thumbnail.width(), thumbnail.height()) == tuple(size):
+            return thumbnail
+        return thumbnail.scaled(size[0], size[1], Qt.KeepAspectRatio, Qt.SmoothTransformation)
+
+    def snapshot_pixmap(self, data: bytes, size=(100, 90)):
+        """Preview of an encoded snapshot that may not be in the database yet."""
+        photo_hash = database.photo_hash(data)
+        pixmap = self.cached(photo_hash, size)
+        if pixmap is None:
+            image = render_image(data, size)
+            pixmap = None if image.isNull() else self.cache(photo_hash, size, image)
+        return pixmap
+
+
+def profile_pixmap(size=(100, 90)):
+    """The placeholder profile picture, decoded and scaled once."""
+    key = f"profile:{size[0]}x{size[1]}"
+    pixmap = QPixmapCache.find(key)
+    if pixmap is None or pixmap.isNull():
+        if not os.path.exists(PROFILE_PATH):
+            return None
+        pixmap = QPixmap(PROFILE_PATH).scaled(size[0], size[1], Qt.KeepAspectRatio, Qt.SmoothTransformation)
+        QPixmapCache.insert(key, pixmap)
+    return pixmap
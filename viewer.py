@@ -0,0 +1,212 @@
+# viewer.py
+from PyQt5.QtCore import Qt, QAbstractTableModel, QModelIndex, QVariant, QObject, QRunnable, QThreadPool, pyqtSignal
+from PyQt5.QtGui import QColor, QFont, QBrush, QImage
+from thumbnails import ThumbnailStore, profile_pixmap
+import archive, database, exporter, metrics
+
+
+class _ThumbnailSignals(QObject):
+    loaded = pyqtSignal(str, QImage)
+
+
+class _ThumbnailJob(QRunnable):
+    """Loads one thumbnail off the GUI thread; QImage (unlike QPixmap) may cross threads."""
+
+    def __init__(self, store: ThumbnailStore, photo_hash: str, size, signals: _ThumbnailSignals):
+        super().__init__()
+        self.store = store
+        self.photo_hash = photo_hash
+        self.size = size
+        # held here as well so the emitter outlives a model closed mid-load
+        self.signals = signals
+
+    def run(self):
+        try:
+            with metrics.timer("viewer.thumbnail"):
+                image = self.store.thumbnail_image(self.photo_hash, self.size)
+        except Exception:
+            image = QImage()
+        self.signals.loaded.emit(self.photo_hash, image)
+
+
+class VisitTableModel(QAbstractTableModel):
+    """
+    Read-only model over the users table for the View Logs window.
+
+    Rows are pulled from SQLite a page at a time as the view scrolls
+    (canFetchMore/fetchMore) using keyset pagination on id, so opening the
+    viewer costs one page no matter how large the log is. Every cell shares
+    the same font/brush objects instead of carrying its own. A filter is
+    answered from the users_fts index, best matches first.
+
+    The Picture column is filled lazily: a cell the view paints asks for
+    its thumbnail, which is loaded on a small thread pool while a
+    placeholder is shown. Jobs still queued when the view scrolls are
+    dropped, so only rows on screen are ever decoded.
+
+    With archive_dir, a filter also reaches the visits retention moved to
+    the monthly archives (archive.py): once the live matches run out, up
+    to ARCHIVE_ROWS archived matches follow, newest first, without photos.
+    """
+    COLUMNS = ["tag", "name", "address", "time_in", "purpose", "time_out", "date"]
+    HEADERS = ["Picture", "Tag", "Name", "Address", "Time In", "Purpose", "Time Out", "Date"]
+    PAGE_SIZE = 256
+    ARCHIVE_ROWS = 1000
+    THUMB_SIZE = (48, 48)
+
+    FONT = None
+    BACKGROUND = None
+
+    def __init__(self, db: database.Database, thumbnails: ThumbnailStore, parent=None, archive_dir: str = None):
+        super().__init__(parent)
+        if VisitTableModel.FONT is None:
+            # created lazily: QFont needs a QApplication
+            VisitTableModel.FONT = QFont("Consolas", 10)
+            VisitTableModel.BACKGROUND = QBrush(QColor(30, 30, 40))
+        self.db = db
+        with db.read() as conn:
+            self.use_fts = database.has_fts(conn)
+        self.archive_dir = archive_dir
+        self.rows = []
+        self.filter_text = ""
+        self._last_id = 0
+        self._live_exhausted = False
+        self._exhausted = False
+
+        self.thumbnails = thumbnails
+        self.placeholder = profile_pixmap(self.THUMB_SIZE)
+        self._pool = QThreadPool()
+        self._pool.setMaxThreadCount(2)
+        self._signals = _ThumbnailSignals()
+        self._signals.loaded.connect(self._thumbnail_loaded)
+        self._requested = set()
+        self._missing = set()
+
+    # --- paging ---
+    def _query(self):
+        # rows are (id, *COLUMNS, photo_hash)
+        sql = f"SELECT id, {', '.join(self.COLUMNS)}, photo_hash FROM users WHERE id > ?"
+        params = [self._last_id]
+        if self.filter_text:
+            sql += " AND (" + " OR ".join(f"{col} LIKE ?" for col in self.COLUMNS) + ")"
+            # dates are stored as ISO, so match a typed dd/mm/YYYY against that
+            params += [f"%{database.to_iso_date(self.filter_text) if col == 'date' else self.filter_text}%"
+                       for col in self.COLUMNS]
+        sql += " ORDER BY id LIMIT ?"
+        params.append(self.PAGE_SIZE)
+        return sql, params
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and not self._exhausted
+
+    def fetchMore(self, parent=QModelIndex()):
+        if parent.isValid() or self._exhausted:
+            return
+        if self._live_exhausted:
+            page = self._archived_matches()
+            self._exhausted = True
+        else:
+            with metrics.timer("viewer.fetch_page"), self.db.read() as conn:
+                if self.filter_text and self.use_fts:
+                    # ranked results can't be keyset-paged on id, page by offset instead
+                    page = database.search_visits(conn, self.COLUMNS + ["photo_hash"], self.filter_text,
+                                                  self.PAGE_SIZE, len(self.rows))
+                else:
+                    page = conn.execute(*self._query()).fetchall()
+            if len(page) < self.PAGE_SIZE:
+                self._live_exhausted = True
+                # the archives are searched on the next fetch, filtered views only
+                self._exhausted = not (self.filter_text and archive.archive_months(self.archive_dir))
+            if page:
+                self._last_id = page[-1][0]
+        if not page:
+            return
+        self.beginInsertRows(QModelIndex(), len(self.rows), len(self.rows) + len(page) - 1)
+        self.rows.extend(page)
+        self.endInsertRows()
+
+    def _archived_matches(self):
+        # archived visits have no live id and their photos stay in the archive
+        with metrics.timer("viewer.fetch_archived"):
+            found = archive.search_visits(self.db, self.archive_dir, self.filter_text, limit=self.ARCHIVE_ROWS,
+                                          live=False)
+        return [(None, *(dict(zip(exporter.EXPORT_COLUMNS, row))[col] for col in self.COLUMNS), None)
+                for row in found]
+
+    def set_filter(self, text: str):
+        text = text.strip()
+        if self.use_fts and not database.fts_query(text):
+            # only punctuation typed, nothing to match on
+            text = ""
+        if text == self.filter_text:
+            return
+        self.beginResetModel()
+        self.filter_text = text
+        self.rows = []
+        self._last_id = 0
+        self._live_exhausted = False
+        self._exhausted = False
+        self.drop_queued_thumbnails()
+        self.endResetModel()
+
+    # --- thumbnails ---
+    def _thumbnail(self, photo_hash: str):
+        if not photo_hash or photo_hash in self._missing:
+            return None
+        pixmap = self.thumbnails.cached(photo_hash, self.THUMB_SIZE)
+        if pixmap is not None:
+            return pixmap
+        if photo_hash not in self._requested:
+            self._requested.add(photo_hash)
+            self._pool.start(_ThumbnailJob(self.thumbnails, photo_hash, self.THUMB_SIZE, self._signals))
+        return self.placeholder
+
+    def _thumbnail_loaded(self, photo_hash: str, image: QImage):
+        self._requested.discard(photo_hash)
+        if image.isNull():
+            self._missing.add(photo_hash)
+        else:
+            self.thumbnails.cache(photo_hash, self.THUMB_SIZE, image)
+        # the view only repaints the rows it is showing
+        if self.rows:
+            self.dataChanged.emit(self.index(0, 0), self.index(len(self.rows) - 1, 0), [Qt.DecorationRole])
+
+    def drop_queued_thumbnails(self, *_):
+        """Forget thumbnail jobs that haven't started; rows still on screen ask again when repainted."""
+        self._pool.clear()
+        self._requested.clear()
+
+    # --- QAbstractTableModel ---
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.HEADERS)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return QVariant()
+        if index.column() == 0:
+            if role == Qt.DecorationRole:
+                return self._thumbnail(self.rows[index.row()][-1])
+            if role == Qt.BackgroundRole:
+                return self.BACKGROUND
+            return QVariant()
+        if role == Qt.DisplayRole:
+            # column 0 of a row is the id, matching the Picture column's place
+            cell = self.rows[index.row()][index.column()]
+            if self.COLUMNS[index.column() - 1] == "date":
+                cell = database.to_display_date(cell)
+            return "" if cell is None else str(cell)
+        if role == Qt.TextAlignmentRole:
+            return Qt.AlignCenter
+        if role == Qt.FontRole:
+            return self.FONT
+        if role == Qt.BackgroundRole:
+            return self.BACKGROUND
+        return QVariant()
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return self.HEADERS[section]
+        return super().headerData(section, orientation, role)
@@ -0,0 +1,231 @@
+# write_queue.py
+from concurrent.futures import Future, wait
+import threading, queue, json, base64, os, time
+import database, metrics
+
+OPERATIONS = {
+    "insert": database.insert_visit,
+    "update": database.update_visit,
+}
+
+JOURNAL_SEQ_KEY = "write_journal_seq"
+
+
+class JournalInUse(RuntimeError):
+    """Another write queue, in this process or another, already owns the journal."""
+
+
+def _lock(path: str):
+    """Open path and hold an exclusive lock on it for as long as it stays open."""
+    f = open(path, "a+")
+    try:
+        if os.name == "nt":
+            import msvcrt
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        f.close()
+        raise JournalInUse(f"{path} is held by another write queue; is the app already running on this database?")
+    return f
+
+
+def _unlock(f):
+    if os.name == "nt":
+        import msvcrt
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+    f.close()
+
+
+def _encode(visit: dict) -> dict:
+    visit = dict(visit)
+    if visit.get("picture"):
+        visit["picture"] = base64.b64encode(visit["picture"]).decode("ascii")
+    return visit
+
+
+def _decode(visit: dict) -> dict:
+    visit = dict(visit)
+    if visit.get("picture"):
+        visit["picture"] = base64.b64decode(visit["picture"])
+    return visit
+
+
+class WriteQueue:
+    """
+    Write-behind queue for visit records.
+
+    submit() appends the record to an on-disk journal and returns a Future
+    straight away; a background thread groups queued records into one
+    durable transaction per batch (up to max_batch records or max_delay
+    seconds), so a burst of check-ins shares a single fsync. The Future
+    resolves with the row id once its transaction is committed, or with
+    the error if that record could not be applied.
+
+    Each batch also stores the journal sequence number it reached in the
+    meta table. On start-up, journal entries past that number (accepted but
+    not committed when the app died) are replayed, then the journal is
+    emptied.
+
+    A journal and its seq_key belong to one queue at a time: the queue
+    holds a lock on journal_path + ".lock" until close(), and a second
+    queue on the same journal raises JournalInUse instead of replaying or
+    truncating entries the first one still has queued.
+    """
+
+    def __init__(self, db: database.Database, journal_path: str, max_batch: int = 256, max_delay: float = 0.05,
+                 fsync_journal: bool = False, seq_key: str = JOURNAL_SEQ_KEY):
+        self.db = db
+        self.journal_path = journal_path
+        # each journal (one per process writing to the database) tracks its own position
+        self.seq_key = seq_key
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        # flushing alone survives an app crash; fsync also survives power loss
+        self.fsync_journal = fsync_journal
+        self.submitted = 0
+        self.committed = 0
+        self.batches = 0
+        self._queue = queue.Queue()
+        self._journal_lock = threading.Lock()
+        self._last = None
+
+        self._lock_file = _lock(journal_path + ".lock")
+        try:
+            with db.read() as conn:
+                self._applied = int(database.get_meta(conn, seq_key, 0))
+            self._seq = self._applied
+            self.recovered = self._recover()
+            self._journal = open(journal_path, "a", encoding="utf-8")
+        except BaseException:
+            _unlock(self._lock_file)
+            raise
+
+        self._thread = threading.Thread(target=self._run, name="write-queue", daemon=True)
+        self._thread.start()
+
+    # --- public ---
+    def submit(self, op: str, visit: dict) -> Future:
+        if op not in OPERATIONS:
+            raise ValueError(f"Unknown write operation: {op}")
+        future = Future()
+        with self._journal_lock:
+            self._seq += 1
+            entry = {"seq": self._seq, "op": op, "visit": _encode(visit)}
+            self._journal.write(json.dumps(entry) + "\n")
+            self._journal.flush()
+            if self.fsync_journal:
+                os.fsync(self._journal.fileno())
+            # queued under the lock so batches commit in journal order
+            self._queue.put((entry, future))
+            self.submitted += 1
+            self._last = future
+        return future
+
+    def flush(self, timeout: float = None):
+        """Block until everything submitted so far is committed (or failed)."""
+        last = self._last
+        if last is not None:
+            wait([last], timeout)
+
+    def pending(self) -> int:
+        return self.submitted - self.committed
+
+    def stats(self):
+        return {"submitted": self.submitted, "committed": self.committed, "batches": self.batches,
+                "pending": self.pending()}
+
+    def close(self):
+        """Commit everything already submitted, then stop the worker."""
+        self._queue.put(None)
+        self._thread.join()
+        with self._journal_lock:
+            self._truncate_journal()
+            self._journal.close()
+        _unlock(self._lock_file)
+
+    # --- worker ---
+    def _run(self):
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            if item is None:
+                break
+            batch = [item]
+            deadline = time.monotonic() + self.max_delay
+            while len(batch) < self.max_batch:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+            self._commit(batch)
+
+    def _commit(self, batch):
+        try:
+            results = self._apply([entry for entry, _ in batch])
+        except Exception as e:
+            for _, future in batch:
+                future.set_exception(e)
+            return
+        self.batches += 1
+        self.committed += len(batch)
+        metrics.count("write_queue.committed", len(batch))
+        for (_, future), result in zip(batch, results):
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+        with self._journal_lock:
+            if self._applied == self._seq:
+                self._truncate_journal()
+
+    def _apply(self, entries):
+        """Apply journal entries in one transaction; one bad record doesn't sink the batch."""
+        results = []
+        with metrics.timer("db.write_batch"), self.db.write(durable=True) as cursor:
+            for entry in entries:
+                cursor.execute("SAVEPOINT visit")
+                try:
+                    results.append(OPERATIONS[entry["op"]](cursor, _decode(entry["visit"])))
+                    cursor.execute("RELEASE visit")
+                except Exception as e:
+                    cursor.execute("ROLLBACK TO visit")
+                    cursor.execute("RELEASE visit")
+                    results.append(e)
+            database.set_meta(cursor, self.seq_key, entries[-1]["seq"])
+        self._applied = entries[-1]["seq"]
+        return results
+
+    def _recover(self):
+        pending = []
+        if os.path.exists(self.journal_path):
+            with open(self.journal_path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # torn final line from a crash mid-write; it was never acknowledged
+                        break
+                    self._seq = max(self._seq, entry["seq"])
+                    if entry["seq"] > self._applied:
+                        pending.append(entry)
+        if pending:
+            self._apply(pending)
+        self._seq = max(self._seq, self._applied)
+        open(self.journal_path, "w").close()
+        return len(pending)
+
+    def _truncate_journal(self):
+        # every journaled record is in the database, start the file over
+        self._journal.seek(0)
+        self._journal.truncate()